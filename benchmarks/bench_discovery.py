@@ -0,0 +1,78 @@
+"""
+    Compares the previous os.walk based test discovery with j2test.discovery, with and without
+    the discovery index, on a generated monorepo with a large node_modules and .git directory.
+
+    Usage: python benchmarks/bench_discovery.py [--test-dirs 2000] [--noise-dirs 20000] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+import typing
+from j2test import discovery
+
+
+def generate_tree(root: str, num_test_dirs: int, num_noise_dirs: int) -> None:
+    """
+        Writes a tree with a jinja unit test file per test directory, and as many directories
+        of files without tests split between node_modules and .git.
+    """
+    for index in range(num_test_dirs):
+        directory = os.path.join(root, "services", "svc{}".format(index % 50), "jtests", "t{}".format(index))
+        os.makedirs(directory)
+        open(os.path.join(directory, "jtest_t{}.py".format(index)), "w").close()
+        open(os.path.join(directory, "expected.json"), "w").close()
+    for index in range(num_noise_dirs):
+        parent = "node_modules" if index % 2 else os.path.join(".git", "objects")
+        directory = os.path.join(root, parent, "d{}".format(index // 100), "p{}".format(index))
+        os.makedirs(directory)
+        open(os.path.join(directory, "index.js"), "w").close()
+
+
+def walk(root: str) -> typing.List[str]:
+    # Discovery before j2test.discovery
+    test_files = []
+    for dir_path, _, files in os.walk(root):
+        for file in files:
+            if file.endswith(".py") and file.startswith("jtest_"):
+                test_files.append(os.path.normpath(os.path.join(dir_path, file)))
+    return test_files
+
+
+def best_time(function: typing.Callable[[], typing.List[str]], repeat: int) -> typing.Tuple[float, int]:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_files = len(function())
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, num_files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the test discovery of j2test")
+    parser.add_argument("--test-dirs", type=int, default=2000, help="Directories with a test file")
+    parser.add_argument("--noise-dirs", type=int, default=20000, help="Directories under node_modules and .git")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy, the best run is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = os.path.join(tmp_dir, "repo")
+        index_path = os.path.join(tmp_dir, "discovery.json")
+        generate_tree(root, args.test_dirs, args.noise_dirs)
+        discovery.discover(root, index_path=index_path)
+
+        strategies = [
+            ("os.walk", lambda: walk(root)),
+            ("pruned", lambda: discovery.discover(root)),
+            ("indexed", lambda: discovery.discover(root, index_path=index_path)),
+        ]
+        baseline = None
+        for name, function in strategies:
+            duration, num_files = best_time(function, args.repeat)
+            baseline = baseline or duration
+            print("  {:<8} {:>8.3f}s  {:>5.1f}x  {} test files".format(name, duration, baseline / duration, num_files))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+    Compares the JSON backends of j2test.json_backend on generated documents of representative sizes,
+    parsing rendered output (text) and fixture files (bytes).
+
+    Usage: python benchmarks/bench_json_backend.py [--sizes 0.1 1 10] [--repeat 3]
+"""
+import argparse
+import json
+import time
+import typing
+from j2test import json_backend
+
+
+def generate_document(size_mb: float) -> str:
+    """
+        Generates a JSON document of roughly size_mb megabytes, like the output of the macros.
+    """
+    target = int(size_mb * 1024 * 1024)
+    items = []
+    size = 0
+    while size < target:
+        index = len(items)
+        item = {
+            "name": "app_{}".format(index),
+            "team": "team{}".format(index % 17),
+            "enabled": index % 2 == 0,
+            "replicas": index % 9,
+            "ratio": index / 7.0,
+            "labels": {"env": "prod", "region": "us-east-{}".format(index % 3)},
+            "hosts": ["host-{}.example.com".format(index * 10 + i) for i in range(4)],
+        }
+        items.append(item)
+        size += len(json.dumps(item))
+    return json.dumps({"items": items})
+
+
+def best_time(function: typing.Callable[[], typing.Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON backends of j2test")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[0.1, 1, 10], help="Document sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend, the best run is reported")
+    args = parser.parse_args()
+
+    names = [name for name in ["json", "rapidjson", "orjson"] if json_backend.is_available(name)]
+    for size_mb in args.sizes:
+        text = generate_document(size_mb)
+        data = text.encode("utf-8")
+        print("{:.1f} MB document".format(len(data) / 1024 / 1024))
+        baseline = None
+        for name in names:
+            backend = json_backend.get_backend(name)
+            text_time = best_time(lambda: backend.loads(text), args.repeat)
+            bytes_time = best_time(lambda: backend.loads(data), args.repeat)
+            baseline = baseline or text_time
+            print("  {:<10} text {:>7.3f}s {:>5.1f}x  bytes {:>7.3f}s {:>5.1f}x".format(
+                name, text_time, baseline / text_time, bytes_time, baseline / bytes_time))
+
+
+if __name__ == "__main__":
+    main()
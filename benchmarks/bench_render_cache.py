@@ -0,0 +1,76 @@
+"""
+    Compares rendering a macro for every assertion of a test with reusing its output through the render cache
+    of j2test.render_cache, for tests that assert several properties of the same output.
+
+    Usage: python benchmarks/bench_render_cache.py [--items 2000] [--assertions 5] [--repeat 3]
+"""
+import argparse
+import time
+import typing
+import jinja2
+from j2test import json_backend, render_cache
+
+TEMPLATE = """{% macro manifest(name, items) -%}
+{"name": {{ name | tojson }}, "items": [
+{%- for item in items %}{"id": {{ item.id }}, "labels": {{ item.labels | tojson }}}{{ "," if not loop.last }}
+{%- endfor %}]}
+{%- endmacro %}"""
+
+
+def best_time(function: typing.Callable[[], int], repeat: int) -> typing.Tuple[float, int]:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_renders = function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, num_renders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the render cache of j2test")
+    parser.add_argument("--items", type=int, default=2000, help="Items rendered by the macro")
+    parser.add_argument("--assertions", type=int, default=5, help="Assertions on the output per test")
+    parser.add_argument("--tests", type=int, default=20, help="Tests, each with its own arguments")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy, the best run is reported")
+    args = parser.parse_args()
+
+    template = jinja2.Environment().from_string(TEMPLATE)
+    macro = template.module.manifest
+    items = [{"id": index, "labels": {"app": "app{}".format(index % 13), "tier": "web"}} for index in range(args.items)]
+
+    def assert_all(render: typing.Callable) -> None:
+        for test in range(args.tests):
+            for _ in range(args.assertions):
+                json_backend.loads(render("manifest-{}".format(test), items))
+
+    def without_cache() -> int:
+        counting = CountingMacro(macro)
+        assert_all(counting)
+        return counting.calls
+
+    def with_cache() -> int:
+        counting = CountingMacro(macro)
+        assert_all(render_cache.RenderCache().wrap(template, "manifest", counting))
+        return counting.calls
+
+    print("  {} tests with {} assertions on a macro rendering {} items".format(args.tests, args.assertions, args.items))
+    baseline = None
+    for name, function in [("render", without_cache), ("cached", with_cache)]:
+        duration, num_renders = best_time(function, args.repeat)
+        baseline = baseline or duration
+        print("  {:<8} {:>8.3f}s  {:>5.1f}x  {} renders".format(name, duration, baseline / duration, num_renders))
+
+
+class CountingMacro:
+    def __init__(self, macro: typing.Callable) -> None:
+        self.macro = macro
+        self.calls = 0
+
+    def __call__(self, *args: typing.Any) -> str:
+        self.calls += 1
+        return self.macro(*args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+    Compares loading expected outputs from one JSON file per expectation, like assertEqualJsonFile,
+    with looking them up in the packed snapshot file of j2test.snapshot.
+
+    Usage: python benchmarks/bench_snapshots.py [--entries 20000] [--lookups 2000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import typing
+from j2test import json_backend, snapshot
+
+
+def generate_outputs(num_entries: int) -> typing.Dict[str, typing.Dict]:
+    # Small macro outputs, the typical content of a golden directory
+    return {"case_{}".format(index): {"id": index, "name": "resource-{}".format(index),
+                                       "tags": ["tag{}".format(index % 7), "shared"], "enabled": index % 2 == 0}
+            for index in range(num_entries)}
+
+
+def best_time(function: typing.Callable[[], int], repeat: int) -> typing.Tuple[float, int]:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_found = function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, num_found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the snapshot store of j2test")
+    parser.add_argument("--entries", type=int, default=20000, help="Expected outputs in the golden directory")
+    parser.add_argument("--lookups", type=int, default=2000, help="Expected outputs read by a run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy, the best run is reported")
+    args = parser.parse_args()
+
+    outputs = generate_outputs(args.entries)
+    keys = random.Random(0).sample(sorted(outputs), min(args.lookups, args.entries))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        golden_dir = os.path.join(tmp_dir, "expected")
+        os.makedirs(golden_dir)
+        for key, output in outputs.items():
+            with open(os.path.join(golden_dir, key + ".json"), "w", encoding="utf-8") as f:
+                f.write(json_backend.dumps(output, indent=4))
+        store_path = os.path.join(tmp_dir, "jtest_bench.snap")
+        snapshot.update_store(store_path, {key: snapshot.Snapshot(output, True) for key, output in outputs.items()})
+
+        def read_files() -> int:
+            return sum(1 for key in keys if json_backend.load_file(os.path.join(golden_dir, key + ".json")))
+
+        def read_store() -> int:
+            store = snapshot.SnapshotStore(store_path)
+            try:
+                return sum(1 for key in keys if store.get(key) is not None)
+            finally:
+                store.close()
+
+        golden_size = sum(os.path.getsize(os.path.join(golden_dir, name)) for name in os.listdir(golden_dir))
+        print("  {} expected outputs, {} looked up".format(args.entries, len(keys)))
+        print("  files: {} files, {:.1f} MB".format(args.entries, golden_size / 1e6))
+        print("  store: 1 file, {:.1f} MB".format(os.path.getsize(store_path) / 1e6))
+
+        start = time.perf_counter()
+        snapshot.update_store(store_path, {key: snapshot.Snapshot(output, True) for key, output in outputs.items()},
+                              prune=True)
+        print("  rewriting the store: {:.3f}s".format(time.perf_counter() - start))
+
+        baseline = None
+        for name, function in [("files", read_files), ("store", read_store)]:
+            duration, num_found = best_time(function, args.repeat)
+            baseline = baseline or duration
+            print("  {:<8} {:>8.3f}s  {:>5.1f}x  {} outputs read".format(name, duration, baseline / duration, num_found))
+
+
+if __name__ == "__main__":
+    main()
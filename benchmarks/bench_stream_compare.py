@@ -0,0 +1,70 @@
+"""
+    Compares the time and peak memory of checking a large rendered JSON output against an expected file by parsing
+    both sides, like assertEqualJsonFile, and by streaming both through j2test.stream_compare.
+
+    Every strategy runs in its own process so its peak resident memory can be measured.
+
+    Usage: python benchmarks/bench_stream_compare.py [--items 300000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from j2test import json_backend, stream_compare
+
+
+def generate_files(directory: str, num_items: int) -> None:
+    """
+        Writes a compact output like the tojson filter renders it and the same document as an indented expected file.
+    """
+    document = {"resources": [{"id": index, "name": "resource-{}".format(index), "tags": ["a", "b", "c"],
+                               "enabled": index % 2 == 0, "weight": index * 0.5,
+                               "meta": {"owner": "team{}".format(index % 10)}}
+                              for index in range(num_items)]}
+    with open(os.path.join(directory, "output.json"), "w", encoding="utf-8") as f:
+        json.dump(document, f, sort_keys=True)
+    with open(os.path.join(directory, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=4, sort_keys=True)
+
+
+def run(strategy: str, directory: str) -> None:
+    with open(os.path.join(directory, "output.json"), "r", encoding="utf-8") as f:
+        output = f.read()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if strategy == "parse":
+        same = json_backend.loads(output) == json_backend.load_file(os.path.join(directory, "expected.json"))
+    else:
+        with stream_compare.open_expected(os.path.join(directory, "expected.json")) as expected:
+            same = stream_compare.compare_json(stream_compare.iter_chunks(output), expected) is None
+    duration = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+    print("  {:<8} {:>8.3f}s  peak memory +{:>6.0f} MB  same: {}".format(strategy, duration, growth, same))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the streamed JSON comparison of j2test")
+    parser.add_argument("--items", type=int, default=300000, help="Objects in the generated document")
+    parser.add_argument("--run", nargs=2, metavar=("STRATEGY", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generate_files(tmp_dir, args.items)
+        print("  output {:.0f} MB, expected file {:.0f} MB".format(
+            os.path.getsize(os.path.join(tmp_dir, "output.json")) / 1e6,
+            os.path.getsize(os.path.join(tmp_dir, "expected.json")) / 1e6))
+        for strategy in ("parse", "stream"):
+            subprocess.run([sys.executable, __file__, "--run", strategy, tmp_dir], check=True)
+
+
+if __name__ == "__main__":
+    main()
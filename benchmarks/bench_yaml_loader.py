@@ -0,0 +1,82 @@
+"""
+    Compares the PyYAML loaders used by j2test.utils.get_yaml_file on generated variable files
+    of representative sizes.
+
+    Usage: python benchmarks/bench_yaml_loader.py [--sizes 0.1 1 10] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+import typing
+import yaml
+
+
+def generate_fixture(path: str, size_mb: float) -> None:
+    """
+        Writes a YAML variable file of roughly size_mb megabytes, with nested mappings, lists and scalars
+        like the variable files of the templates.
+    """
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    index = 0
+    with open(path, "w") as f:
+        while written < target:
+            entry = {
+                "app_{}".format(index): {
+                    "team": "team{}".format(index % 17),
+                    "enabled": index % 2 == 0,
+                    "replicas": index % 9,
+                    "ratio": index / 7.0,
+                    "labels": {"env": "prod", "region": "us-east-{}".format(index % 3)},
+                    "ports": [8080 + index % 5, 9090, 443],
+                    "hosts": ["host-{}.example.com".format(index * 10 + i) for i in range(4)],
+                }
+            }
+            chunk = yaml.dump(entry, default_flow_style=False)
+            f.write(chunk)
+            written += len(chunk)
+            index += 1
+
+
+def time_loader(path: str, loader: type, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            yaml.load(f, Loader=loader)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def get_loaders() -> typing.List[typing.Tuple[str, type]]:
+    loaders = [("FullLoader", yaml.FullLoader), ("SafeLoader", yaml.SafeLoader)]
+    if getattr(yaml, "__with_libyaml__", False):
+        loaders += [("CFullLoader", yaml.CFullLoader), ("CSafeLoader", yaml.CSafeLoader)]
+    return loaders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the YAML loaders of j2test")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[0.1, 1, 10], help="Fixture sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per loader, the best run is reported")
+    args = parser.parse_args()
+
+    if not getattr(yaml, "__with_libyaml__", False):
+        print("PyYAML was built without libyaml, only the pure Python loaders are compared")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in args.sizes:
+            path = os.path.join(tmp_dir, "vars_{}mb.yaml".format(size_mb))
+            generate_fixture(path, size_mb)
+            print("{:.1f} MB fixture".format(os.path.getsize(path) / 1024 / 1024))
+            baseline = None
+            for name, loader in get_loaders():
+                duration = time_loader(path, loader, args.repeat)
+                baseline = baseline or duration
+                print("  {:<12} {:>8.3f}s  {:>5.1f}x".format(name, duration, baseline / duration))
+
+
+if __name__ == "__main__":
+    main()
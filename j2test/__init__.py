@@ -1,3 +1,10 @@
-from j2test.j2test import TestTemplate
+# Need to import functions that should be available at the package level
 
-# Need to import functions that should be available at the package level
\ No newline at end of file
+
+def __getattr__(name: str):
+    # TestTemplate is imported on first use, so the CLI, and the daemon client in particular,
+    # start without importing jinja2 and the rest of the test framework
+    if name == "TestTemplate":
+        from j2test.j2test import TestTemplate
+        return TestTemplate
+    raise AttributeError("module 'j2test' has no attribute '{}'".format(name))
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+import typing
+import jinja2
+import jinja2.bccache
+from j2test._version import __version__
+
+
+class PersistentBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+        Persistent on-disk cache for the compiled bytecode of jinja templates.
+
+        Cache entries are keyed by the template name, the checksum of the template source, the code
+        generator and the Jinja2 and j2test versions, so a changed template or an upgraded Jinja2 never
+        loads stale bytecode and several branches can share the same directory. Entries are written to a
+        temporary file first and then atomically moved in place, which makes the directory safe to share
+        between parallel workers. A directory that can not be written only disables the writes.
+    """
+
+    hits = 0
+    misses = 0
+    writes = 0
+
+    def __init__(self, directory: str) -> None:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            # Read-only shared cache, entries that exist are still loaded and dump_bytecode skips the writes
+            pass
+        super().__init__(directory, pattern="j2test_%s.cache")
+
+    def get_bucket(self, environment: jinja2.Environment, name: str, filename: typing.Optional[str],
+                   source: str) -> jinja2.bccache.Bucket:
+        """
+            Returns the cache bucket for the template, keyed by the template source checksum and versions.
+
+            :param environment: The environment the template is compiled in
+            :type environment: jinja2.Environment
+
+            :param name: The name of the template
+            :type name: str
+
+            :param filename: The file name of the template, if any
+            :type filename: str
+
+            :param source: The source of the template
+            :type source: str
+
+            :return: Bucket with the bytecode loaded if it was found in the cache
+            :rtype: jinja2.bccache.Bucket
+        """
+        checksum = self.get_source_checksum(source)
+        # The code generator is part of the key, the native rendering mode compiles templates differently
+        generator = environment.code_generator_class.__name__
+        parts = [name, filename or "", checksum, generator, jinja2.__version__, __version__]
+        key = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+        bucket = jinja2.bccache.Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        """
+            Loads the bytecode into the bucket, a missing or unreadable entry is counted as a miss.
+
+            :param bucket: The bucket to load the bytecode into
+            :type bucket: jinja2.bccache.Bucket
+        """
+        try:
+            with open(self._get_cache_filename(bucket), "rb") as f:
+                bucket.load_bytecode(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            # Missing or corrupted entry, the template is compiled and the entry written again
+            bucket.reset()
+
+        if bucket.code is None:
+            PersistentBytecodeCache.misses += 1
+        else:
+            PersistentBytecodeCache.hits += 1
+
+    def dump_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        """
+            Atomically writes the bytecode of the bucket to the cache directory.
+            Nothing is written when the directory can not be written.
+
+            :param bucket: The bucket with the compiled bytecode
+            :type bucket: jinja2.bccache.Bucket
+        """
+        filename = self._get_cache_filename(bucket)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_")
+        except OSError:
+            # The cache is only an optimization, the template was compiled anyway
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp_path, filename)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        PersistentBytecodeCache.writes += 1
+
+
+_caches = {}
+
+
+def get_bytecode_cache(directory: str) -> PersistentBytecodeCache:
+    """
+        Gets the bytecode cache for the directory, one cache object is shared per directory in a process.
+
+        :param directory: Directory where the compiled templates are stored
+        :type directory: str
+
+        :return: The bytecode cache
+        :rtype: PersistentBytecodeCache
+    """
+    directory = os.path.abspath(directory)
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = PersistentBytecodeCache(directory)
+        _caches[directory] = cache
+    return cache
+
+
+def get_stats() -> typing.Dict[str, int]:
+    """
+        Gets the bytecode cache hit, miss and write counts of this process.
+
+        :return: Dictionary with hits, misses and writes
+        :rtype: Dict[str, int]
+    """
+    return {
+        "hits": PersistentBytecodeCache.hits,
+        "misses": PersistentBytecodeCache.misses,
+        "writes": PersistentBytecodeCache.writes,
+    }
@@ -0,0 +1,130 @@
+import csv
+import itertools
+import typing
+import j2test.json_backend as json_backend
+import j2test.commons.utils_messages as utils_messages
+
+# Number of cases read from the case file at a time
+BATCH_SIZE = 1000
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+CSV_EXTENSIONS = (".csv",)
+# First characters of JSON values
+_JSON_START = frozenset('{["-0123456789tfn')
+
+
+class Case(typing.NamedTuple):
+    """
+        One row of a case file: the arguments to render the macro with and the expected output.
+        error is set instead when the row is invalid.
+    """
+
+    line_number: int
+    args: typing.List[typing.Any]
+    expected: typing.Any
+    error: typing.Optional[str] = None
+
+
+def iter_cases(path: str) -> typing.Iterator[Case]:
+    """
+        Reads the cases of a case file one at a time, so the file is never loaded into memory as a whole.
+
+        JSON lines files (.jsonl, .ndjson) have an object per line with the "args" list and the "expected"
+        output. CSV files (.csv) have a header row with an "expected" column, and either an "args" column
+        with a JSON list or one column per argument. Cells that are valid JSON are parsed, the other cells
+        are strings. An expected JSON object is compared as JSON, an expected string as a string.
+
+        :param path: Path to the case file
+        :type path: str
+
+        :return: The cases, in file order
+        :rtype: Iterator[Case]
+    """
+    if path.endswith(JSONL_EXTENSIONS):
+        reader = _iter_jsonl
+    elif path.endswith(CSV_EXTENSIONS):
+        reader = _iter_csv
+    else:
+        raise ValueError(utils_messages.INVALID_CASE_FILE.format(
+            path=path, extensions=", ".join(JSONL_EXTENSIONS + CSV_EXTENSIONS)))
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from reader(f)
+
+
+def iter_batches(path: str, batch_size: int = BATCH_SIZE) -> typing.Iterator[typing.List[Case]]:
+    """
+        Reads the cases of a case file in batches, see iter_cases.
+
+        :param path: Path to the case file
+        :type path: str
+
+        :param batch_size: Maximum number of cases per batch
+        :type batch_size: int
+
+        :return: Lists of at most batch_size cases
+        :rtype: Iterator[List[Case]]
+    """
+    cases = iter_cases(path)
+    while True:
+        batch = list(itertools.islice(cases, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _iter_jsonl(f: typing.TextIO) -> typing.Iterator[Case]:
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            case = json_backend.loads(line)
+        except ValueError as e:
+            yield Case(line_number, [], None, utils_messages.INVALID_CASE_JSON.format(e=e))
+            continue
+        if not isinstance(case, dict) or "expected" not in case or not isinstance(case.get("args", []), list):
+            yield Case(line_number, [], None, utils_messages.INVALID_CASE_FIELDS)
+            continue
+        yield Case(line_number, case.get("args", []), case["expected"])
+
+
+def _iter_csv(f: typing.TextIO) -> typing.Iterator[Case]:
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    if "expected" not in header:
+        raise ValueError(utils_messages.INVALID_CASE_HEADER.format(header=header))
+    expected_column = header.index("expected")
+    args_column = header.index("args") if "args" in header else None
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        # The line the row ends on, rows may span several lines with quoted line breaks
+        line_number = reader.line_num
+        if len(row) != len(header):
+            yield Case(line_number, [], None, utils_messages.INVALID_CASE_COLUMNS.format(
+                num_columns=len(row), num_header=len(header)))
+            continue
+
+        expected = _cell_value(row[expected_column])
+        if not isinstance(expected, dict):
+            expected = row[expected_column]
+        if args_column is not None:
+            args = _cell_value(row[args_column])
+            if not isinstance(args, list):
+                yield Case(line_number, [], None, utils_messages.INVALID_CASE_FIELDS)
+                continue
+        else:
+            args = [_cell_value(cell) for column, cell in enumerate(row) if column != expected_column]
+        yield Case(line_number, args, expected)
+
+
+def _cell_value(cell: str) -> typing.Any:
+    if not cell or cell[0] not in _JSON_START:
+        # Plain text, skips the failing parse of most string cells
+        return cell
+    try:
+        return json_backend.loads(cell)
+    except ValueError:
+        return cell
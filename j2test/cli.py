@@ -1,15 +1,27 @@
 import argparse
 import os
 import sys
+import time
 import typing
 import j2test.commons.cli_messages as cli_messages
 from j2test._version import __version__
 
+RUNNER_SUBPROCESS = "subprocess"
+RUNNER_IN_PROCESS = "inprocess"
+RUNNER_FORKED = "forked"
+
 
 def main() -> None:
     """
         Main entrance for the j2test CLI component.
     """
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        _compile(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        _serve(sys.argv[2:])
+        return
+
     num_files = 0
     num_failed = 0
 
@@ -23,34 +35,553 @@ def main() -> None:
 
     parser.add_argument('-v', '--version', action='version', version='%(prog)s {version}'.format(version=__version__))
 
+    parser.add_argument('--runner', choices=[RUNNER_SUBPROCESS, RUNNER_IN_PROCESS, RUNNER_FORKED],
+                        default=RUNNER_SUBPROCESS,
+                        help=("How each test file is run: '" + RUNNER_SUBPROCESS + "' starts a new python3 "
+                            "interpreter per file (default), '" + RUNNER_IN_PROCESS + "' imports and runs all "
+                            "files in this interpreter and '" + RUNNER_FORKED + "' runs each file in a forked "
+                            "child of this interpreter for suites that mutate global state."))
+
+    parser.add_argument('-n', '--workers', metavar='N', type=str, default=None,
+                        help=("Run the test files in parallel across N worker processes, or one worker per CPU "
+                            "with \"auto\". Implies that test files are run in-process by the workers."))
+
+    parser.add_argument('--no-auto-reload', action='store_true',
+                        help=("Do not check whether template files changed on disk when they are loaded. "
+                            "Templates are expected to stay the same for the whole run."))
+
+    parser.add_argument('--bytecode-cache', metavar='DIR', type=str, default=None,
+                        help=("Directory of a persistent cache for compiled templates which is reused by later runs "
+                            "and can be shared between parallel workers. Hit and miss counts are reported by the "
+                            "in-process runners."))
+
+    parser.add_argument('--precompiled', metavar='ARCHIVE', type=str, default=None,
+                        help=("Load the templates from an archive created by \"j2test compile\" instead of parsing "
+                            "and compiling them. Templates that changed since the archive was built are compiled "
+                            "as usual."))
+
+    parser.add_argument('--yaml-mode', choices=['full', 'safe'], default=None,
+                        help=("Load YAML files like yaml.FullLoader (default) or like yaml.SafeLoader. "
+                            "libyaml is used automatically when PyYAML was built with it."))
+    parser.add_argument('--json-backend', choices=['auto', 'json', 'rapidjson', 'orjson'], default=None,
+                        help=("Library used to parse and serialize JSON. auto (default) picks the fastest "
+                            "installed library."))
+
+    parser.add_argument('-k', '--test', metavar='NAME', action='append', default=None,
+                        help=("Only run the unit test functions with this name, or ClassName.test_name. "
+                            "Can be passed several times."))
+
+    parser.add_argument('--update-snapshots', action='store_true',
+                        help=("Record the output of every assertMatchesSnapshot call as its snapshot instead of "
+                            "comparing it, rewriting the snapshot file of each test file once."))
+
+    parser.add_argument('--daemon', action='store_true',
+                        help=("Run the test files in the daemon started by \"j2test serve\", which keeps the "
+                            "imports and compiled templates warm between runs."))
+
+    parser.add_argument('--socket', metavar='PATH', type=str, default=None,
+                        help="Unix domain socket of the daemon, defaults to .j2test_cache/daemon.sock.")
+
+    parser.add_argument('--cache', action='store_true',
+                        help=("Skip the discovered test files that passed in an earlier --cache run and whose test "
+                            "file, templates and the files next to them did not change since. Files read from "
+                            "elsewhere are not tracked, see the README. A test file passed by name always runs."))
+
+    parser.add_argument('--ignore', metavar='PATTERN', action='append', default=None,
+                        help=("Do not look for test files in paths matching this .gitignore style pattern, "
+                            "e.g. \"vendor/\". Can be passed several times. .git, virtualenvs, node_modules, "
+                            "build output and the paths in .gitignore and .j2testignore files are always skipped."))
+
+    parser.add_argument('--no-discovery-index', action='store_true',
+                        help=("List every directory to find the test files instead of reusing the listings of "
+                            "the directories that did not change since the last run."))
+
+    parser.add_argument('--affected-by', metavar='PATH', nargs='+', default=None,
+                        help=("Only run the test files affected by these changed files, e.g. the output of "
+                            "\"git diff --name-only\". Pass - to read the paths from stdin, one per line."))
+
+    parser.add_argument('--shard', metavar='I/N', type=str, default=None,
+                        help=("Only run the I-th of N shards of the test files, e.g. 2/4 on the second of four "
+                            "CI nodes. Shards are balanced by the test file durations recorded by earlier runs, "
+                            "or by the number of test files without any history."))
+
+    parser.add_argument('--durations', metavar='PATH', type=str, default=None,
+                        help=("JSON file the duration of every test file is recorded in and the shards are "
+                            "balanced with, defaults to .j2test_cache/durations.json. Durations are only "
+                            "recorded with --shard or --durations."))
+
+    parser.add_argument('--watch', action='store_true',
+                        help=("Keep running and rerun the test files affected by every change to a test file, "
+                            "a template or a JSON/YAML fixture. A test file is affected by its template and "
+                            "every template that template imports, includes or extends."))
+
     args = parser.parse_args()
     test_file_path = args.file
 
+    if args.no_auto_reload:
+        # Passed through the environment so the test files run in subprocesses and workers see it too
+        os.environ["J2TEST_AUTO_RELOAD"] = "0"
+    if args.bytecode_cache:
+        os.environ["J2TEST_BYTECODE_CACHE"] = os.path.abspath(args.bytecode_cache)
+    if args.yaml_mode:
+        os.environ["J2TEST_YAML_MODE"] = args.yaml_mode
+    if args.json_backend:
+        os.environ["J2TEST_JSON_BACKEND"] = args.json_backend
+    if args.test:
+        os.environ["J2TEST_SELECT"] = ",".join(args.test)
+    if args.update_snapshots:
+        os.environ["J2TEST_UPDATE_SNAPSHOTS"] = "1"
+    if args.precompiled:
+        if not os.path.exists(args.precompiled):
+            print(cli_messages.NO_PRECOMPILED_ARCHIVE.format(path=args.precompiled))
+            sys.exit(1)
+        os.environ["J2TEST_PRECOMPILED"] = os.path.abspath(args.precompiled)
+
+    num_workers = None
+    if args.workers is not None:
+        try:
+            # Imported here so the subprocess runner does not pay for importing the test framework
+            import j2test.runner as runner
+            num_workers = runner.resolve_num_workers(args.workers)
+        except ValueError:
+            print(cli_messages.INVALID_NUM_WORKERS.format(value=args.workers))
+            sys.exit(2)
+
     if test_file_path == 'all':
         # Case where we recursively find all jinja test files under the current directory and run them
-        for root, _, files in os.walk('./'):
-            for file in files:
-                if(file.endswith(".py") and file.startswith("jtest_")):
-                    raw_script_path = os.path.join(root, file)
-                    script_path = os.path.normpath(raw_script_path)
-                    num_files, num_failed = _run(script_path, num_files, num_failed)
+        test_files = _discover('./', args.ignore or (), use_index=not args.no_discovery_index)
     elif test_file_path and os.path.isfile(test_file_path):
         # Case where a single jinja test file is passed in
         if test_file_path.endswith('.py'):
-            num_files, num_failed = _run(test_file_path, num_files, num_failed)
+            test_files = [test_file_path]
         else:
             print(cli_messages.INVALID_TEST_FILE)
+            test_files = []
     else:
         # Case where file path passed in does not exist
         print(cli_messages.NO_TEST_FILE.format(file=test_file_path))
         sys.exit(1)
 
+    graph = None
+    if args.affected_by is not None:
+        test_files, graph = _affected(test_files, args.affected_by)
+    if args.shard is not None:
+        test_files = _shard(test_files, args.shard, args.durations)
+
+    num_files, num_failed = _run_files(test_files, args, num_workers, graph)
+
     print(cli_messages.FINAL_MSG.format(num_files=num_files))
 
+    if args.watch:
+        _watch(test_files, args, num_workers, discover=test_file_path == 'all')
+        return
+
     if num_failed != 0:
         sys.exit(1)
 
 
+def _run_files(test_files: typing.List[str], args: argparse.Namespace, num_workers: typing.Optional[int],
+               graph: typing.Any = None) -> typing.Tuple:
+    """
+        Runs the jinja test files with the runner selected on the command line. With --cache, discovered test
+        files that passed in an earlier run with the same test file, templates and fixtures are skipped and not
+        counted as run. A test file named on the command line always runs.
+
+        :param test_files: The paths to the unit test files
+        :type test_files: List[str]
+
+        :param args: The parsed command line arguments
+        :type args: argparse.Namespace
+
+        :param num_workers: Number of worker processes, or None
+        :type num_workers: int
+
+        :param graph: Dependency graph of the test files to reuse, if any
+        :type graph: j2test.deps.DependencyGraph
+
+        :return: number of unit test files run, number of unit test files failed
+        :rtype: Tuple[int, int]
+    """
+    import j2test.shard as shard
+
+    num_files = 0
+    num_failed = 0
+    cache = None
+    if args.cache and args.file == 'all':
+        import j2test.deps as deps
+        import j2test.result_cache as result_cache
+
+        if graph is None:
+            graph = deps.load_graph(test_files)
+        cache = result_cache.ResultCache(graph=graph, ignore=args.ignore or ())
+        uncached_files = []
+        for path in test_files:
+            if cache.is_cached(path):
+                print(cli_messages.CACHED_FILE_MSG.format(path=path))
+            else:
+                uncached_files.append(path)
+        test_files = uncached_files
+        deps.save_graph(graph)
+
+    # Recorded with --shard or --durations, the shards of later runs are balanced with them
+    durations = {}
+
+    def on_result(path: str, failed: bool, duration: float) -> None:
+        durations[path] = duration
+        if cache is not None and not failed:
+            cache.record(path)
+
+    if not test_files:
+        # Every test file was cached
+        pass
+    elif args.daemon:
+        num_files, num_failed = _add(_run_daemon(test_files, args.socket, on_result), num_files, num_failed)
+    elif args.runner == RUNNER_SUBPROCESS and num_workers is None:
+        for script_path in test_files:
+            file_failed = num_failed
+            start = time.time()
+            num_files, num_failed = _run(script_path, num_files, num_failed)
+            on_result(script_path, num_failed != file_failed, time.time() - start)
+    else:
+        num_files, num_failed = _add(_run_in_process(test_files, isolate=args.runner == RUNNER_FORKED,
+                                                     num_workers=num_workers, on_result=on_result),
+                                     num_files, num_failed)
+
+    if args.shard is not None or args.durations is not None:
+        shard.save_durations(durations, args.durations or shard.DEFAULT_DURATIONS_PATH)
+    if cache is not None:
+        print(cli_messages.RESULT_CACHE_MSG.format(hits=cache.hits, misses=cache.misses, writes=cache.writes))
+    return num_files, num_failed
+
+
+def _add(counts: typing.Tuple, num_files: int, num_failed: int) -> typing.Tuple:
+    # Adds the counts of a runner to the counts so far
+    return num_files + counts[0], num_failed + counts[1]
+
+
+def _shard(test_files: typing.List[str], shard_arg: str,
+           durations_path: typing.Optional[str] = None) -> typing.List[str]:
+    """
+        Selects the test files of a shard, balanced by the recorded test file durations.
+
+        :param test_files: The paths to the unit test files
+        :type test_files: List[str]
+
+        :param shard_arg: The shard, "I/N"
+        :type shard_arg: str
+
+        :param durations_path: JSON file with the recorded durations
+        :type durations_path: str
+
+        :return: The test files of the shard
+        :rtype: List[str]
+    """
+    import j2test.shard as shard
+
+    try:
+        index, count = shard.parse_shard(shard_arg)
+    except ValueError:
+        print(cli_messages.INVALID_SHARD.format(value=shard_arg))
+        sys.exit(2)
+
+    durations = shard.load_durations(durations_path or shard.DEFAULT_DURATIONS_PATH)
+    selected = shard.select(test_files, index, count, durations)
+    print(cli_messages.SHARD_MSG.format(index=index, count=count, num_files=len(selected),
+                                        num_total=len(test_files),
+                                        num_recorded=sum(1 for path in test_files
+                                                         if shard.duration_key(path) in durations)))
+    return selected
+
+
+def _affected(test_files: typing.List[str], changed: typing.List[str]) -> typing.Tuple:
+    """
+        Finds the test files affected by changed files with the persisted dependency index.
+
+        :param test_files: The paths to the unit test files to choose from
+        :type test_files: List[str]
+
+        :param changed: Paths of the changed files, "-" reads them from stdin
+        :type changed: List[str]
+
+        :return: The affected test files, the dependency graph
+        :rtype: Tuple[List[str], j2test.deps.DependencyGraph]
+    """
+    import j2test.deps as deps
+
+    if "-" in changed:
+        changed = [path for path in changed if path != "-"]
+        changed.extend(line.strip() for line in sys.stdin if line.strip())
+
+    start = time.time()
+    graph = deps.load_graph(test_files)
+    affected = set(graph.affected(changed))
+    deps.save_graph(graph)
+    test_files = [path for path in test_files if os.path.abspath(path) in affected]
+
+    print(cli_messages.AFFECTED_MSG.format(num_changed=len(changed), num_files=len(test_files),
+                                           total_time=round(time.time() - start, 3)))
+    return test_files, graph
+
+
+def _watch(test_files: typing.List[str], args: argparse.Namespace, num_workers: typing.Optional[int],
+           discover: bool = True) -> None:
+    """
+        Watches the test files, their templates and fixtures, and reruns the affected test files on every change.
+
+        :param test_files: The paths to the unit test files
+        :type test_files: List[str]
+
+        :param args: The parsed command line arguments
+        :type args: argparse.Namespace
+
+        :param num_workers: Number of worker processes, or None
+        :type num_workers: int
+
+        :param discover: Also run test files created while watching
+        :type discover: bool
+    """
+    import j2test.deps as deps
+    import j2test.watch as watch
+
+    graph = deps.load_graph(test_files)
+    roots = graph.roots | {os.path.dirname(os.path.abspath(path)) for path in test_files}
+    if discover:
+        roots.add(os.getcwd())
+
+    def run_function(paths: typing.List[str]) -> None:
+        num_files, _ = _run_files(paths, args, num_workers, graph)
+        print(cli_messages.FINAL_MSG.format(num_files=num_files))
+
+    try:
+        watch.watch(graph, roots, run_function, discover=discover)
+    except KeyboardInterrupt:
+        pass
+
+
+def _compile(argv: typing.List[str]) -> None:
+    """
+        Entrance for "j2test compile", which precompiles all the templates under a directory into an archive
+        that can be passed to later runs with --precompiled.
+
+        :param argv: The command line arguments after "compile"
+        :type argv: List[str]
+    """
+    parser = argparse.ArgumentParser(prog='j2test compile',
+                                    usage='%(prog)s [options] [root]',
+                                    description='Precompile all the jinja templates under a directory')
+
+    parser.add_argument('root', metavar='root', type=str, default='.', nargs='?',
+                        help=("(Optional) The jinja import base directory of the templates, defaults to the "
+                            "current directory."))
+
+    parser.add_argument('-o', '--output', type=str, default='j2test_templates.zip',
+                        help="Path of the archive to create, defaults to j2test_templates.zip.")
+
+    parser.add_argument('--no-zip', action='store_true',
+                        help="Write the compiled templates to a folder instead of a zip archive.")
+
+    parser.add_argument('--extension', type=str, default='.j2',
+                        help="Only compile files with this extension, defaults to .j2.")
+
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(cli_messages.NO_TEMPLATE_ROOT.format(root=args.root))
+        sys.exit(1)
+
+    import j2test.precompile as precompile
+
+    num_templates = precompile.compile_templates(args.root, args.output, use_zip=not args.no_zip,
+                                                 extension=args.extension, log_function=print)
+    print(cli_messages.COMPILE_MSG.format(num_templates=num_templates, target=args.output))
+
+
+def _serve(argv: typing.List[str]) -> None:
+    """
+        Entrance for "j2test serve", which starts a daemon that runs the test files sent by "j2test --daemon".
+
+        :param argv: The command line arguments after "serve"
+        :type argv: List[str]
+    """
+    parser = argparse.ArgumentParser(prog='j2test serve',
+                                    usage='%(prog)s [options]',
+                                    description='Keep a warm j2test process that runs test files for clients')
+
+    parser.add_argument('--socket', metavar='PATH', type=str, default=None,
+                        help="Unix domain socket to listen on, defaults to .j2test_cache/daemon.sock.")
+
+    parser.add_argument('--stop', action='store_true',
+                        help="Stop the daemon listening on the socket.")
+
+    args = parser.parse_args(argv)
+
+    import j2test.daemon as daemon
+
+    socket_path = args.socket or daemon.DEFAULT_SOCKET_PATH
+    if args.stop:
+        if not daemon.stop(socket_path):
+            print(cli_messages.NO_DAEMON.format(path=socket_path))
+            sys.exit(1)
+        print(cli_messages.SERVE_STOPPED_MSG.format(path=socket_path))
+        return
+
+    if daemon.is_running(socket_path):
+        print(cli_messages.SERVE_RUNNING.format(path=socket_path))
+        sys.exit(1)
+
+    try:
+        daemon.serve(socket_path)
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_daemon(paths: typing.List[str], socket_path: typing.Optional[str] = None,
+                on_result: typing.Optional[typing.Callable[[str, bool, float], None]] = None) -> typing.Tuple:
+    """
+        Sends the jinja test files to the daemon started by "j2test serve" and prints the results
+        as the daemon streams them back.
+
+        :param paths: The paths to the unit test files
+        :type paths: List[str]
+
+        :param socket_path: Unix domain socket of the daemon, defaults to .j2test_cache/daemon.sock
+        :type socket_path: str
+
+        :param on_result: Called with the path of every test file, whether it failed and its duration in seconds
+        :type on_result: Callable[[str, bool, float], None]
+
+        :return: number of unit test files run, number of unit test files failed
+        :rtype: Tuple[int, int]
+    """
+    import types
+    import j2test.daemon as daemon
+
+    socket_path = socket_path or daemon.DEFAULT_SOCKET_PATH
+    start = time.time()
+    try:
+        data = daemon.run_remote(paths, socket_path, on_result=lambda result: print(result["output"], end=""))
+    except OSError:
+        print(cli_messages.NO_DAEMON.format(path=socket_path))
+        sys.exit(1)
+    except EOFError as e:
+        print(e)
+        sys.exit(1)
+    except RuntimeError as e:
+        print(cli_messages.DAEMON_ERROR.format(message=e))
+        sys.exit(1)
+    total_time = round(time.time() - start, 3)
+
+    # Lightweight stand-ins for j2test.runner.FileResult, so the client does not import the test framework
+    results = [types.SimpleNamespace(failed=result["exit_code"] != 0, **result) for result in data]
+    _print_summary(results, total_time, None)
+    if on_result is not None:
+        for result in results:
+            on_result(result.path, result.failed, result.duration)
+
+    num_files = sum(1 for result in results if os.path.exists(result.path))
+    num_failed = sum(1 for result in results if result.failed)
+    return num_files, num_failed
+
+
+def _discover(root: str, ignore: typing.Iterable[str] = (), use_index: bool = False) -> typing.List[str]:
+    """
+        Recursively finds all the jinja test files under the root directory, skipping ignored directories.
+
+        :param root: The directory to search in
+        :type root: str
+
+        :param ignore: Additional ignore patterns in the .gitignore syntax
+        :type ignore: Iterable[str]
+
+        :param use_index: Reuse the listings of the directories that did not change since the last run
+        :type use_index: bool
+
+        :return: Normalized paths to the jinja unit test files
+        :rtype: List[str]
+    """
+    import j2test.discovery as discovery
+
+    index_path = discovery.DEFAULT_INDEX_PATH if use_index else None
+    return discovery.discover(root, ignore, index_path)
+
+
+def _run_in_process(paths: typing.List[str], isolate: bool = False,
+                    num_workers: typing.Optional[int] = None,
+                    on_result: typing.Optional[typing.Callable[[str, bool, float], None]] = None) -> typing.Tuple:
+    """
+        Runs the jinja test files within this interpreter, or within a pool of worker interpreters,
+        instead of starting a python3 process per file.
+
+        :param paths: The paths to the unit test files
+        :type paths: List[str]
+
+        :param isolate: Run each test file in a forked child process
+        :type isolate: bool
+
+        :param num_workers: Number of worker processes, or None to run the files in this interpreter
+        :type num_workers: int
+
+        :param on_result: Called with the path of every test file, whether it failed and its duration in seconds
+        :type on_result: Callable[[str, bool, float], None]
+
+        :return: number of unit test files run, number of unit test files failed
+        :rtype: Tuple[int, int]
+    """
+    import j2test.runner as runner
+
+    start = time.time()
+    if num_workers is None:
+        results = runner.run_files(paths, isolate=isolate)
+    else:
+        # Worker output is buffered per file and printed as soon as the file finishes
+        results = runner.run_files_parallel(paths, num_workers, isolate=isolate,
+                                            on_result=lambda result: print(result.output, end=""))
+    total_time = round(time.time() - start, 3)
+
+    _print_summary(results, total_time, num_workers)
+    if on_result is not None:
+        for result in results:
+            on_result(result.path, result.failed, result.duration)
+
+    num_files = sum(1 for result in results if os.path.exists(result.path))
+    num_failed = sum(1 for result in results if result.failed)
+    return num_files, num_failed
+
+
+def _print_summary(results: typing.List, total_time: float, num_workers: typing.Optional[int]) -> None:
+    """
+        Prints the aggregated pass/fail counts and timings of the in-process runs.
+
+        :param results: Results of the test files
+        :type results: List[j2test.runner.FileResult]
+
+        :param total_time: Wall clock time of the whole run in seconds
+        :type total_time: float
+
+        :param num_workers: Number of worker processes used, if any
+        :type num_workers: int
+    """
+    for result in results:
+        if result.failed:
+            print(cli_messages.FAILED_FILE_MSG.format(path=result.path))
+
+    print(cli_messages.SUMMARY_MSG.format(
+        num_passed=sum(result.num_passed for result in results),
+        num_failed=sum(result.num_failed for result in results),
+        num_files=len(results),
+        total_time=total_time))
+
+    if num_workers is not None:
+        print(cli_messages.WORKERS_MSG.format(
+            num_workers=min(num_workers, len(results)),
+            file_time=round(sum(result.duration for result in results), 3)))
+
+    if os.environ.get("J2TEST_BYTECODE_CACHE"):
+        print(cli_messages.BYTECODE_CACHE_MSG.format(
+            **{name: sum(result.bytecode_cache.get(name, 0) for result in results)
+               for name in ("hits", "misses", "writes")}))
+
+
 def _run(path: str, num_files: int, num_failed: int) -> typing.Tuple:
     """
         Calls the jinja2 test file to be run and increments the number of total files run if successful.
@@ -3,3 +3,27 @@ INVALID_TEST_FILE = "ERROR: Jinja2 Unit Test file must be a python file ending i
 FINAL_MSG = "{num_files} test file(s) ran."
 RUN_FAILED = "ERROR: Failed to run {path}.\n{e}\n"
 NO_TEST_FILE_FOUND = "ERROR: No jinja unit test file found in {path}\n"
+FORKED_RUN_FAILED = "ERROR: The forked run of {path} exited without a result (status {status}).\n"
+INVALID_NUM_WORKERS = "ERROR: -n expects \"auto\" or a positive number of workers but got {value}\n"
+SUMMARY_MSG = "{num_passed} test(s) passed, {num_failed} failed in {num_files} file(s) in {total_time} seconds"
+WORKERS_MSG = "{num_workers} worker(s) spent {file_time} seconds running test files"
+FAILED_FILE_MSG = "FAILED {path}"
+BYTECODE_CACHE_MSG = "Bytecode cache: {hits} hit(s), {misses} miss(es), {writes} write(s)"
+COMPILE_MSG = "{num_templates} template(s) compiled into {target}"
+NO_TEMPLATE_ROOT = "ERROR: The template directory {root} does not exist\n"
+NO_PRECOMPILED_ARCHIVE = "ERROR: The precompiled template archive {path} does not exist\n"
+SERVE_MSG = "j2test daemon listening on {path}, stop it with \"j2test serve --stop\" or Ctrl+C"
+SERVE_STOPPED_MSG = "j2test daemon on {path} stopped"
+SERVE_REQUEST_MSG = "Ran {num_files} file(s) for a client in {total_time} seconds"
+SERVE_RUNNING = "ERROR: A j2test daemon is already listening on {path}\n"
+NO_DAEMON = "ERROR: No j2test daemon is listening on {path}, start one with \"j2test serve\"\n"
+DAEMON_DISCONNECTED = "ERROR: The j2test daemon on {path} closed the connection before the run finished\n"
+DAEMON_ERROR = "ERROR: The j2test daemon failed to run the test files.\n{message}\n"
+WATCH_MSG = "Watching {num_files} file(s) for changes, press Ctrl+C to stop"
+WATCH_RERUN_MSG = "{num_changed} file(s) changed, rerunning {num_files} affected test file(s)"
+WATCH_NOTHING_AFFECTED_MSG = "{num_changed} file(s) changed, no test file is affected"
+CACHED_FILE_MSG = "CACHED {path}, passed before and nothing it depends on changed"
+RESULT_CACHE_MSG = "Result cache: {hits} cached test file(s) skipped, {misses} miss(es), {writes} write(s), run without --cache to run every file"
+AFFECTED_MSG = "{num_changed} changed file(s) affect {num_files} test file(s), found in {total_time} seconds"
+SHARD_MSG = "Shard {index}/{count}: {num_files} of {num_total} test file(s), balanced with the recorded durations of {num_recorded} test file(s)"
+INVALID_SHARD = "ERROR: --shard must be I/N with 1 <= I <= N, e.g. 2/4, got {value}\n"
@@ -14,3 +14,26 @@ FAILED_ASSERT_EQ_STR = "Macro: {macro_name}\nassertEqualString failed.\n\tExpect
 FAILED_ASSERT_NEQ_STR = "Macro: {macro_name}\nassertNotEqualString failed. Expected output and expected to be different but are the same.\n"
 FAILED_NO_TEMPLATE = "ERROR: No template file provided or no corresponding template could be found for {filename}. Ensure it ends with .j2 and follows a valid directory structure. Checked in {path}\n"
 FAILED_TO_GET_TEMPLATE = "ERROR: Failed to get template for {filename} in {path}\n"
+FAILED_ASSERT_EQ_STR_DIFF = "Macro: {macro_name}\nassertEqualString failed.\n"
+FAILED_CASE = "Macro: {macro_name}\nCase {path}:{line_number} failed with args {args}."
+FAILED_INVALID_CASE = "Case {path}:{line_number} is invalid, {error}.\n"
+FAILED_CASE_STR = "\tExpected: {expected}\n\tBut got:  {output}\n"
+FAILED_CASE_TYPE = "\tExpected output must be a JSON object or a string, got {expected_type}\n"
+FAILED_CASE_FILE = "Macro: {macro_name}\nassertCasesFromFile failed to read {path}. {e}\n"
+CASES_SUMMARY = "assertCasesFromFile: {num_passed} of {num_cases} case(s) from {path} passed, {num_failed} failed.\n"
+CASES_NOT_REPORTED = "{num_hidden} more failed case(s) not shown, the first {max_reported} are shown (MAX_REPORTED_CASES).\n"
+FAILED_NO_SNAPSHOT = "Macro: {macro_name}\nassertMatchesSnapshot failed. Snapshot \"{key}\" is not recorded in {path}, run j2test with --update-snapshots to record it.\n"
+FAILED_SNAPSHOT = "Macro: {macro_name}\nassertMatchesSnapshot failed for snapshot \"{key}\".\n"
+FAILED_SNAPSHOT_STR = "Macro: {macro_name}\nassertMatchesSnapshot failed for snapshot \"{key}\".\n\tExpected: {expected}\n\tBut got:  {output}\n"
+FAILED_SNAPSHOT_FILE = "Macro: {macro_name}\nThe snapshot file can not be read. {e}\n"
+SNAPSHOTS_UPDATED = "Updated {num_snapshots} snapshot(s) in {path}\n"
+FAILED_STREAMED_JSON = "Macro: {macro_name}\nassertEqualJsonFileStreamed failed at JSON pointer \"{pointer}\", line {line} column {column} of {path}.\n\tExpected: {expected}\n\tBut got:  {output}\n"
+FAILED_STREAMED_STR = "Macro: {macro_name}\nassertEqualStringFileStreamed failed at line {line} column {column} of {path}.\n\tExpected: {expected}\n\tBut got:  {output}\n"
+FAILED_STREAMED_FILE = "Macro: {macro_name}\nFailed to read {path}. {e}\n"
+FAILED_NO_DIGEST = "Macro: {macro_name}\nassertOutputDigest failed. Digest \"{key}\" is not recorded in {path}, run j2test with --update-snapshots to record it.\n"
+FAILED_DIGEST = "Macro: {macro_name}\nassertOutputDigest failed for digest \"{key}\".\n\tExpected sha256: {expected}\n\tBut got sha256:  {output}\n"
+FAILED_DIGEST_JSON = "Macro: {macro_name}\nassertOutputDigest failed for digest \"{key}\", {e}.\n"
+FAILED_DIGEST_SETTINGS = "\tThe digest was recorded with ignore_order={recorded}, run j2test with --update-snapshots to record it again.\n"
+FAILED_DIGEST_LENGTH = "\tThe output has {output_length} characters, {expected_length} were recorded.\n"
+FAILED_DIGEST_SAMPLE = "\tFirst differing sample, at character {offset}:\n\t\tRecorded: {expected}\n\t\tBut got:  {output}\n"
+FAILED_DIGEST_NO_SAMPLE = "\tNone of the {num_samples} recorded sample(s) differ.\n"
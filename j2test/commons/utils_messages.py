@@ -7,9 +7,31 @@ MACRO_ARGS_ERR = "ERROR: Arguments passed in does not match macro: {e}\n"
 MACRO_RENDER_ERR = "ERROR: Failed to render macro: {macro}.\n{e}"
 JSON_DECODER_ERR = "ERROR: JSON at {path} is invalid while running {method}.\n{e}\n"
 JSON_LOAD_ERR = "ERROR: Failed to read in JSON file at: {path} while running {method}\n{e}\n"
+INVALID_JSON_BACKEND = "ERROR: Invalid JSON backend {name}, expected one of: {backends}\n"
 INVALID_YAML_ERR = "ERROR: YAML at {path} is invalid while running {method}.\n{e}\n"
+INVALID_YAML_MODE = "ERROR: Invalid YAML mode {mode}, expected \"full\" or \"safe\"\n"
 YAML_LOAD_ERR = "ERROR: Failed to read in YAML file at: {path} while running {method}\n{e}\n"
 COMPARE_JSON_MSG = "\tExpected: {expected}\n\tBut got:  {output}\n"
 DIFF_MSG = "Difference:\n{diff_map}\n"
 INVALID_STR_TYPE = "\nERROR: Incorrect assert statement used. Expected strings for the macro output and expected value but got {expected_type} for expected and {output_type} for the macro output for the following test:"
 INVALID_JSON_TYPE = "\nERROR: Incorrect assert statement used. Expected JSON for the macro output and expected value but got {expected_type} for expected and {output_type} for the macro output for the following test:"
+STRUCTURAL_DIFF_MSG = "Difference ({num_diffs} shown):\n{diffs}\n"
+STRUCTURAL_DIFF_TRUNCATED_MSG = "Difference (stopped after the first {num_diffs}):\n{diffs}\n"
+DIFF_ADDED = "\tadded    {path}: {output}"
+DIFF_REMOVED = "\tremoved  {path}: {expected}"
+DIFF_CHANGED = "\tchanged  {path}: expected {expected} but got {output}"
+FIRST_DIVERGENCE_MSG = "First difference at line {line}, column {column} (offset {offset}):\n\tExpected: {expected}\n\tBut got:  {output}\n"
+TEXT_DIFF_MSG = "Difference:\n{diff}\n"
+TEXT_DIFF_TRUNCATED_MSG = "... {num_lines} more diff line(s) not shown"
+TEXT_DIFF_SKIPPED_MSG = "Line diff skipped, {reason}.\n\tExpected: {expected_size} characters, sha256 {expected_hash}\n\tBut got:  {output_size} characters, sha256 {output_hash}\n"
+TEXT_DIFF_TOO_LARGE = "the strings are larger than {max_size} characters"
+TEXT_DIFF_TOO_MANY_EDITS = "more than {max_edits} lines differ"
+INVALID_CASE_FILE = "ERROR: Case file {path} must be one of {extensions}\n"
+INVALID_CASE_HEADER = "ERROR: The header row of a CSV case file needs an \"expected\" column, got {header}\n"
+INVALID_CASE_JSON = "the line is not valid JSON: {e}"
+INVALID_CASE_FIELDS = "a case needs an \"expected\" value and a JSON list of \"args\""
+INVALID_CASE_COLUMNS = "the row has {num_columns} column(s) but the header has {num_header}"
+SNAPSHOTS_PRUNED = "Removed {num_snapshots} snapshot(s) that are no longer asserted from {path}\n"
+INVALID_SNAPSHOT_FILE = "ERROR: {path} is not a valid snapshot file, run j2test with --update-snapshots to rewrite it\n"
+INVALID_DIGEST_JSON = "the output is not valid JSON, unexpected {token}"
+INVALID_DIGEST_VALUES = "the output holds {num_values} JSON values instead of one"
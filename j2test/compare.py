@@ -0,0 +1,116 @@
+import collections
+import numbers
+import typing
+
+# Type tags of the canonical form, so values of different JSON types never compare equal (e.g. true and 1)
+_DICT = "d"
+_LIST = "l"
+_BOOL = "b"
+_NUMBER = "n"
+_STRING = "s"
+_NULL = "z"
+_OTHER = "o"
+
+
+def json_equal(output: typing.Any, expected: typing.Any, ignore_order: bool = True) -> bool:
+    """
+        Checks whether two JSON values are equivalent in linear time, stopping at the first mismatch.
+
+        Dictionaries are compared by keys. Lists are compared element by element when ignore_order is False.
+        When ignore_order is True, lists are compared as multisets: lists in the same order are still
+        compared element by element and only lists that differ in order fall back to matching the
+        canonical forms of their elements, so no sorting is needed and lists mixing dictionaries,
+        numbers, strings and None are supported.
+
+        Values of different JSON types are never equal, e.g. true and 1, while numbers compare by value, e.g. 1 and 1.0.
+
+        :param output: Output generated by jinja macro
+        :type output: Any
+
+        :param expected: Expected JSON for the jinja macro
+        :type expected: Any
+
+        :param ignore_order: Compare lists regardless of the order of their elements
+        :type ignore_order: bool
+
+        :return: True if equivalent and False otherwise
+        :rtype: bool
+    """
+    if isinstance(output, dict):
+        if not isinstance(expected, dict) or len(output) != len(expected):
+            return False
+        for key, value in output.items():
+            if key not in expected or not json_equal(value, expected[key], ignore_order):
+                return False
+        return True
+
+    if isinstance(output, (list, tuple)):
+        if not isinstance(expected, (list, tuple)) or len(output) != len(expected):
+            return False
+        for index, (left, right) in enumerate(zip(output, expected)):
+            if not json_equal(left, right, ignore_order):
+                if not ignore_order:
+                    return False
+                # Same length but not in the same order, compare the rest as multisets
+                return _multiset_equal(output[index:], expected[index:], ignore_order)
+        return True
+
+    return _scalar_tag(output) == _scalar_tag(expected) and output == expected
+
+
+def canonical(value: typing.Any, ignore_order: bool = True) -> typing.Hashable:
+    """
+        Builds a hashable canonical form of a JSON value. Two values have the same canonical
+        form exactly when json_equal considers them equivalent.
+
+        :param value: The JSON value
+        :type value: Any
+
+        :param ignore_order: Lists are treated as multisets
+        :type ignore_order: bool
+
+        :return: Hashable canonical form
+        :rtype: Hashable
+    """
+    if isinstance(value, dict):
+        return (_DICT, frozenset((key, canonical(item, ignore_order)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        items = (canonical(item, ignore_order) for item in value)
+        if ignore_order:
+            return (_LIST, frozenset(collections.Counter(items).items()))
+        return (_LIST, tuple(items))
+    tag = _scalar_tag(value)
+    if tag == _OTHER:
+        try:
+            hash(value)
+        except TypeError:
+            return (_OTHER, repr(value))
+    return (tag, value)
+
+
+def _multiset_equal(output: typing.Sequence, expected: typing.Sequence, ignore_order: bool) -> bool:
+    """
+        Compares two lists of the same length as multisets of canonical forms, stopping at the first element
+        of the expected list that has no match left in the output list.
+    """
+    counts = collections.Counter(canonical(item, ignore_order) for item in output)
+    for item in expected:
+        key = canonical(item, ignore_order)
+        count = counts.get(key, 0)
+        if count == 0:
+            return False
+        counts[key] = count - 1
+    return True
+
+
+def _scalar_tag(value: typing.Any) -> str:
+    # bool is a subclass of int, so it has to be checked first
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, numbers.Number):
+        return _NUMBER
+    if isinstance(value, str):
+        return _STRING
+    if value is None:
+        return _NULL
+    return _OTHER
@@ -0,0 +1,286 @@
+import contextlib
+import json
+import os
+import socket
+import sys
+import sysconfig
+import time
+import traceback
+import typing
+import j2test.commons.cli_messages as cli_messages
+
+# Default path of the Unix domain socket, relative to the directory j2test is run from
+DEFAULT_SOCKET_PATH = os.path.join(".j2test_cache", "daemon.sock")
+# Environment variables of the client that are applied to the runs of its request
+ENV_PREFIX = "J2TEST_"
+# The daemon always checks the templates for changes, that is how edited templates are picked up
+AUTO_RELOAD_ENV_VAR = "J2TEST_AUTO_RELOAD"
+
+_LIBRARY_PATHS = tuple(sorted(set(
+    os.path.realpath(path) + os.sep for name, path in sysconfig.get_paths().items()
+    if name in ("stdlib", "platstdlib", "purelib", "platlib"))))
+
+
+class Daemon:
+    """
+        Long lived process that runs jinja unit test files for clients connecting to a Unix domain socket.
+
+        The test files are run in-process, so the imports, the jinja environments and the compiled templates
+        stay warm between requests. Templates are reloaded by jinja when their modification time changes,
+        test files are imported again on every run, and the modules imported by test files, e.g. shared helpers
+        next to them, are dropped and imported again once their file changes.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH,
+                 log_function: typing.Callable[[str], None] = print) -> None:
+        # Imported here so the client side of this module stays cheap to import
+        import j2test.runner as runner
+
+        self.socket_path = socket_path
+        self.log_function = log_function
+        self._runner = runner
+        self._abs_socket_path = os.path.abspath(socket_path)
+        self._baseline_modules = set(sys.modules)
+        self._module_mtimes = {}
+        self._stopped = False
+
+    def serve_forever(self) -> None:
+        """
+            Binds the socket and serves one client at a time until a stop request is received.
+            Raises OSError if another daemon is already listening on the socket.
+        """
+        socket_dir = os.path.dirname(self._abs_socket_path)
+        os.makedirs(socket_dir, exist_ok=True)
+        if os.path.exists(self._abs_socket_path):
+            if is_running(self.socket_path):
+                raise OSError(cli_messages.SERVE_RUNNING.format(path=self.socket_path))
+            # Left behind by a daemon that did not shut down cleanly
+            os.remove(self._abs_socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.socket_path)
+            server.listen(8)
+            self.log_function(cli_messages.SERVE_MSG.format(path=self.socket_path))
+            while not self._stopped:
+                connection, _ = server.accept()
+                with connection:
+                    self.handle(connection)
+        finally:
+            server.close()
+            if os.path.exists(self._abs_socket_path):
+                os.remove(self._abs_socket_path)
+            self.log_function(cli_messages.SERVE_STOPPED_MSG.format(path=self.socket_path))
+
+    def handle(self, connection: socket.socket) -> None:
+        """
+            Reads one request from the connection and streams the responses back.
+
+            :param connection: The client connection
+            :type connection: socket.socket
+        """
+        stream = connection.makefile("rwb")
+        try:
+            request = _read_message(stream)
+            if request is None:
+                return
+            command = request.get("command", "run")
+            if command == "stop":
+                self._stopped = True
+                _write_message(stream, {"type": "stopped"})
+            elif command == "ping":
+                _write_message(stream, {"type": "pong", "pid": os.getpid()})
+            else:
+                self._run(request, stream)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away, the daemon keeps serving
+            pass
+        except Exception:
+            _write_message(stream, {"type": "error", "message": traceback.format_exc()})
+        finally:
+            with contextlib.suppress(OSError):
+                stream.close()
+
+    def _run(self, request: typing.Dict[str, typing.Any], stream: typing.BinaryIO) -> None:
+        """
+            Runs the test files of a request and streams one result message per file.
+        """
+        start = time.time()
+        self._drop_changed_modules()
+        paths = request.get("paths", [])
+        try:
+            with _request_context(request):
+                for path in paths:
+                    result = self._runner.run_file(path, capture=True)
+                    _write_message(stream, {"type": "result", "result": result.to_dict()})
+        finally:
+            self._track_modules()
+        _write_message(stream, {"type": "done"})
+        self.log_function(cli_messages.SERVE_REQUEST_MSG.format(
+            num_files=len(paths), total_time=round(time.time() - start, 3)))
+
+    def _drop_changed_modules(self) -> None:
+        """
+            Removes the modules imported by earlier runs whose file changed, so they are imported again.
+        """
+        for name, (path, mtime) in list(self._module_mtimes.items()):
+            try:
+                changed = os.stat(path).st_mtime_ns != mtime
+            except OSError:
+                changed = True
+            if changed:
+                sys.modules.pop(name, None)
+                del self._module_mtimes[name]
+
+    def _track_modules(self) -> None:
+        """
+            Records the modification time of the modules the runs imported, except for installed libraries.
+        """
+        for name, module in list(sys.modules.items()):
+            if name in self._baseline_modules or name in self._module_mtimes:
+                continue
+            path = getattr(module, "__file__", None)
+            if not path or os.path.realpath(path).startswith(_LIBRARY_PATHS):
+                continue
+            with contextlib.suppress(OSError):
+                self._module_mtimes[name] = (path, os.stat(path).st_mtime_ns)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH) -> None:
+    """
+        Starts a daemon on the socket and serves clients until it is stopped.
+
+        :param socket_path: Path of the Unix domain socket
+        :type socket_path: str
+    """
+    Daemon(socket_path).serve_forever()
+
+
+def run_remote(paths: typing.List[str], socket_path: str = DEFAULT_SOCKET_PATH,
+               env: typing.Optional[typing.Dict[str, str]] = None,
+               on_result: typing.Optional[typing.Callable[[typing.Dict[str, typing.Any]], None]] = None
+               ) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+        Runs the test files in the daemon listening on the socket.
+
+        :param paths: Paths to the unit test files
+        :type paths: List[str]
+
+        :param socket_path: Path of the Unix domain socket of the daemon
+        :type socket_path: str
+
+        :param env: J2TEST_* environment variables for the run, defaults to the ones of this process
+        :type env: Dict[str, str]
+
+        :param on_result: Called with every result dictionary as soon as the daemon sends it
+        :type on_result: Callable[[Dict[str, Any]], None]
+
+        :return: The result dictionaries, see j2test.runner.FileResult.to_dict
+        :rtype: List[Dict[str, Any]]
+    """
+    if env is None:
+        env = {name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)}
+    request = {
+        "command": "run",
+        "paths": [os.path.abspath(path) for path in paths],
+        "cwd": os.getcwd(),
+        "env": env,
+    }
+
+    results = []
+    for message in _request(socket_path, request):
+        if message["type"] == "result":
+            results.append(message["result"])
+            if on_result is not None:
+                on_result(message["result"])
+        elif message["type"] == "error":
+            raise RuntimeError(message["message"])
+        elif message["type"] == "done":
+            return results
+    raise EOFError(cli_messages.DAEMON_DISCONNECTED.format(path=socket_path))
+
+
+def stop(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    """
+        Stops the daemon listening on the socket.
+
+        :param socket_path: Path of the Unix domain socket of the daemon
+        :type socket_path: str
+
+        :return: True if a daemon was stopped, False if none was listening
+        :rtype: bool
+    """
+    try:
+        return any(message["type"] == "stopped" for message in _request(socket_path, {"command": "stop"}))
+    except OSError:
+        return False
+
+
+def is_running(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    """
+        Checks whether a daemon is listening on the socket.
+
+        :param socket_path: Path of the Unix domain socket of the daemon
+        :type socket_path: str
+
+        :return: True if a daemon answered
+        :rtype: bool
+    """
+    try:
+        return any(message["type"] == "pong" for message in _request(socket_path, {"command": "ping"}))
+    except OSError:
+        return False
+
+
+def _request(socket_path: str,
+             request: typing.Dict[str, typing.Any]) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """
+        Sends a request to the daemon and yields the response messages as they arrive.
+        Raises OSError if no daemon is listening on the socket.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        stream = client.makefile("rwb")
+        _write_message(stream, request)
+        while True:
+            message = _read_message(stream)
+            if message is None:
+                return
+            yield message
+    finally:
+        client.close()
+
+
+def _write_message(stream: typing.BinaryIO, message: typing.Dict[str, typing.Any]) -> None:
+    # One JSON document per line
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def _read_message(stream: typing.BinaryIO) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+@contextlib.contextmanager
+def _request_context(request: typing.Dict[str, typing.Any]):
+    """
+        Applies the working directory and J2TEST_* environment variables of the client for the runs of a request.
+    """
+    saved_env = {name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)}
+    saved_cwd = os.getcwd()
+    for name in saved_env:
+        del os.environ[name]
+    os.environ.update({name: value for name, value in request.get("env", {}).items()
+                       if name.startswith(ENV_PREFIX) and name != AUTO_RELOAD_ENV_VAR})
+    try:
+        os.chdir(request.get("cwd", saved_cwd))
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        for name in [name for name in os.environ if name.startswith(ENV_PREFIX)]:
+            del os.environ[name]
+        os.environ.update(saved_env)
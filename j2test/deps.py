@@ -0,0 +1,444 @@
+import ast
+import json
+import os
+import tempfile
+import typing
+import jinja2
+import jinja2.meta
+from jinja2.loaders import split_template_path
+from j2test import snapshot
+
+# Files a test can depend on besides its test file and templates
+FIXTURE_EXTENSIONS = (".json", ".yaml", ".yml", ".jsonl", ".ndjson", ".csv", snapshot.SNAPSHOT_EXTENSION)
+TEMPLATE_EXTENSION = ".j2"
+# Directories never searched for test files, templates and fixtures
+SKIPPED_DIRS = frozenset(["__pycache__", "node_modules"])
+# Default path of the persisted dependency index, relative to the directory j2test is run from
+DEFAULT_INDEX_PATH = os.path.join(".j2test_cache", "deps.json")
+# Changed when the format of the index changes, older indexes are rebuilt
+INDEX_VERSION = 2
+
+
+def is_test_file(path: str) -> bool:
+    """
+        :param path: Path of a file
+        :type path: str
+
+        :return: True if the file is a jinja unit test file, jtest_*.py
+        :rtype: bool
+    """
+    name = os.path.basename(path)
+    return name.startswith("jtest_") and name.endswith(".py")
+
+
+def is_watched_file(path: str) -> bool:
+    """
+        :param path: Path of a file
+        :type path: str
+
+        :return: True if a change of the file can change the outcome of a test
+        :rtype: bool
+    """
+    return is_test_file(path) or path.endswith(TEMPLATE_EXTENSION) or path.endswith(FIXTURE_EXTENSIONS)
+
+
+class DependencyGraph:
+    """
+        Dependency graph of jinja unit test files, from each test file to its template, the templates it imports,
+        includes or extends, recursively, and the fixture files the test file names.
+
+        The references of a template are found by parsing it, like "j2test compile" does, without rendering it.
+        Templates referenced by a name that is only known when rendering, e.g. {% include name_var %},
+        are treated as depending on every template of their jinja import base directory.
+    """
+
+    def __init__(self, test_files: typing.Iterable[str] = ()) -> None:
+        # Test file -> (jinja import base directory, template, fixtures)
+        self._tests = {}
+        # (jinja import base directory, template) -> (referenced templates, has dynamic references)
+        self._templates = {}
+        # Test file or template -> modification time in nanoseconds when it was read, None if it did not exist
+        self._mtimes = {}
+        # True once the graph differs from the index it was loaded from
+        self.modified = False
+        for path in test_files:
+            self.add_test(path)
+
+    @property
+    def test_files(self) -> typing.List[str]:
+        """
+            :return: The test files in the graph
+            :rtype: List[str]
+        """
+        return sorted(self._tests)
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.abspath(path) in self._tests
+
+    @property
+    def roots(self) -> typing.Set[str]:
+        """
+            :return: The jinja import base directories of the test files
+            :rtype: Set[str]
+        """
+        return {root for root, _, _ in self._tests.values()}
+
+    def add_test(self, path: str) -> None:
+        """
+            Adds a test file to the graph, or reads it again if it is already in the graph.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+        """
+        path = os.path.abspath(path)
+        # Read before the file, so a change while it is read is seen by the next refresh
+        self._mtimes[path] = _mtime(path)
+        root, template, fixtures = _inspect_test(path)
+        self._tests[path] = (root, template, fixtures)
+        self.modified = True
+        self._add_template(root, template)
+
+    def remove_test(self, path: str) -> None:
+        """
+            Removes a test file from the graph.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+        """
+        path = os.path.abspath(path)
+        if self._tests.pop(path, None) is not None:
+            self._mtimes.pop(path, None)
+            self.modified = True
+
+    def refresh(self) -> int:
+        """
+            Reads the test files and templates again that changed since they were read, e.g. since the
+            graph was saved by an earlier run, and removes the test files that no longer exist.
+
+            :return: Number of changed test files and templates
+            :rtype: int
+        """
+        changed = {path for path, mtime in self._mtimes.items() if _mtime(path) != mtime}
+        for path, (root, template, _) in self._tests.items():
+            # A template next to a test file takes precedence over its mirrored template under jtests
+            local_template = os.path.join(os.path.dirname(path), os.path.basename(path)[6:-3] + TEMPLATE_EXTENSION)
+            if template != local_template and os.path.exists(local_template):
+                changed.add(path)
+        self._update(changed)
+        return len(changed)
+
+    def dependencies(self, path: str) -> typing.Set[str]:
+        """
+            Gets every file the test file depends on.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+
+            :return: Absolute paths of the test file, its templates and its fixtures
+            :rtype: Set[str]
+        """
+        path = os.path.abspath(path)
+        root, template, fixtures = self._tests[path]
+        result = {path}
+        result.update(fixtures)
+        stack = [template]
+        while stack:
+            template = stack.pop()
+            if template in result:
+                continue
+            result.add(template)
+            references, dynamic = self._templates[(root, template)]
+            if dynamic:
+                result.update(name for node_root, name in self._templates if node_root == root)
+            stack.extend(references)
+        return result
+
+    def affected(self, changed: typing.Iterable[str]) -> typing.List[str]:
+        """
+            Updates the graph for the changed files and gets the test files affected by them: changed test files,
+            test files whose template or any template it references changed, and test files naming a changed
+            fixture. A fixture that no test file names is assumed to belong to the test files next to it.
+
+            :param changed: Paths of the files that were changed, added or removed
+            :type changed: Iterable[str]
+
+            :return: Absolute paths of the affected test files that exist
+            :rtype: List[str]
+        """
+        changed = {os.path.abspath(path) for path in changed}
+        # Only what changed since it was read, the paths may come from a diff the graph is already up to date with
+        self._update({path for path in changed if (path in self._mtimes and _mtime(path) != self._mtimes[path])
+                      or (path not in self._mtimes and is_test_file(path))})
+
+        # Templates referencing a changed template, recursively, found by walking the references backwards
+        referenced_by = {}
+        for (root, template), (references, dynamic) in self._templates.items():
+            for reference in references:
+                referenced_by.setdefault((root, reference), set()).add(template)
+        changed_templates = [node for node in self._templates if node[1] in changed]
+        stale = set()
+        stack = list(changed_templates)
+        stack.extend(node for node, (_, dynamic) in self._templates.items()
+                     if dynamic and any(node[0] == root for root, _ in changed_templates))
+        while stack:
+            node = stack.pop()
+            if node in stale:
+                continue
+            stale.add(node)
+            stack.extend((node[0], template) for template in referenced_by.get(node, ()))
+
+        affected = set()
+        named_fixtures = set()
+        for path, (root, template, fixtures) in self._tests.items():
+            named_fixtures.update(fixtures)
+            if path in changed or (root, template) in stale or fixtures & changed:
+                affected.add(path)
+
+        for fixture in changed:
+            if fixture.endswith(FIXTURE_EXTENSIONS) and fixture not in named_fixtures:
+                affected.update(self._tests_near(fixture))
+
+        return sorted(path for path in affected if os.path.exists(path))
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+            :return: The graph as a JSON serializable dictionary, without the templates no test file depends on
+            :rtype: Dict[str, Any]
+        """
+        used = set()
+        for path, (root, template, _) in self._tests.items():
+            stack = [(root, template)]
+            while stack:
+                node = stack.pop()
+                if node in used or node not in self._templates:
+                    continue
+                used.add(node)
+                references, dynamic = self._templates[node]
+                stack.extend((node[0], reference) for reference in references)
+                if dynamic:
+                    stack.extend(other for other in self._templates if other[0] == node[0])
+
+        kept = set(self._tests) | {template for _, template in used}
+        return {
+            "version": INDEX_VERSION,
+            "jinja2": jinja2.__version__,
+            "tests": {path: [root, template, sorted(fixtures)]
+                      for path, (root, template, fixtures) in self._tests.items()},
+            "templates": [[root, template, sorted(self._templates[(root, template)][0]),
+                           self._templates[(root, template)][1]] for root, template in sorted(used)],
+            "mtimes": {path: mtime for path, mtime in self._mtimes.items() if path in kept},
+        }
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "DependencyGraph":
+        """
+            Creates a graph from a dictionary created by to_dict.
+
+            :param data: The dictionary
+            :type data: Dict[str, Any]
+
+            :return: The graph, empty if the dictionary was created by another version
+            :rtype: DependencyGraph
+        """
+        graph = cls()
+        if data.get("version") != INDEX_VERSION or data.get("jinja2") != jinja2.__version__:
+            return graph
+        graph._tests = {path: (root, template, set(fixtures))
+                        for path, (root, template, fixtures) in data["tests"].items()}
+        graph._templates = {(root, template): (set(references), dynamic)
+                            for root, template, references, dynamic in data["templates"]}
+        graph._mtimes = dict(data["mtimes"])
+        return graph
+
+    def _update(self, changed: typing.Set[str]) -> None:
+        for path in changed:
+            if is_test_file(path):
+                if os.path.exists(path):
+                    self.add_test(path)
+                else:
+                    self.remove_test(path)
+
+        for root, template in [node for node in self._templates if node[1] in changed]:
+            del self._templates[(root, template)]
+            self._add_template(root, template)
+
+    def _add_template(self, root: str, template: str) -> None:
+        stack = [template]
+        while stack:
+            template = stack.pop()
+            if (root, template) in self._templates:
+                continue
+            self._mtimes[template] = _mtime(template)
+            references, dynamic = _referenced_templates(root, template)
+            self._templates[(root, template)] = (references, dynamic)
+            self.modified = True
+            stack.extend(references)
+
+    def _tests_near(self, path: str) -> typing.Set[str]:
+        # Test files under the closest directory above the file that has any
+        directory = os.path.dirname(path)
+        while True:
+            tests = {test for test in self._tests if test.startswith(directory + os.sep)}
+            parent = os.path.dirname(directory)
+            if tests or parent == directory:
+                return tests
+            directory = parent
+
+
+def load_graph(test_files: typing.Iterable[str] = (), path: str = DEFAULT_INDEX_PATH) -> DependencyGraph:
+    """
+        Loads the dependency graph saved by an earlier run and brings it up to date: only the test files and
+        templates that changed since are read again, and the test files that are not in the graph yet are added.
+
+        :param test_files: Paths of the jinja unit test files the graph should contain
+        :type test_files: Iterable[str]
+
+        :param path: Path of the index file
+        :type path: str
+
+        :return: The dependency graph
+        :rtype: DependencyGraph
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            graph = DependencyGraph.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing or corrupted index, the graph is built from scratch
+        graph = DependencyGraph()
+
+    graph.refresh()
+    for test_file in test_files:
+        if test_file not in graph:
+            graph.add_test(test_file)
+    return graph
+
+
+def save_graph(graph: DependencyGraph, path: str = DEFAULT_INDEX_PATH) -> None:
+    """
+        Atomically saves the dependency graph for later runs, if it changed since it was loaded.
+        Nothing is saved when the index can not be written.
+
+        :param graph: The dependency graph
+        :type graph: DependencyGraph
+
+        :param path: Path of the index file
+        :type path: str
+    """
+    if not graph.modified:
+        return
+
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    except OSError:
+        # The index is only an optimization, e.g. on a read-only checkout
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(graph.to_dict(), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    graph.modified = False
+
+
+def _mtime(path: str) -> typing.Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _inspect_test(path: str) -> typing.Tuple[str, str, typing.Set[str]]:
+    """
+        Finds the template of a test file like TestTemplate._set_template, and the fixture files it names.
+
+        :param path: Absolute path of the jinja unit test file
+        :type path: str
+
+        :return: The jinja import base directory, the absolute path of the template and of the fixtures
+        :rtype: Tuple[str, str, Set[str]]
+    """
+    test_dir = os.path.dirname(path)
+    name = os.path.basename(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        tree = None
+
+    template_path = None
+    fixtures = set()
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef):
+                for statement in node.body:
+                    if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Constant) and \
+                            any(isinstance(target, ast.Name) and target.id == "TEMPLATE_PATH"
+                                for target in statement.targets) and statement.value.value:
+                        template_path = statement.value.value
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str) and \
+                    node.value.endswith(FIXTURE_EXTENSIONS):
+                fixtures.add(os.path.normpath(os.path.join(test_dir, node.value)))
+            elif isinstance(node, ast.Attribute) and node.attr in ("assertMatchesSnapshot", "assertOutputDigest"):
+                fixtures.add(snapshot.snapshot_path(path))
+
+    if template_path is not None:
+        return test_dir, os.path.normpath(os.path.join(test_dir, template_path)), fixtures
+
+    template_file = name[6:-3] + TEMPLATE_EXTENSION
+    template = os.path.join(test_dir, template_file)
+    if not os.path.exists(template) and "/jtests" in test_dir:
+        # Mirrored path relative to the closest jtests folder
+        root, template_dir = test_dir.rsplit("/jtests", 1)
+        return root, os.path.normpath(os.path.join(root, template_dir.lstrip("/"), template_file)), fixtures
+    return test_dir, template, fixtures
+
+
+def _referenced_templates(root: str, template: str) -> typing.Tuple[typing.Set[str], bool]:
+    """
+        Parses a template for the templates it imports, includes or extends.
+
+        :param root: The jinja import base directory the template is loaded from
+        :type root: str
+
+        :param template: Absolute path of the template
+        :type template: str
+
+        :return: Absolute paths of the referenced templates, True if some names are only known when rendering
+        :rtype: Tuple[Set[str], bool]
+    """
+    # Imported here to avoid the circular import, and so the CLI only imports the test framework when watching
+    import j2test.utils as utils
+
+    try:
+        with open(template, "r", encoding="utf-8") as f:
+            source = f.read()
+    except (OSError, ValueError):
+        return set(), False
+
+    try:
+        # Parsed with the environment the tests use, so the j2test extensions are known
+        parsed = utils.get_env(root).parse(source, filename=template)
+    except jinja2.exceptions.TemplateSyntaxError:
+        return set(), False
+
+    references = set()
+    dynamic = False
+    for name in jinja2.meta.find_referenced_templates(parsed):
+        if name is None:
+            dynamic = True
+            continue
+        try:
+            references.add(os.path.join(root, *split_template_path(name)))
+        except jinja2.exceptions.TemplateNotFound:
+            # Names going up with ".." can not be loaded either
+            continue
+    return references, dynamic
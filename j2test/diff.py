@@ -0,0 +1,365 @@
+import collections
+import json
+import typing
+import j2test.compare as compare
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class Difference:
+    """
+        A single difference between the expected and the output JSON, located by a JSON pointer.
+    """
+
+    def __init__(self, kind: str, path: str, expected: typing.Any = None, output: typing.Any = None) -> None:
+        self.kind = kind
+        self.path = path
+        self.expected = expected
+        self.output = output
+
+    def __eq__(self, other: typing.Any) -> bool:
+        return (isinstance(other, Difference) and self.kind == other.kind and self.path == other.path
+                and self.expected == other.expected and self.output == other.output)
+
+    def __repr__(self) -> str:
+        return "Difference({!r}, {!r})".format(self.kind, self.path)
+
+
+class _Collector:
+    """
+        Collects differences and tells the walk when to stop.
+    """
+
+    def __init__(self, max_diffs: int) -> None:
+        self.max_diffs = max_diffs
+        self.diffs = []
+        self.truncated = False
+
+    @property
+    def full(self) -> bool:
+        """
+            :return: True if no more differences can be added
+            :rtype: bool
+        """
+        return self.max_diffs is not None and len(self.diffs) >= self.max_diffs
+
+    def add(self, diff: Difference) -> None:
+        if self.full:
+            self.truncated = True
+        else:
+            self.diffs.append(diff)
+
+
+def json_diff(output: typing.Any, expected: typing.Any, ignore_order: bool = True,
+              max_diffs: typing.Optional[int] = 50) -> typing.Tuple[typing.List[Difference], bool]:
+    """
+        Structural diff between the output and the expected JSON that reports the JSON pointer of every
+        added, removed and changed value. The walk stops as soon as max_diffs differences were found.
+
+        Lists are compared with the same semantics as compare.json_equal: when ignore_order is True,
+        elements that have an equivalent element on the other side are never reported.
+
+        :param output: Output JSON
+        :type output: Any
+
+        :param expected: Expected JSON
+        :type expected: Any
+
+        :param ignore_order: Compare lists regardless of the order of their elements
+        :type ignore_order: bool
+
+        :param max_diffs: Maximum number of differences to report, None for no limit
+        :type max_diffs: int
+
+        :return: The differences and whether the diff stopped early because the limit was reached
+        :rtype: Tuple[List[Difference], bool]
+    """
+    collector = _Collector(max_diffs)
+    _walk(output, expected, "", ignore_order, collector)
+    return collector.diffs, collector.truncated
+
+
+def preview(value: typing.Any, max_length: int = 120) -> str:
+    """
+        JSON preview of a value that is cut after max_length characters. Only the previewed part
+        of the value is serialized, so previews of huge values stay cheap.
+
+        :param value: The value to preview
+        :type value: Any
+
+        :param max_length: Maximum number of characters of the preview
+        :type max_length: int
+
+        :return: The preview
+        :rtype: str
+    """
+    encoder = json.JSONEncoder(sort_keys=True, default=str, ensure_ascii=False)
+    chunks = []
+    length = 0
+    # iterencode serializes lazily, so the encoding stops once enough characters were produced
+    for chunk in encoder.iterencode(value):
+        chunks.append(chunk)
+        length += len(chunk)
+        if length > max_length:
+            return "".join(chunks)[:max_length] + "..."
+    return "".join(chunks)
+
+
+def escape_pointer(key: typing.Any) -> str:
+    """
+        Escapes a dictionary key or list index for a JSON pointer (RFC 6901).
+    """
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _walk(output: typing.Any, expected: typing.Any, path: str, ignore_order: bool, collector: _Collector) -> None:
+    if collector.full:
+        # Only tell whether there is one more difference, without walking the rest of the documents
+        if not compare.json_equal(output, expected, ignore_order):
+            collector.truncated = True
+        return
+
+    if isinstance(output, dict) and isinstance(expected, dict):
+        for key, value in expected.items():
+            child_path = path + "/" + escape_pointer(key)
+            if key not in output:
+                collector.add(Difference(REMOVED, child_path, expected=value))
+            else:
+                _walk(output[key], value, child_path, ignore_order, collector)
+            if collector.truncated:
+                return
+        for key, value in output.items():
+            if key not in expected:
+                collector.add(Difference(ADDED, path + "/" + escape_pointer(key), output=value))
+                if collector.truncated:
+                    return
+        return
+
+    if isinstance(output, (list, tuple)) and isinstance(expected, (list, tuple)):
+        if ignore_order:
+            _walk_unordered(output, expected, path, collector)
+        else:
+            _walk_ordered(output, expected, path, collector)
+        return
+
+    if not compare.json_equal(output, expected, ignore_order):
+        collector.add(Difference(CHANGED, path, expected=expected, output=output))
+
+
+def _walk_ordered(output: typing.Sequence, expected: typing.Sequence, path: str, collector: _Collector) -> None:
+    for index, (left, right) in enumerate(zip(output, expected)):
+        _walk(left, right, "{}/{}".format(path, index), False, collector)
+        if collector.truncated:
+            return
+    for index in range(len(output), len(expected)):
+        collector.add(Difference(REMOVED, "{}/{}".format(path, index), expected=expected[index]))
+    for index in range(len(expected), len(output)):
+        collector.add(Difference(ADDED, "{}/{}".format(path, index), output=output[index]))
+
+
+def _walk_unordered(output: typing.Sequence, expected: typing.Sequence, path: str, collector: _Collector) -> None:
+    # Skip the common prefix that is already in the same order
+    start = 0
+    for left, right in zip(output, expected):
+        if not compare.json_equal(left, right, True):
+            break
+        start += 1
+
+    # Match the remaining elements by their canonical forms
+    unmatched_output = collections.defaultdict(collections.deque)
+    for index in range(start, len(output)):
+        unmatched_output[compare.canonical(output[index], True)].append(index)
+
+    removed = []
+    for index in range(start, len(expected)):
+        indexes = unmatched_output.get(compare.canonical(expected[index], True))
+        if indexes:
+            indexes.popleft()
+        else:
+            removed.append(index)
+    added = sorted(index for indexes in unmatched_output.values() for index in indexes)
+
+    # When the same number of elements are unmatched on both sides, the elements were most likely
+    # changed in place, so report them as changed, with the nested differences for containers
+    if len(removed) == len(added):
+        for expected_index, output_index in zip(removed, added):
+            _walk(output[output_index], expected[expected_index], "{}/{}".format(path, expected_index),
+                  True, collector)
+            if collector.truncated:
+                return
+        return
+
+    for index in removed:
+        collector.add(Difference(REMOVED, "{}/{}".format(path, index), expected=expected[index]))
+    for index in added:
+        collector.add(Difference(ADDED, "{}/{}".format(path, index), output=output[index]))
+
+
+def first_divergence(expected: str, output: str, chunk_size: int = 65536) -> int:
+    """
+        Offset of the first character that differs between the two strings, -1 if they are equal.
+        Compares whole chunks first so long strings are scanned at C speed.
+
+        :param expected: The expected string
+        :type expected: str
+
+        :param output: The output string
+        :type output: str
+
+        :return: Offset of the first differing character, or the length of the shorter string if one is a
+                 prefix of the other, -1 if the strings are equal
+        :rtype: int
+    """
+    if expected == output:
+        return -1
+    length = min(len(expected), len(output))
+    start = 0
+    while start < length and expected[start:start + chunk_size] == output[start:start + chunk_size]:
+        start += chunk_size
+    end = min(start + chunk_size, length)
+    for offset in range(start, end):
+        if expected[offset] != output[offset]:
+            return offset
+    return end
+
+
+def line_diff(expected_lines: typing.Sequence[str], output_lines: typing.Sequence[str], context: int = 3,
+              max_edits: int = 500) -> typing.Optional[typing.List[str]]:
+    """
+        Unified line diff between the expected and output lines with the Myers algorithm.
+
+        The common leading and trailing lines are skipped in linear time before the diff, and the Myers
+        search gives up once more than max_edits lines would have to be added or removed, so the cost is
+        bounded by O((N + M) * max_edits) instead of growing quadratically with the input.
+
+        :param expected_lines: Lines of the expected string
+        :type expected_lines: Sequence[str]
+
+        :param output_lines: Lines of the output string
+        :type output_lines: Sequence[str]
+
+        :param context: Number of unchanged lines shown around every change
+        :type context: int
+
+        :param max_edits: Maximum number of added and removed lines
+        :type max_edits: int
+
+        :return: The lines of the unified diff, or None if the inputs differ in more than max_edits lines
+        :rtype: List[str]
+    """
+    prefix = 0
+    max_prefix = min(len(expected_lines), len(output_lines))
+    while prefix < max_prefix and expected_lines[prefix] == output_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and expected_lines[-1 - suffix] == output_lines[-1 - suffix]:
+        suffix += 1
+
+    a = expected_lines[prefix:len(expected_lines) - suffix]
+    b = output_lines[prefix:len(output_lines) - suffix]
+    edits = _myers(a, b, max_edits)
+    if edits is None:
+        return None
+
+    # Change blocks as (expected start, expected end, output start, output end) with absolute line numbers
+    blocks = []
+    for kind, a_index, b_index in edits:
+        a_index += prefix
+        b_index += prefix
+        if blocks and kind != "=" and blocks[-1][1] == a_index and blocks[-1][3] == b_index:
+            block = blocks[-1]
+        elif kind != "=":
+            block = [a_index, a_index, b_index, b_index]
+            blocks.append(block)
+        else:
+            continue
+        if kind == "-":
+            block[1] += 1
+        else:
+            block[3] += 1
+
+    lines = []
+    index = 0
+    while index < len(blocks):
+        # Merge the blocks whose context overlaps into one hunk
+        last = index
+        while last + 1 < len(blocks) and blocks[last + 1][0] - blocks[last][1] <= 2 * context:
+            last += 1
+        a_start = max(0, blocks[index][0] - context)
+        b_start = blocks[index][2] - (blocks[index][0] - a_start)
+        a_end = min(len(expected_lines), blocks[last][1] + context)
+        b_end = blocks[last][3] + (a_end - blocks[last][1])
+        lines.append("@@ -{} +{} @@".format(_hunk_range(a_start, a_end), _hunk_range(b_start, b_end)))
+
+        position = a_start
+        for a_from, a_to, b_from, b_to in blocks[index:last + 1]:
+            lines.extend(" " + line for line in expected_lines[position:a_from])
+            lines.extend("-" + line for line in expected_lines[a_from:a_to])
+            lines.extend("+" + line for line in output_lines[b_from:b_to])
+            position = a_to
+        lines.extend(" " + line for line in expected_lines[position:a_end])
+        index = last + 1
+
+    return lines
+
+
+def _hunk_range(start: int, end: int) -> str:
+    # Same convention as diff -u, an empty range refers to the line before it
+    if end == start:
+        return "{},0".format(start)
+    return "{},{}".format(start + 1, end - start)
+
+
+def _myers(a: typing.Sequence[str], b: typing.Sequence[str],
+           max_edits: int) -> typing.Optional[typing.List[typing.Tuple[str, int, int]]]:
+    """
+        Shortest edit script between a and b, None if it needs more than max_edits insertions and deletions.
+        Every edit is ("=", a index, b index), ("-", a index, b index) or ("+", a index, b index).
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(min(max_edits, n + m) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: typing.List[typing.Dict[int, int]], n: int, m: int) -> typing.List[typing.Tuple[str, int, int]]:
+    edits = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            edits.append(("=", x, y))
+        if d > 0:
+            if x == prev_x:
+                edits.append(("+", x, prev_y))
+            else:
+                edits.append(("-", prev_x, y))
+        x, y = prev_x, prev_y
+    edits.reverse()
+    return edits
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+import typing
+import j2test.stream_compare as stream_compare
+import j2test.commons.utils_messages as utils_messages
+
+# Type tags of the hashed values, the same as compare's so values of different JSON types never hash the same
+_DICT = b"d"
+_LIST = b"l"
+_BOOL = b"b"
+_NUMBER = b"n"
+_STRING = b"s"
+_NULL = b"z"
+# Modulus of the sums that combine the digests of the members of objects and unordered lists
+_MODULUS = 1 << 256
+# Kinds of containers
+_OBJECT = 0
+_UNORDERED = 1
+_ORDERED = 2
+# First bytes of the tokens
+_OPEN_OBJECT, _CLOSE_OBJECT, _OPEN_LIST, _CLOSE_LIST, _COMMA, _COLON, _QUOTE = b'{}[],:"'
+_INTEGER = re.compile(rb"-?(?:0|[1-9][0-9]*)")
+_NUMBER_TOKEN = re.compile(rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_NON_WHITESPACE = re.compile(r"\S")
+# Digests of short scalars are reused, keys and small values repeat a lot in large documents
+_MAX_CACHED_TOKEN = 64
+_MAX_CACHED_TOKENS = 4096
+
+
+def json_digest(chunks: typing.Iterable[str], ignore_order: bool = True) -> str:
+    """
+        Computes a SHA-256 digest of output JSON, one chunk at a time and without parsing it into Python values.
+        Two outputs have the same digest exactly when json_equal considers them equivalent: keys are unordered,
+        numbers are normalized so 1 and 1.0 are the same while true and 1 are not, strings are compared by value
+        whatever their escapes, and lists are multisets when ignore_order is True.
+
+        Every value is hashed with its type tag. Objects and unordered lists combine the digests of their members
+        with a sum, which does not depend on their order and needs no sorting, so only the open containers are
+        held in memory. Commas and colons are not checked, the output is expected to come from tojson.
+
+        :param chunks: The output, in consecutive pieces
+        :type chunks: Iterable[str]
+
+        :param ignore_order: Lists are treated as multisets
+        :type ignore_order: bool
+
+        :return: The hexadecimal digest
+        :rtype: str
+    """
+    sha256 = hashlib.sha256
+    from_bytes = int.from_bytes
+    cache = {}
+    stack = []
+    # The innermost open container: its kind, the sum or hash of its members, their number and the digest
+    # of the pending key of an object. The root is an ordered list that must end up with a single value.
+    kind, total, hasher, count, key = _ORDERED, 0, sha256(), 0, None
+    for tokens, _, _ in stream_compare.token_blocks(chunk.encode("utf-8", "surrogatepass") for chunk in chunks):
+        for token in tokens:
+            first = token[0]
+            if first == _COMMA or first == _COLON:
+                continue
+            if first == _OPEN_OBJECT:
+                stack.append((kind, total, hasher, count, key))
+                kind, total, hasher, count, key = _OBJECT, 0, None, 0, None
+                continue
+            if first == _OPEN_LIST:
+                stack.append((kind, total, hasher, count, key))
+                if ignore_order:
+                    kind, total, hasher, count, key = _UNORDERED, 0, None, 0, None
+                else:
+                    kind, total, hasher, count, key = _ORDERED, 0, sha256(), 0, None
+                continue
+
+            if first == _CLOSE_OBJECT or first == _CLOSE_LIST:
+                if not stack or (kind == _OBJECT) != (first == _CLOSE_OBJECT) or key is not None:
+                    raise _invalid(token)
+                members = hasher.digest() if kind == _ORDERED else (total % _MODULUS).to_bytes(32, "little")
+                value = sha256((_DICT if kind == _OBJECT else _LIST) + count.to_bytes(8, "little") + members).digest()
+                kind, total, hasher, count, key = stack.pop()
+            else:
+                value = cache.get(token)
+                if value is None:
+                    value = _scalar_digest(token)
+                    if len(token) <= _MAX_CACHED_TOKEN and len(cache) < _MAX_CACHED_TOKENS:
+                        cache[token] = value
+
+            if kind == _OBJECT:
+                if key is None:
+                    if first != _QUOTE:
+                        raise _invalid(token)
+                    key = value
+                    continue
+                # The key and its value are hashed together, so the sum keeps them paired
+                total += from_bytes(sha256(key + value).digest(), "little")
+                key = None
+            elif kind == _UNORDERED:
+                total += from_bytes(value, "little")
+            else:
+                hasher.update(value)
+            count += 1
+
+    if stack:
+        raise _invalid(b"<end of output>")
+    if count != 1:
+        raise ValueError(utils_messages.INVALID_DIGEST_VALUES.format(num_values=count))
+    return hasher.hexdigest()
+
+
+def text_digest(output: str, chunk_size: int = stream_compare.CHUNK_SIZE) -> str:
+    """
+        Computes a SHA-256 digest of output text, ignoring leading and trailing whitespace like assertEqualString.
+        The text is encoded and hashed one chunk at a time, so no stripped or encoded copy of the whole output
+        is made.
+
+        :param output: Rendered output
+        :type output: str
+
+        :param chunk_size: Maximum number of characters encoded at a time
+        :type chunk_size: int
+
+        :return: The hexadecimal digest
+        :rtype: str
+    """
+    hasher = hashlib.sha256()
+    match = _NON_WHITESPACE.search(output)
+    if match is None:
+        return hasher.hexdigest()
+    end = len(output)
+    while output[end - 1].isspace():
+        end -= 1
+    for start in range(match.start(), end, chunk_size):
+        hasher.update(output[start:min(start + chunk_size, end)].encode("utf-8", "surrogatepass"))
+    return hasher.hexdigest()
+
+
+def samples(output: str, count: int, length: int) -> typing.List[typing.List]:
+    """
+        Takes evenly spaced slices of the output, kept next to its digest to show where a later output differs.
+
+        :param output: Rendered output
+        :type output: str
+
+        :param count: Number of slices
+        :type count: int
+
+        :param length: Maximum number of characters per slice
+        :type length: int
+
+        :return: The offset and text of every slice
+        :rtype: List[List]
+    """
+    if count <= 0 or not output:
+        return []
+    last = max(0, len(output) - length)
+    offsets = sorted({position * last // max(1, count - 1) for position in range(count)})
+    return [[offset, output[offset:offset + length]] for offset in offsets]
+
+
+def starts_json(output: str) -> bool:
+    """
+        :param output: Rendered output
+        :type output: str
+
+        :return: True if the output starts with a JSON object or list, ignoring leading whitespace
+        :rtype: bool
+    """
+    match = _NON_WHITESPACE.search(output)
+    return match is not None and match.group() in "{["
+
+
+def _scalar_digest(token: bytes) -> bytes:
+    first = token[:1]
+    if first == b'"':
+        if len(token) < 2 or token[-1:] != b'"':
+            raise _invalid(token)
+        # Strings are hashed by value, "\u00e9" and "é" are the same string
+        value = json.loads(token).encode("utf-8", "surrogatepass") if b"\\" in token else token[1:-1]
+        return hashlib.sha256(_STRING + value).digest()
+    if token == b"true" or token == b"false":
+        return hashlib.sha256(_BOOL + token).digest()
+    if token == b"null":
+        return hashlib.sha256(_NULL).digest()
+    if _INTEGER.fullmatch(token):
+        return hashlib.sha256(_NUMBER + str(int(token)).encode("ascii")).digest()
+    if _NUMBER_TOKEN.fullmatch(token):
+        return hashlib.sha256(_NUMBER + _normalize_float(float(token)).encode("ascii")).digest()
+    raise _invalid(token)
+
+
+def _normalize_float(value: float) -> str:
+    # Integral floats are written as integers, so 1.0 and 1 or 1e3 and 1000 are the same number
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _invalid(token: bytes) -> ValueError:
+    return ValueError(utils_messages.INVALID_DIGEST_JSON.format(token=token.decode("utf-8", "replace")))
@@ -0,0 +1,320 @@
+import json
+import os
+import re
+import tempfile
+import typing
+
+# Directories that never hold jinja unit test files: version control, virtualenvs, caches and build output.
+# Uses the .gitignore syntax, a trailing "/" only matches directories.
+DEFAULT_IGNORE = (".git/", ".hg/", ".svn/", ".tox/", ".nox/", ".venv/", "venv/", "node_modules/", "__pycache__/",
+                  ".mypy_cache/", ".pytest_cache/", ".ruff_cache/", ".j2test_cache/", "*.egg-info/", "build/",
+                  "dist/")
+# Files with ignore patterns, they apply to the directory they are in and everything below it
+IGNORE_FILES = (".gitignore", ".j2testignore")
+# A directory holding this file is a virtualenv, whatever its name
+VENV_MARKER = "pyvenv.cfg"
+# Default path of the discovery index, relative to the directory j2test is run from
+DEFAULT_INDEX_PATH = os.path.join(".j2test_cache", "discovery.json")
+# Changed when the format of the index changes, older indexes are rebuilt
+INDEX_VERSION = 1
+
+
+class IgnoreRules:
+    """
+        Ignore patterns in the .gitignore syntax: "*", "?", "[...]" and "**" wildcards, "!" to include
+        a path again, a trailing "/" to only match directories, and patterns containing a "/" are relative
+        to the directory of the rules while the other patterns match a name at any depth.
+    """
+
+    def __init__(self, patterns: typing.Iterable[str]) -> None:
+        self.rules = [rule for rule in (_parse_rule(pattern) for pattern in patterns) if rule is not None]
+
+    @classmethod
+    def from_file(cls, path: str) -> "IgnoreRules":
+        """
+            :param path: Path of a .gitignore file
+            :type path: str
+
+            :return: The rules of the file, no rules if it can not be read
+            :rtype: IgnoreRules
+        """
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.read().splitlines())
+        except OSError:
+            return cls([])
+
+    def match(self, path: str, is_dir: bool) -> typing.Optional[bool]:
+        """
+            Matches a path against the rules, the last matching rule wins.
+
+            :param path: Path relative to the directory of the rules, with "/" separators
+            :type path: str
+
+            :param is_dir: The path is a directory
+            :type is_dir: bool
+
+            :return: True if ignored, False if included again by a "!" rule, None if no rule matches
+            :rtype: Optional[bool]
+        """
+        result = None
+        name = path.rsplit("/", 1)[-1]
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path if anchored else name):
+                result = not negate
+        return result
+
+
+def discover(root: str, ignore: typing.Iterable[str] = (),
+             index_path: typing.Optional[str] = None) -> typing.List[str]:
+    """
+        Recursively finds the jinja unit test files under the root directory, without descending into ignored
+        directories. Ignore patterns come from DEFAULT_IGNORE, the ignore argument, and the .gitignore and
+        .j2testignore files found along the way. Virtualenvs are always skipped.
+
+        With an index path, the directory listings are saved and a later run only lists the directories whose
+        modification time changed since, which happens when files are added, removed or renamed in them.
+
+        :param root: The directory to search in
+        :type root: str
+
+        :param ignore: Additional ignore patterns in the .gitignore syntax
+        :type ignore: Iterable[str]
+
+        :param index_path: Path of the discovery index to use and update, None to list every directory
+        :type index_path: str
+
+        :return: Normalized paths to the jinja unit test files, joined to the root
+        :rtype: List[str]
+    """
+    ignore = list(DEFAULT_IGNORE) + list(ignore)
+    old_index = _load_index(index_path, root, ignore) if index_path else {}
+    new_index = {}
+    test_files = []
+
+    # Depth first in name order: (relative directory, rules of the directories above, rescan it)
+    stack = [("", [("", IgnoreRules(ignore))], False)]
+    while stack:
+        rel_dir, rules, force = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        old_entry = None if force else old_index.get(rel_dir)
+        entry = _revalidate(abs_dir, old_entry)
+        if entry is None:
+            entry = _scan(abs_dir, rel_dir, rules)
+            if entry is None:
+                continue
+            # Changed ignore files change what is ignored below this directory as well
+            force = force or old_entry is None or old_entry["ignore"] != entry["ignore"]
+        new_index[rel_dir] = entry
+
+        test_files.extend(os.path.normpath(os.path.join(root, rel_dir, name)) for name in entry["tests"])
+        if entry["ignore"]:
+            rules = rules + [(rel_dir, IgnoreRules.from_file(os.path.join(abs_dir, name)))
+                             for name in IGNORE_FILES if name in entry["ignore"]]
+        for name in reversed(entry["dirs"]):
+            stack.append((_join(rel_dir, name), rules, force))
+
+    if index_path and new_index != old_index:
+        _save_index(index_path, root, ignore, new_index)
+    return test_files
+
+
+def iter_files(root: str, ignore: typing.Iterable[str] = ()) -> typing.Iterator[str]:
+    """
+        Recursively lists the files under the root directory, skipping what discover skips: DEFAULT_IGNORE,
+        the ignore argument, the .gitignore and .j2testignore files found along the way, and virtualenvs.
+
+        :param root: The directory to list
+        :type root: str
+
+        :param ignore: Additional ignore patterns in the .gitignore syntax
+        :type ignore: Iterable[str]
+
+        :return: Paths to the files, joined to the root
+        :rtype: Iterator[str]
+    """
+    stack = [("", [("", IgnoreRules(list(DEFAULT_IGNORE) + list(ignore)))])]
+    while stack:
+        rel_dir, rules = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            with os.scandir(abs_dir) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+
+        names = {entry.name for entry in entries}
+        if VENV_MARKER in names:
+            continue
+        rules = rules + [(rel_dir, IgnoreRules.from_file(os.path.join(abs_dir, name)))
+                         for name in IGNORE_FILES if name in names]
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            rel_path = _join(rel_dir, entry.name)
+            if _is_ignored(rel_path, is_dir, rules):
+                continue
+            if is_dir:
+                stack.append((rel_path, rules))
+            else:
+                yield entry.path
+
+
+def _revalidate(abs_dir: str, entry: typing.Optional[typing.Dict]) -> typing.Optional[typing.Dict]:
+    # The saved listing of the directory if neither the directory nor its ignore files changed
+    if entry is None or _mtime(abs_dir) != entry["mtime"]:
+        return None
+    for name, mtime in entry["ignore"].items():
+        if _mtime(os.path.join(abs_dir, name)) != mtime:
+            return None
+    return entry
+
+
+def _scan(abs_dir: str, rel_dir: str, rules: typing.List) -> typing.Optional[typing.Dict]:
+    """
+        Lists a directory and applies the ignore rules to its entries.
+
+        :return: The modification times of the directory and its ignore files, the subdirectories to descend
+                 into and the test files, None if the directory can not be listed
+        :rtype: Dict
+    """
+    mtime = _mtime(abs_dir)
+    try:
+        with os.scandir(abs_dir) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+    except OSError:
+        return None
+
+    names = {entry.name for entry in entries}
+    entry = {"mtime": mtime, "ignore": {}, "dirs": [], "tests": []}
+    if VENV_MARKER in names:
+        return entry
+
+    for name in IGNORE_FILES:
+        if name in names:
+            entry["ignore"][name] = _mtime(os.path.join(abs_dir, name))
+            rules = rules + [(rel_dir, IgnoreRules.from_file(os.path.join(abs_dir, name)))]
+
+    for dir_entry in entries:
+        try:
+            is_dir = dir_entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if not is_dir and not (dir_entry.name.startswith("jtest_") and dir_entry.name.endswith(".py")):
+            continue
+        if _is_ignored(_join(rel_dir, dir_entry.name), is_dir, rules):
+            continue
+        entry["dirs" if is_dir else "tests"].append(dir_entry.name)
+    return entry
+
+
+def _is_ignored(rel_path: str, is_dir: bool, rules: typing.List) -> bool:
+    # Rules of deeper directories are applied last and win, like nested .gitignore files
+    ignored = False
+    for base, ignore_rules in rules:
+        path = rel_path[len(base) + 1:] if base else rel_path
+        result = ignore_rules.match(path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def _parse_rule(pattern: str) -> typing.Optional[typing.Tuple]:
+    pattern = pattern.rstrip("\n")
+    if not pattern.strip() or pattern.startswith("#"):
+        return None
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    pattern = pattern.rstrip(" ")
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+    return re.compile(_translate(pattern) + r"\Z"), negate, dir_only, anchored
+
+
+def _translate(pattern: str) -> str:
+    """
+        Translates a .gitignore pattern to a regular expression, where wildcards do not match "/" except "**".
+    """
+    result = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            # Zero or more directories
+            result.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            result.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            result.append("[" + content.replace("\\", "\\\\") + "]")
+            i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            result.append(re.escape(pattern[i]))
+        else:
+            result.append(re.escape(char))
+        i += 1
+    return "".join(result)
+
+
+def _join(rel_dir: str, name: str) -> str:
+    return rel_dir + "/" + name if rel_dir else name
+
+
+def _mtime(path: str) -> typing.Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_index(path: str, root: str, ignore: typing.List[str]) -> typing.Dict[str, typing.Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION or \
+            data.get("root") != os.path.abspath(root) or data.get("ignore") != ignore:
+        # Built for another directory or with other ignore patterns
+        return {}
+    return data.get("dirs", {})
+
+
+def _save_index(path: str, root: str, ignore: typing.List[str], dirs: typing.Dict[str, typing.Dict]) -> None:
+    data = {"version": INDEX_VERSION, "root": os.path.abspath(root), "ignore": ignore, "dirs": dirs}
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    except OSError:
+        # The index is only an optimization, e.g. on a read-only checkout
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
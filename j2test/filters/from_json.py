@@ -1,10 +1,10 @@
-import rapidjson as json
 import typing as t
+import j2test.json_backend as json_backend
 
 
 def from_json_filter(data: str) -> t.Any:
     """
-    A wrapper around json.loads(), which unmarshals a string representation
+    A wrapper around the loads() of the configured JSON backend, which unmarshals a string representation
     of a JSON object into its equivalent JSON object
 
     :param data: The string representation of the JSON object
@@ -13,4 +13,4 @@ def from_json_filter(data: str) -> t.Any:
     :return: The corresponding JSON object
     :rtype: Any
     """
-    return json.loads(data)
+    return json_backend.loads(data)
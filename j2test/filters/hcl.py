@@ -3,8 +3,8 @@ Helper filters for converting from native python types
 to stringified hcl types (map, string)
 """
 
-import rapidjson as json
 import typing as t
+import j2test.json_backend as json_backend
 
 # unique character string for later string substitution
 ESCAPE_TOKEN = "!ESCAPE_TOKEN!"
@@ -22,7 +22,7 @@ def stringify_hcl_map_filter(data: t.Dict[str, str]) -> str:
     """
     hcl_list = ["{}=\"{}\"".format(k, v) for k, v in data.items()]
     result_raw = "{" + ",".join(hcl_list) + "}"
-    stringified = json.dumps(result_raw)
+    stringified = json_backend.dumps(result_raw)
     return stringified
 
 
@@ -45,7 +45,7 @@ def stringify_dict_filter(data: t.Dict[str, str]) -> str:
     """
 
     raw_string = str(data).replace("\"", ESCAPE_TOKEN)
-    raw_json = json.dumps(raw_string)
+    raw_json = json_backend.dumps(raw_string)
     stringified = raw_json \
         .replace(ESCAPE_TOKEN, "\\\\\\\"")\
         .replace("'", "\\\"")\
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import importlib
+import typing as t
+from jinja2.utils import pass_context
+
+
+class LazyFilter:
+    """
+    Lightweight proxy for a filter or global function that imports the module of the function
+    the first time it is called, so heavy dependencies are only imported by templates that use them.
+    """
+
+    def __init__(self, module_name: str, function_name: str) -> None:
+        self.module_name = module_name
+        self.function_name = function_name
+        self._function = None
+
+    def __call__(self, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        return self.resolve()(*args, **kwargs)
+
+    def resolve(self) -> t.Callable:
+        """
+        Imports the module and gets the function
+
+        :return: The function behind the proxy
+        :rtype: Callable
+        """
+        if self._function is None:
+            module = importlib.import_module(self.module_name)
+            self._function = getattr(module, self.function_name)
+        return self._function
+
+    def __repr__(self) -> str:
+        return "<LazyFilter {}.{}>".format(self.module_name, self.function_name)
+
+
+def lazy_filter(module_name: str, function_name: str, with_context: bool = False) -> LazyFilter:
+    """
+    Creates a proxy for a filter or global function.
+
+    Jinja reads whether a function takes the context when the template is compiled, before it is called,
+    so it has to be declared here for functions decorated with pass_context.
+
+    :param module_name: The module of the function, e.g. "j2test.filters.jsonmerge"
+    :type module_name: str
+
+    :param function_name: The name of the function in the module
+    :type function_name: str
+
+    :param with_context: The function is decorated with jinja2.pass_context
+    :type with_context: bool
+
+    :return: The proxy
+    :rtype: LazyFilter
+    """
+    proxy = LazyFilter(module_name, function_name)
+    if with_context:
+        proxy = pass_context(proxy)
+    return proxy
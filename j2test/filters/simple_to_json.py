@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import typing as t
-import rapidjson as json
+import j2test.json_backend as json_backend
 
 
 def simple_to_json_filter(
@@ -10,8 +10,8 @@ def simple_to_json_filter(
     sort_keys: bool = True,
 ) -> str:
     """
-    A wrapper around json.dumps(), which exposes only indent and sort_keys
-    arguments.
+    A wrapper around the dumps() of the configured JSON backend, which
+    exposes only indent and sort_keys arguments.
 
     NOTE: This function is meant to be used as a replacement for
         the standard Jinja2 "tojson" filter. This replacement is required
@@ -36,4 +36,4 @@ def simple_to_json_filter(
     :return: The corresponding JSON string
     :rtype: string
     """
-    return json.dumps(value, indent=indent, sort_keys=sort_keys)
+    return json_backend.dumps(value, indent=indent, sort_keys=sort_keys)
@@ -1,8 +1,25 @@
 #!/usr/bin/env python3
 
 import io
+import re
+import threading
 import ruamel.yaml
 import typing as t
+import yaml as pyyaml
+
+# Use the libyaml based dumper of PyYAML for plain data when PyYAML was built with libyaml.
+# Only data that it dumps byte for byte like the ruamel.yaml round-trip dumper takes this path.
+use_c_dumper = getattr(pyyaml, "__with_libyaml__", False)
+
+# Strings that both dumpers write as plain scalars: no spaces so they are never wrapped, no indicators,
+# and not starting with a digit or a dot so they never look like numbers, timestamps or .inf/.nan
+_PLAIN_STRING = re.compile(r"[A-Za-z_][A-Za-z0-9_./-]*\Z")
+# Right margin of the plain data, well below the line width of 80 of both dumpers
+_MAX_COLUMN = 70
+# YAML 1.1 booleans and null that PyYAML quotes while ruamel.yaml (YAML 1.2) does not
+_YAML_11_WORDS = frozenset(["y", "n", "yes", "no", "on", "off", "true", "false", "null"])
+
+_engines = threading.local()
 
 
 def yaml_load(yml_fp: t.Union[t.TextIO, t.BinaryIO]) -> t.Dict[str, t.Any]:
@@ -11,13 +28,15 @@ def yaml_load(yml_fp: t.Union[t.TextIO, t.BinaryIO]) -> t.Dict[str, t.Any]:
 
 
 def yaml_dump(data: t.Dict[str, t.Any], fp: t.TextIO) -> None:
-    yaml = ruamel.yaml.YAML(typ="rt")
-    yaml.dump(data, stream=fp)
+    if use_c_dumper and _is_plain(data):
+        pyyaml.dump(data, fp, Dumper=_CPlainDumper, default_flow_style=False, sort_keys=False,
+                    allow_unicode=True)
+    else:
+        _get_engine("rt").dump(data, stream=fp)
 
 
 def yaml_loads(yml_data: str) -> t.Dict[str, t.Any]:
-    yaml = ruamel.yaml.YAML(typ="safe")
-    return yaml.load(yml_data)
+    return _get_engine("safe").load(yml_data)
 
 
 def yaml_dumps(data: t.Dict[str, t.Any]) -> str:
@@ -31,20 +50,88 @@ def yaml_dumps_inline(data: t.Dict[str, t.Any], indent: int) -> str:
     indent - How many spaces to indent each line, except the first
     inline - If False, treat data as an entire document
     """
-    val = yaml_dumps(data)
+    padding = "".rjust(indent)
+    stream = _IndentingStream(padding)
+    yaml_dump(data, stream)
+    val = stream.getvalue()
 
     # Below this line, we're just encoding a fragment.
 
-    lines = val.split("\n")
-    new_lines = [lines[0]]  # don't indent the first line
-    for line in lines[1:]:
-        if line == "...":
-            # inline means "not a document", so don't allow an end token
-            continue
-        new_lines.append("{}{}".format("".rjust(indent), line))
+    # inline means "not a document", so don't allow an end token
+    end_token = "\n" + padding + "...\n"
+    while end_token in val:
+        val = val.replace(end_token, "\n")
 
     # ruamel.yaml always adds an extra newline; kill it
-    if new_lines[-1].strip() == "":
-        new_lines = new_lines[:-1]
+    last_line = val.rfind("\n") + 1
+    if val[last_line:].strip() == "":
+        val = val[:max(last_line - 1, 0)]
+
+    return val
+
+
+class _IndentingStream(io.StringIO):
+    """
+    Text stream that indents every line except the first while the YAML is written,
+    so the dumped document does not have to be split and joined again
+    """
+
+    def __init__(self, padding: str) -> None:
+        super().__init__()
+        self._padding = "\n" + padding
+
+    def write(self, s: str) -> int:
+        if self._padding != "\n":
+            s = s.replace("\n", self._padding)
+        return super().write(s)
+
+
+class _CPlainDumper(getattr(pyyaml, "CSafeDumper", pyyaml.SafeDumper)):  # type: ignore
+    """
+    libyaml based safe dumper that writes None like the ruamel.yaml round-trip dumper
+    """
+
+
+_CPlainDumper.add_representer(
+    type(None), lambda dumper, data: dumper.represent_scalar("tag:yaml.org,2002:null", ""))
+
+
+def _get_engine(typ: str) -> ruamel.yaml.YAML:
+    # ruamel.yaml.YAML objects are expensive to build and not thread safe, keep one per thread and type
+    engine = getattr(_engines, typ, None)
+    if engine is None:
+        engine = ruamel.yaml.YAML(typ=typ)
+        setattr(_engines, typ, engine)
+    return engine
+
+
+def _is_plain(data: t.Any) -> bool:
+    # Only mappings and sequences at the top, ruamel.yaml ends documents of a single scalar differently
+    return type(data) in (dict, list) and _is_plain_node(data, 0)
+
+
+def _is_plain_node(data: t.Any, column: int) -> bool:
+    # column is where the node starts, scalars that would come close to the line width are left to
+    # ruamel.yaml because the two dumpers move them to the next line differently
+    data_type = type(data)
+    if data_type is dict:
+        for key, value in data.items():
+            if type(key) is not str or not _is_plain_string(key, column):
+                return False
+            # None is only written the same way as a mapping value, in a sequence ruamel.yaml adds a space
+            if value is None:
+                continue
+            value_column = column + len(key) + 2 if type(value) not in (dict, list) else column + 2
+            if not _is_plain_node(value, value_column):
+                return False
+        return True
+    if data_type is list:
+        return all(item is not None and _is_plain_node(item, column + 2) for item in data)
+    if data_type is str:
+        return _is_plain_string(data, column)
+    return (data_type is int or data_type is bool) and column + len(str(data)) <= _MAX_COLUMN
+
 
-    return "\n".join(new_lines)
+def _is_plain_string(value: str, column: int) -> bool:
+    return (column + len(value) <= _MAX_COLUMN and _PLAIN_STRING.match(value) is not None
+            and value.lower() not in _YAML_11_WORDS)
@@ -0,0 +1,108 @@
+import collections
+import copy
+import os
+import typing
+
+# Environment variable with the size limit of the fixture cache in megabytes
+CACHE_SIZE_ENV_VAR = "J2TEST_FIXTURE_CACHE_MB"
+DEFAULT_CACHE_SIZE_MB = 256
+
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None), bytes)
+
+
+class FixtureCache:
+    """
+        Process wide cache of parsed fixture files, such as expected JSON and YAML variable files.
+
+        Entries are keyed by the normalized path and the loader and are invalidated when the modification
+        time or size of the file changes. The cache is bounded by the total size of the cached files and
+        evicts the least recently used entries first. Callers always get their own copy of the parsed data,
+        so a test that mutates a fixture can not corrupt the fixture of another test.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def load(self, path: str, loader: typing.Callable[[str], typing.Any]) -> typing.Any:
+        """
+            Gets a copy of the parsed file, parsing it with the loader only if it is not cached or changed.
+
+            :param path: Path to the file
+            :type path: str
+
+            :param loader: Parses the file at the given path, errors are raised to the caller.
+                           Should be a module level function, the same file parsed by different loaders is
+                           cached separately.
+            :type loader: Callable[[str], Any]
+
+            :return: Copy of the parsed file
+            :rtype: Any
+        """
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        key = (real_path, loader)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy_json(entry[2])
+
+        self.misses += 1
+        value = loader(path)
+        self._remove(key)
+        if stat.st_size <= self.max_bytes:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, value)
+            self.size += stat.st_size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return copy_json(value)
+
+    def clear(self) -> None:
+        """
+            Drops all the cached files.
+        """
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: typing.Tuple[str, typing.Callable]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+def copy_json(value: typing.Any) -> typing.Any:
+    """
+        Copies parsed JSON or YAML data. Much cheaper than copy.deepcopy for plain dictionaries, lists
+        and scalars, other values fall back to copy.deepcopy.
+
+        :param value: The data to copy
+        :type value: Any
+
+        :return: The copy
+        :rtype: Any
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if type(value) is dict:
+        return {key: copy_json(item) for key, item in value.items()}
+    if type(value) is list:
+        return [copy_json(item) for item in value]
+    return copy.deepcopy(value)
+
+
+def _default_size() -> int:
+    try:
+        return int(float(os.environ.get(CACHE_SIZE_ENV_VAR, DEFAULT_CACHE_SIZE_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_CACHE_SIZE_MB * 1024 * 1024
+
+
+fixture_cache = FixtureCache(_default_size())
@@ -1,5 +1,14 @@
 import j2test.utils as utils
+import j2test.cases as cases
+import j2test.snapshot as snapshot
+import j2test.stream_compare as stream_compare
+import j2test.digest as digest
+import j2test.diff as diff
+import j2test.render_cache as render_cache
+import j2test.json_backend as json_backend
 import j2test.commons.j2test_messages as j2test_messages
+import contextlib
+import io
 import time
 import sys
 import os
@@ -7,6 +16,10 @@ import inspect
 import typing
 from termcolor import colored
 
+# Test classes that finished running are appended to it while the in-process runner imports a test file,
+# so classes run at import time are not run again, see j2test.runner
+_import_runs = None
+
 
 class TestTemplate:
     """
@@ -21,6 +34,22 @@ class TestTemplate:
     TEMPLATE_PATH = ""
     PRINT_ALL = True  # Need to find an elegant way of passing CLI flag to j2test class
     HEADER_WIDTH = 80
+    MAX_DIFFS = 50  # Maximum number of differences printed when a JSON assertion fails
+    DIFF_PREVIEW_LENGTH = 120  # Maximum number of characters printed per differing value
+    DOCUMENT_PREVIEW_LENGTH = 2000  # Maximum number of characters printed for the whole output and expected JSON
+    MAX_DIFF_LINES = 200  # Maximum number of line diff lines printed when a string assertion fails
+    CACHE_FIXTURES = True  # Reuse JSON and YAML files parsed earlier in the process, tests always get their own copy
+    YAML_MODE = None  # "full" or "safe", None uses the J2TEST_YAML_MODE environment variable set by the CLI or "full"
+    AUTO_RELOAD = None  # None uses the J2TEST_AUTO_RELOAD environment variable set by the CLI, True otherwise
+    BYTECODE_CACHE_DIR = None  # None uses the J2TEST_BYTECODE_CACHE environment variable set by the CLI, if any
+    PRECOMPILED_PATH = None  # None uses the J2TEST_PRECOMPILED environment variable set by the CLI, if any
+    NATIVE_RENDERING = False  # Macros that only output a tojson value return the value without a JSON round trip
+    MAX_REPORTED_CASES = 20  # Maximum number of failed cases printed by assertCasesFromFile, the others are counted
+    COMPRESS_SNAPSHOTS = True  # Compress large entries of the snapshot file with zlib when recording snapshots
+    DIGEST_SAMPLES = 0  # Number of slices of the output recorded with a digest by assertOutputDigest
+    DIGEST_SAMPLE_LENGTH = 80  # Maximum number of characters per recorded slice
+    CACHE_RENDERS = False  # Reuse the output of a macro called again with the same arguments during the run
+    RENDER_CACHE_SIZE = 128  # Maximum number of macro outputs kept when CACHE_RENDERS is True
 
     _num_tests = 0
     _num_passed = 0
@@ -30,6 +59,10 @@ class TestTemplate:
     _curr_method = ""
     _curr_path = ""
     _child_filename = ""
+    _failed_tests = []
+    _snapshot_store = None
+    _new_snapshots = {}
+    _render_cache = None
 
     def run(self) -> None:
         """
@@ -38,6 +71,10 @@ class TestTemplate:
         self._num_tests = 0
         self._num_passed = 0
         self._num_failed = 0
+        self._failed_tests = []
+        self._snapshot_store = None
+        self._new_snapshots = {}
+        self._render_cache = render_cache.RenderCache(self.RENDER_CACHE_SIZE) if self.CACHE_RENDERS else None
 
         start = time.time()
 
@@ -55,9 +92,16 @@ class TestTemplate:
         # Get all the attributes of the child test class
         attrs = (getattr(self, name) for name in dir(self))
 
+        # Tests selected with "j2test -k", as test_name or ClassName.test_name
+        selected = os.environ.get(utils.SELECT_ENV_VAR)
+        selected = set(selected.split(",")) if selected else None
+
         # Iterate through the functions and only run the functions that starts with "test"
         for method in attrs:
             if callable(method) and method.__name__.startswith("test"):
+                if selected is not None and method.__name__ not in selected and \
+                        "{}.{}".format(type(self).__name__, method.__name__) not in selected:
+                    continue
                 self._num_tests += 1
                 self._curr_failed = False
                 self._curr_method = method.__name__
@@ -73,9 +117,14 @@ class TestTemplate:
 
                 if self._curr_failed:
                     self._num_failed += 1
+                    self._failed_tests.append(self._curr_method)
                 else:
                     self._num_passed += 1
 
+        self._save_snapshots(complete=selected is None and self._num_failed == 0)
+        if _import_runs is not None:
+            _import_runs.append(self)
+
         if self._num_tests == 0:
             print(colored(j2test_messages.NO_TESTS_FOUND.center(
                 self.HEADER_WIDTH, '='), 'yellow'), end="\n\n")
@@ -94,7 +143,7 @@ class TestTemplate:
                           center(self.HEADER_WIDTH, '='), 'red'), end="\n\n")
             sys.exit(1)
 
-    def assertEqualJsonFile(self, macro_name: str, args: any, expected_path: str) -> bool:
+    def assertEqualJsonFile(self, macro_name: str, args: any, expected_path: str, ignore_order: bool = True) -> bool:
         """
             Asserts that the rendered JSON output and the expected JSON are the same.
             Renders the macro with the args passed in and retrieves the expected json file.
@@ -109,6 +158,9 @@ class TestTemplate:
             :param expected_path: Path relative to test file where expected JSON is
             :type expected_path: str
 
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
             :return: True if same and false otherwise
             :rtype: bool
         """
@@ -120,9 +172,9 @@ class TestTemplate:
             self._curr_failed = True
             return False
 
-        return self.assertEqualJson(macro_name, args, expected)
+        return self.assertEqualJson(macro_name, args, expected, ignore_order)
 
-    def assertNotEqualJsonFile(self, macro_name: str, args: any, expected_path: str) -> bool:
+    def assertNotEqualJsonFile(self, macro_name: str, args: any, expected_path: str, ignore_order: bool = True) -> bool:
         """
             Asserts that the rendered JSON output and the expected JSON are different.
             Renders the macro with the args passed in and retrieves the expected json file.
@@ -137,6 +189,9 @@ class TestTemplate:
             :param expected_path: Path relative to test file where expected JSON is
             :type expected_path: str
 
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
             :return: True if different and false if they are the same
             :rtype: bool
         """
@@ -148,9 +203,9 @@ class TestTemplate:
             self._curr_failed = True
             return False
 
-        return self.assertNotEqualJson(macro_name, args, expected)
+        return self.assertNotEqualJson(macro_name, args, expected, ignore_order)
 
-    def assertEqualJson(self, macro_name: str, args: any, expected: dict) -> bool:
+    def assertEqualJson(self, macro_name: str, args: any, expected: dict, ignore_order: bool = True) -> bool:
         """
             Asserts that the rendered JSON output and the expected JSON are the same.
             Renders the macro with the args passed in and compares it with the expected output
@@ -165,6 +220,9 @@ class TestTemplate:
             :param expected: dictionary
             :type expected: Dict[str, any]
 
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
             :return: True if same and false otherwise
             :rtype: bool
         """
@@ -172,7 +230,7 @@ class TestTemplate:
             return False
 
         output = self.render_macro_json(macro_name, args)
-        result = utils.assert_json(output, expected)
+        result = utils.assert_json(output, expected, ignore_order)
 
         if result:
             return True
@@ -181,7 +239,8 @@ class TestTemplate:
                           format(curr_method=self._curr_method).
                           center(self.HEADER_WIDTH, '_'), 'red'))
             print(j2test_messages.FAILED_ASSERT_EQ_JSON.format(macro_name=macro_name))
-            utils.json_diff(output, expected, self.PRINT_ALL)
+            utils.print_json_diff(output, expected, self.PRINT_ALL, ignore_order, self.MAX_DIFFS,
+                                  self.DIFF_PREVIEW_LENGTH, self.DOCUMENT_PREVIEW_LENGTH)
         else:
             print(colored(j2test_messages.FAILED_NO_JSON_OUTPUT.
                           format(curr_method=self._curr_method).
@@ -190,7 +249,7 @@ class TestTemplate:
         self._curr_failed = True
         return False
 
-    def assertNotEqualJson(self, macro_name: str, args: any, expected: dict) -> bool:
+    def assertNotEqualJson(self, macro_name: str, args: any, expected: dict, ignore_order: bool = True) -> bool:
         """
             Asserts that the rendered JSON output and the expected JSON are different.
             Renders the macro with the args passed in and compares it with the expected
@@ -205,6 +264,9 @@ class TestTemplate:
             :param expected: dictionary
             :type expected: Dict[str, any]
 
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
             :return: True if different and false if they are the same
             :rtype: bool
         """
@@ -212,7 +274,7 @@ class TestTemplate:
             return False
 
         output = self.render_macro_json(macro_name, args)
-        result = utils.assert_json(output, expected)
+        result = utils.assert_json(output, expected, ignore_order)
 
         if result:
             print(colored(j2test_messages.FAILED_METHOD_NAME.
@@ -259,8 +321,16 @@ class TestTemplate:
             print(colored(j2test_messages.FAILED_METHOD_NAME.
                           format(curr_method=self._curr_method).
                           center(self.HEADER_WIDTH, '_'), 'red'))
-            print(j2test_messages.FAILED_ASSERT_EQ_STR.format(
-                macro_name=macro_name, expected=expected, output=output.strip()))
+            if isinstance(expected, str) and isinstance(output, str) and \
+                    ("\n" in expected.strip() or "\n" in output.strip() or
+                     len(expected) + len(output) > self.DIFF_PREVIEW_LENGTH):
+                # Large or multi line strings are reported as a bounded line diff instead of printed in full
+                print(j2test_messages.FAILED_ASSERT_EQ_STR_DIFF.format(macro_name=macro_name))
+                utils.print_string_diff(output, expected, max_diff_lines=self.MAX_DIFF_LINES,
+                                        line_length=self.DIFF_PREVIEW_LENGTH)
+            else:
+                print(j2test_messages.FAILED_ASSERT_EQ_STR.format(
+                    macro_name=macro_name, expected=expected, output=output.strip()))
         else:
             print(colored(j2test_messages.FAILED_NO_STR_OUTPUT.
                           format(curr_method=self._curr_method).
@@ -307,6 +377,436 @@ class TestTemplate:
         self._curr_failed = True
         return False
 
+    def assertEqualJsonFileStreamed(self, macro_name: str, args: any, expected_path: str) -> bool:
+        """
+            Asserts that the rendered JSON output and the expected JSON file are the same, for outputs too large
+            to be parsed into Python values. The expected file is memory-mapped and both sides are compared token
+            by token, one chunk at a time, until the first difference. Unlike assertEqualJsonFile, the keys of
+            objects and the elements of lists must be in the same order on both sides.
+
+            :param macro_name: The name of macro function
+            :type macro_name: str
+
+            :param args: An array of arguments passed to the macro to render it
+            :type args: [*]
+
+            :param expected_path: Path relative to test file where expected JSON is
+            :type expected_path: str
+
+            :return: True if same and false otherwise
+            :rtype: bool
+        """
+        return self._assert_streamed(macro_name, args, expected_path, stream_compare.compare_json,
+                                     j2test_messages.FAILED_STREAMED_JSON, j2test_messages.FAILED_NO_JSON_OUTPUT)
+
+    def assertEqualStringFileStreamed(self, macro_name: str, args: any, expected_path: str) -> bool:
+        """
+            Asserts that the rendered string output and the content of the expected file are the same, ignoring
+            leading and trailing whitespace like assertEqualString. The expected file is memory-mapped and
+            compared one chunk at a time until the first difference, so it is never read into memory.
+
+            :param macro_name: The name of macro function
+            :type macro_name: str
+
+            :param args: An array of arguments passed to the macro to render it
+            :type args: [*]
+
+            :param expected_path: Path relative to test file where the expected output is
+            :type expected_path: str
+
+            :return: True if same and false otherwise
+            :rtype: bool
+        """
+        return self._assert_streamed(macro_name, args, expected_path, stream_compare.compare_text,
+                                     j2test_messages.FAILED_STREAMED_STR, j2test_messages.FAILED_NO_STR_OUTPUT)
+
+    def _assert_streamed(self, macro_name: str, args: any, expected_path: str, compare: typing.Callable,
+                         failed_message: str, no_output_message: str) -> bool:
+        """
+            Renders the macro and compares its output with an expected file using a stream_compare function.
+        """
+        if self._curr_failed is True:
+            return False
+
+        output = self.render_macro_str(macro_name, args)
+        if output is None:
+            print(colored(no_output_message.
+                          format(curr_method=self._curr_method).
+                          center(self.HEADER_WIDTH, '_'), 'red'))
+            self._curr_failed = True
+            return False
+
+        try:
+            with stream_compare.open_expected(os.path.join(self._curr_path, expected_path)) as expected:
+                divergence = compare(stream_compare.iter_chunks(output), expected, self.DIFF_PREVIEW_LENGTH)
+        except OSError as e:
+            self._print_failed_method(True)
+            print(j2test_messages.FAILED_STREAMED_FILE.format(macro_name=macro_name, path=expected_path, e=e))
+            self._curr_failed = True
+            return False
+
+        if divergence is None:
+            return True
+        self._print_failed_method(True)
+        print(failed_message.format(macro_name=macro_name, path=expected_path, pointer=divergence.pointer,
+                                    line=divergence.line, column=divergence.column,
+                                    expected=divergence.expected, output=divergence.output))
+        self._curr_failed = True
+        return False
+
+    def assertCasesFromFile(self, macro_name: str, path: str, ignore_order: bool = True) -> bool:
+        """
+            Asserts that the macro renders the expected output for every case of a case file.
+            The cases are streamed from the file in batches, so memory use does not grow with its size, and
+            every case is checked: the failed cases are reported with their line number, followed by a summary.
+
+            JSON lines files (.jsonl, .ndjson) have an object per line such as
+            {"args": ["value1", "value2"], "expected": {"key1": "value1"}}. CSV files (.csv) have a header row
+            with an "expected" column, and either an "args" column with a JSON list or one column per argument.
+            An expected JSON object is compared like assertEqualJson, an expected string like assertEqualString.
+
+            :param macro_name: The name of macro function
+            :type macro_name: str
+
+            :param path: Path relative to test file where the case file is
+            :type path: str
+
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
+            :return: True if every case passed and false otherwise
+            :rtype: bool
+        """
+        if self._curr_failed is True:
+            return False
+
+        macro = utils.get_macro(self.template, macro_name)
+        if macro is None:
+            self._curr_failed = True
+            return False
+
+        case_path = os.path.normpath(os.path.join(self._curr_path, path))
+        num_cases = 0
+        num_failed = 0
+        try:
+            for batch in cases.iter_batches(case_path):
+                for case in batch:
+                    num_cases += 1
+                    if num_failed < self.MAX_REPORTED_CASES:
+                        passed = self._check_case(macro, macro_name, path, case, ignore_order, num_failed == 0)
+                    else:
+                        # Only counted, the messages of the render and compare functions are dropped
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            passed = self._check_case(macro, macro_name, path, case, ignore_order, False)
+                    if not passed:
+                        num_failed += 1
+        except (OSError, ValueError) as e:
+            self._print_failed_method(num_failed == 0)
+            print(j2test_messages.FAILED_CASE_FILE.format(macro_name=macro_name, path=path, e=e))
+            self._curr_failed = True
+            return False
+
+        if num_failed == 0:
+            return True
+
+        if num_failed > self.MAX_REPORTED_CASES:
+            print(j2test_messages.CASES_NOT_REPORTED.format(
+                num_hidden=num_failed - self.MAX_REPORTED_CASES, max_reported=self.MAX_REPORTED_CASES))
+        print(j2test_messages.CASES_SUMMARY.format(
+            num_passed=num_cases - num_failed, num_cases=num_cases, path=path, num_failed=num_failed))
+        self._curr_failed = True
+        return False
+
+    def _check_case(self, macro: typing.Callable, macro_name: str, path: str, case: cases.Case,
+                    ignore_order: bool, first_failure: bool) -> bool:
+        """
+            Renders and checks one case of assertCasesFromFile, printing why it failed.
+
+            :return: True if the case passed
+            :rtype: bool
+        """
+        if case.error is not None:
+            self._print_failed_method(first_failure)
+            print(j2test_messages.FAILED_INVALID_CASE.format(path=path, line_number=case.line_number,
+                                                             error=case.error))
+            return False
+
+        if isinstance(case.expected, dict):
+            output = utils.render_macro_json(macro, case.args)
+            if output is not None and utils.assert_json(output, case.expected, ignore_order):
+                return True
+            self._print_failed_method(first_failure)
+            print(j2test_messages.FAILED_CASE.format(macro_name=macro_name, path=path,
+                                                     line_number=case.line_number, args=case.args))
+            if output is not None:
+                utils.print_json_diff(output, case.expected, self.PRINT_ALL, ignore_order, self.MAX_DIFFS,
+                                      self.DIFF_PREVIEW_LENGTH, self.DOCUMENT_PREVIEW_LENGTH)
+            return False
+
+        if isinstance(case.expected, str):
+            output = utils.render_macro_str(macro, case.args)
+            if output is not None and utils.assert_string(output, case.expected):
+                return True
+            self._print_failed_method(first_failure)
+            print(j2test_messages.FAILED_CASE.format(macro_name=macro_name, path=path,
+                                                     line_number=case.line_number, args=case.args))
+            if output is not None:
+                print(j2test_messages.FAILED_CASE_STR.format(expected=case.expected, output=output.strip()))
+            return False
+
+        self._print_failed_method(first_failure)
+        print(j2test_messages.FAILED_CASE.format(macro_name=macro_name, path=path,
+                                                 line_number=case.line_number, args=case.args))
+        print(j2test_messages.FAILED_CASE_TYPE.format(expected_type=type(case.expected).__name__))
+        return False
+
+    def assertMatchesSnapshot(self, macro_name: str, args: any, key: str, ignore_order: bool = True) -> bool:
+        """
+            Asserts that the rendered output is the same as the snapshot recorded with the key.
+            The snapshots of a test file are packed in one indexed file, __snapshots__/<test file name>.snap
+            next to the test file, and only the entry of the key is read from it.
+
+            When j2test is run with --update-snapshots, the output is recorded as the snapshot of the key instead,
+            and the snapshot file is rewritten once after all the tests of the file ran. Outputs that are JSON
+            objects or lists are recorded and compared as JSON, the other outputs as strings.
+
+            :param macro_name: The name of macro function
+            :type macro_name: str
+
+            :param args: An array of arguments passed to the macro to render it
+            :type args: [*]
+
+            :param key: Name of the snapshot, unique within the test file
+            :type key: str
+
+            :param ignore_order: Compare lists regardless of the order of their elements
+            :type ignore_order: bool
+
+            :return: True if same and false otherwise
+            :rtype: bool
+        """
+        if self._curr_failed is True:
+            return False
+
+        if os.environ.get(utils.UPDATE_SNAPSHOTS_ENV_VAR):
+            output = self.render_macro_str(macro_name, args)
+            if output is None:
+                return False
+            self._new_snapshots[key] = self._to_snapshot(output)
+            return True
+
+        expected = self._recorded_snapshot(macro_name, key, j2test_messages.FAILED_NO_SNAPSHOT)
+        if expected is None:
+            return False
+
+        if expected.is_json:
+            output = self.render_macro_json(macro_name, args)
+            if output is not None and utils.assert_json(output, expected.value, ignore_order):
+                return True
+            if output is not None:
+                self._print_failed_method(True)
+                print(j2test_messages.FAILED_SNAPSHOT.format(macro_name=macro_name, key=key))
+                utils.print_json_diff(output, expected.value, self.PRINT_ALL, ignore_order, self.MAX_DIFFS,
+                                      self.DIFF_PREVIEW_LENGTH, self.DOCUMENT_PREVIEW_LENGTH)
+            else:
+                print(colored(j2test_messages.FAILED_NO_JSON_OUTPUT.
+                              format(curr_method=self._curr_method).
+                              center(self.HEADER_WIDTH, '_'), 'red'))
+        else:
+            output = self.render_macro_str(macro_name, args)
+            if output is not None and utils.assert_string(output, expected.value):
+                return True
+            if output is not None:
+                self._print_failed_method(True)
+                if "\n" in expected.value or "\n" in output.strip() or \
+                        len(expected.value) + len(output) > self.DIFF_PREVIEW_LENGTH:
+                    print(j2test_messages.FAILED_SNAPSHOT.format(macro_name=macro_name, key=key))
+                    utils.print_string_diff(output.strip(), expected.value, max_diff_lines=self.MAX_DIFF_LINES,
+                                            line_length=self.DIFF_PREVIEW_LENGTH)
+                else:
+                    print(j2test_messages.FAILED_SNAPSHOT_STR.format(
+                        macro_name=macro_name, key=key, expected=expected.value, output=output.strip()))
+            else:
+                print(colored(j2test_messages.FAILED_NO_STR_OUTPUT.
+                              format(curr_method=self._curr_method).
+                              center(self.HEADER_WIDTH, '_'), 'red'))
+
+        self._curr_failed = True
+        return False
+
+    def assertOutputDigest(self, macro_name: str, args: any, key: str, ignore_order: bool = True) -> bool:
+        """
+            Asserts that the SHA-256 digest of the rendered output is the digest recorded with the key, so large
+            outputs are checked without keeping a copy of them. The digests are recorded in the snapshot file
+            of the test file, like the snapshots of assertMatchesSnapshot, when j2test is run with
+            --update-snapshots.
+
+            Outputs that are JSON objects or lists are canonicalized as they are hashed, with the semantics
+            of assertEqualJson: keys are unordered, numbers compare by value and lists are multisets unless
+            ignore_order is False. The other outputs are hashed as strings without leading and trailing whitespace.
+            Set DIGEST_SAMPLES to also record slices of the output, printed when the digest no longer matches.
+
+            :param macro_name: The name of macro function
+            :type macro_name: str
+
+            :param args: An array of arguments passed to the macro to render it
+            :type args: [*]
+
+            :param key: Name of the digest, unique within the test file
+            :type key: str
+
+            :param ignore_order: Hash lists regardless of the order of their elements
+            :type ignore_order: bool
+
+            :return: True if same and false otherwise
+            :rtype: bool
+        """
+        if self._curr_failed is True:
+            return False
+
+        if os.environ.get(utils.UPDATE_SNAPSHOTS_ENV_VAR):
+            output = self.render_macro_str(macro_name, args)
+            if output is None:
+                return False
+            self._new_snapshots[key] = self._to_digest(output, ignore_order)
+            return True
+
+        expected = self._recorded_snapshot(macro_name, key, j2test_messages.FAILED_NO_DIGEST, is_digest=True)
+        if expected is None:
+            return False
+        output = self.render_macro_str(macro_name, args)
+        if output is None:
+            print(colored(j2test_messages.FAILED_NO_STR_OUTPUT.
+                          format(curr_method=self._curr_method).
+                          center(self.HEADER_WIDTH, '_'), 'red'))
+            return False
+
+        record = expected.value
+        try:
+            if record["json"]:
+                output_digest = digest.json_digest(stream_compare.iter_chunks(output), ignore_order)
+            else:
+                output_digest = digest.text_digest(output)
+        except ValueError as e:
+            self._print_failed_method(True)
+            print(j2test_messages.FAILED_DIGEST_JSON.format(macro_name=macro_name, key=key, e=e))
+            self._curr_failed = True
+            return False
+        if output_digest == record["sha256"]:
+            return True
+
+        self._print_failed_method(True)
+        print(j2test_messages.FAILED_DIGEST.format(macro_name=macro_name, key=key, expected=record["sha256"],
+                                                   output=output_digest))
+        if record["json"] and record["ignore_order"] != ignore_order:
+            print(j2test_messages.FAILED_DIGEST_SETTINGS.format(recorded=record["ignore_order"]))
+        if record["length"] != len(output):
+            print(j2test_messages.FAILED_DIGEST_LENGTH.format(output_length=len(output),
+                                                              expected_length=record["length"]))
+        for offset, text in record["samples"]:
+            if output[offset:offset + len(text)] != text:
+                print(j2test_messages.FAILED_DIGEST_SAMPLE.format(
+                    offset=offset, expected=diff.preview(text, self.DIFF_PREVIEW_LENGTH),
+                    output=diff.preview(output[offset:offset + len(text)], self.DIFF_PREVIEW_LENGTH)))
+                break
+        else:
+            if record["samples"]:
+                print(j2test_messages.FAILED_DIGEST_NO_SAMPLE.format(num_samples=len(record["samples"])))
+        self._curr_failed = True
+        return False
+
+    def _recorded_snapshot(self, macro_name: str, key: str, not_recorded: str,
+                           is_digest: bool = False) -> typing.Optional[snapshot.Snapshot]:
+        """
+            Reads a snapshot or digest from the snapshot file of the test file, failing the test if it is missing.
+
+            :param not_recorded: Message printed when there is no entry of this kind with the key
+            :type not_recorded: str
+
+            :param is_digest: Read a digest recorded by assertOutputDigest
+            :type is_digest: bool
+
+            :return: The snapshot, None if the test failed
+            :rtype: Optional[Snapshot]
+        """
+        path = snapshot.snapshot_path(os.path.join(self._curr_path, self._child_filename))
+        try:
+            if self._snapshot_store is None:
+                self._snapshot_store = snapshot.SnapshotStore(path)
+            expected = self._snapshot_store.get(key)
+        except ValueError as e:
+            self._print_failed_method(True)
+            print(j2test_messages.FAILED_SNAPSHOT_FILE.format(macro_name=macro_name, e=str(e).strip()))
+            self._curr_failed = True
+            return None
+
+        if expected is None or expected.is_digest != is_digest:
+            self._print_failed_method(True)
+            print(not_recorded.format(macro_name=macro_name, key=key, path=os.path.relpath(path, self._curr_path)))
+            self._curr_failed = True
+            return None
+        return expected
+
+    def _to_digest(self, output: str, ignore_order: bool) -> snapshot.Snapshot:
+        """
+            Hashes JSON objects and lists as canonical JSON, falling back to the string like _to_snapshot.
+        """
+        output_digest = None
+        if digest.starts_json(output):
+            try:
+                output_digest = digest.json_digest(stream_compare.iter_chunks(output), ignore_order)
+            except ValueError:
+                pass
+        record = {
+            "sha256": output_digest or digest.text_digest(output),
+            "json": output_digest is not None,
+            "ignore_order": ignore_order,
+            "length": len(output),
+            "samples": digest.samples(output, self.DIGEST_SAMPLES, self.DIGEST_SAMPLE_LENGTH),
+        }
+        return snapshot.Snapshot(record, True, True)
+
+    def _to_snapshot(self, output: str) -> snapshot.Snapshot:
+        """
+            Records JSON objects and lists as parsed JSON, so they are compared regardless of formatting.
+        """
+        output = output.strip()
+        if output.startswith(("{", "[")):
+            try:
+                return snapshot.Snapshot(json_backend.loads(output), True)
+            except ValueError:
+                pass
+        return snapshot.Snapshot(output, False)
+
+    def _save_snapshots(self, complete: bool) -> None:
+        """
+            Records the snapshots of an --update-snapshots run in the snapshot file. The snapshots that are no
+            longer asserted are dropped once every class of the test file ran, see snapshot.finish_file.
+
+            :param complete: Every test of the class ran and passed
+            :type complete: bool
+        """
+        if self._snapshot_store is not None:
+            self._snapshot_store.close()
+            self._snapshot_store = None
+        if not os.environ.get(utils.UPDATE_SNAPSHOTS_ENV_VAR):
+            return
+
+        path = snapshot.snapshot_path(os.path.join(self._curr_path, self._child_filename))
+        snapshot.track(path, self._new_snapshots, complete)
+        if self._new_snapshots and snapshot.update_store(path, self._new_snapshots,
+                                                         compress=self.COMPRESS_SNAPSHOTS):
+            print(j2test_messages.SNAPSHOTS_UPDATED.format(num_snapshots=len(self._new_snapshots),
+                                                           path=os.path.relpath(path, self._curr_path)))
+        self._new_snapshots = {}
+
+    def _print_failed_method(self, first_failure: bool) -> None:
+        # The name of the failed test is printed once, before its first failed case
+        if first_failure:
+            print(colored(j2test_messages.FAILED_METHOD_NAME.
+                          format(curr_method=self._curr_method).
+                          center(self.HEADER_WIDTH, '_'), 'red'))
+
     def loadJsonFile(self, path: str) -> typing.Dict:
         """
             Gets the .json file and converts it to a python dictionary.
@@ -319,7 +819,7 @@ class TestTemplate:
         """
         raw_path = os.path.join(self._curr_path, path)
         path = os.path.normpath(raw_path)
-        dic = utils.get_json_file(path, self._curr_method)
+        dic = utils.get_json_file(path, self._curr_method, self.CACHE_FIXTURES)
         if dic is None:
             self._curr_failed = True
             return
@@ -337,7 +837,7 @@ class TestTemplate:
         """
         raw_path = os.path.join(self._curr_path, path)
         path = os.path.normpath(raw_path)
-        dic = utils.get_yaml_file(path, self._curr_method)
+        dic = utils.get_yaml_file(path, self._curr_method, self.CACHE_FIXTURES, self.YAML_MODE)
         if dic is None:
             self._curr_failed = True
             return
@@ -356,7 +856,7 @@ class TestTemplate:
             :return: macro dictionary output
             :rtype: Dict[str, any]
         """
-        macro = utils.get_macro(self.template, macro_name)
+        macro = self._get_macro(macro_name)
         if macro is None:
             self._curr_failed = True
             return
@@ -380,7 +880,7 @@ class TestTemplate:
             :return: macro string output
             :rtype: str
         """
-        macro = utils.get_macro(self.template, macro_name)
+        macro = self._get_macro(macro_name)
         if macro is None:
             self._curr_failed = True
             return
@@ -391,6 +891,15 @@ class TestTemplate:
             return
         return output
 
+    def _get_macro(self, macro_name: str) -> typing.Optional[typing.Callable]:
+        """
+            Gets a macro of the template, rendered through the render cache when CACHE_RENDERS is True.
+        """
+        macro = utils.get_macro(self.template, macro_name)
+        if macro is None or self._render_cache is None:
+            return macro
+        return self._render_cache.wrap(self.template, macro_name, macro)
+
     def _set_template(self) -> None:
         """
             Sets the jinja template for test and checks to ensure template is valid
@@ -420,7 +929,9 @@ class TestTemplate:
             print(colored(j2test_messages.NO_TESTS_RUN.center(self.HEADER_WIDTH, '='), 'red'), end="\n\n")
             sys.exit(1)
 
-        self.template = utils.get_template(self.TEMPLATE_PATH, env_path)
+        self.template = utils.get_template(self.TEMPLATE_PATH, env_path, self.AUTO_RELOAD,
+                                           self.BYTECODE_CACHE_DIR, self.PRECOMPILED_PATH,
+                                           self.NATIVE_RENDERING)
 
         if self.template is None:
             print(j2test_messages.FAILED_TO_GET_TEMPLATE.format(
@@ -0,0 +1,231 @@
+import importlib
+import json
+import os
+import typing
+import j2test.commons.utils_messages as utils_messages
+
+# Environment variable used to pass the JSON backend from the CLI to the test files
+BACKEND_ENV_VAR = "J2TEST_JSON_BACKEND"
+BACKEND_AUTO = "auto"
+BACKEND_JSON = "json"
+BACKEND_RAPIDJSON = "rapidjson"
+BACKEND_ORJSON = "orjson"
+BACKENDS = [BACKEND_AUTO, BACKEND_JSON, BACKEND_RAPIDJSON, BACKEND_ORJSON]
+
+# Fastest first, used by the auto backend
+_AUTO_ORDER = [BACKEND_ORJSON, BACKEND_RAPIDJSON, BACKEND_JSON]
+
+# Maps every digit to "0" and every other byte to a space, to find long runs of digits without a regex
+_DIGIT_TABLE = bytes(ord("0") if ord("0") <= byte <= ord("9") else ord(" ") for byte in range(256))
+# orjson parses integers outside of the 64 bit range as floats, which always have 19 digits or more
+_LONG_INTEGER = b"0" * 19
+
+_backends = {}
+
+
+class JsonBackend:
+    """
+        Parses and serializes JSON with the standard library json module.
+
+        Subclasses parse with faster libraries. Whatever they fail to parse is parsed again with the
+        standard library, so every backend accepts the same documents and raises the same errors.
+    """
+
+    name = BACKEND_JSON
+
+    def loads(self, data: typing.Union[str, bytes]) -> typing.Any:
+        """
+            Parses a JSON document.
+
+            :param data: The JSON document, bytes are decoded as UTF-8, UTF-16 or UTF-32
+            :type data: Union[str, bytes]
+
+            :return: The parsed document
+            :rtype: Any
+        """
+        return json.loads(data)
+
+    def load_file(self, path: str) -> typing.Any:
+        """
+            Parses a JSON file. The file is read as bytes and handed to the parser without decoding it first.
+
+            :param path: Path to the JSON file
+            :type path: str
+
+            :return: The parsed file
+            :rtype: Any
+        """
+        with open(path, "rb") as f:
+            return self.loads(f.read())
+
+    def dumps(self, value: typing.Any, indent: typing.Optional[int] = None, sort_keys: bool = False) -> str:
+        """
+            Serializes a value to JSON.
+
+            :param value: The value to serialize
+            :type value: Any
+
+            :param indent: Number of spaces to indent the JSON with, compact JSON if None
+            :type indent: Optional[int]
+
+            :param sort_keys: Sort the keys of the dictionaries
+            :type sort_keys: bool
+
+            :return: The JSON
+            :rtype: str
+        """
+        separators = (",", ":") if indent is None else (",", ": ")
+        return json.dumps(value, indent=indent, sort_keys=sort_keys, separators=separators)
+
+
+class RapidJsonBackend(JsonBackend):
+    """
+        Parses and serializes JSON with python-rapidjson.
+    """
+
+    name = BACKEND_RAPIDJSON
+
+    def __init__(self) -> None:
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def loads(self, data: typing.Union[str, bytes]) -> typing.Any:
+        try:
+            return self._rapidjson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def dumps(self, value: typing.Any, indent: typing.Optional[int] = None, sort_keys: bool = False) -> str:
+        return self._rapidjson.dumps(value, indent=indent, sort_keys=sort_keys)
+
+
+class OrJsonBackend(JsonBackend):
+    """
+        Parses JSON with orjson. Documents with long runs of digits are parsed with the standard library,
+        since orjson parses integers that do not fit in 64 bits as floats. orjson can not serialize with
+        other indentations than two spaces, so values are serialized with python-rapidjson, or the
+        standard library if it is not installed.
+    """
+
+    name = BACKEND_ORJSON
+
+    def __init__(self) -> None:
+        import orjson
+        self._orjson = orjson
+        try:
+            self._dumper = RapidJsonBackend()
+        except ImportError:
+            self._dumper = JsonBackend()
+
+    def loads(self, data: typing.Union[str, bytes]) -> typing.Any:
+        raw = data.encode("utf-8", "surrogatepass") if isinstance(data, str) else data
+        if _LONG_INTEGER in raw.translate(_DIGIT_TABLE):
+            # Might contain an integer that orjson would lose precision on, takes a few percent of the parse time
+            return json.loads(data)
+        try:
+            return self._orjson.loads(raw)
+        except ValueError:
+            # e.g. NaN, lone surrogates or UTF-16 encoded bytes
+            return json.loads(data)
+
+    def dumps(self, value: typing.Any, indent: typing.Optional[int] = None, sort_keys: bool = False) -> str:
+        return self._dumper.dumps(value, indent=indent, sort_keys=sort_keys)
+
+
+_BACKEND_CLASSES = {
+    BACKEND_JSON: JsonBackend,
+    BACKEND_RAPIDJSON: RapidJsonBackend,
+    BACKEND_ORJSON: OrJsonBackend,
+}
+
+
+def get_backend(name: str = None) -> JsonBackend:
+    """
+        Gets the JSON backend, one backend object is shared per name in a process.
+
+        :param name: "auto", "json", "rapidjson" or "orjson". Defaults to the J2TEST_JSON_BACKEND
+                     environment variable or "auto", which picks the fastest installed library.
+        :type name: str
+
+        :return: The JSON backend
+        :rtype: JsonBackend
+    """
+    name = name or os.environ.get(BACKEND_ENV_VAR) or BACKEND_AUTO
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+
+    if name == BACKEND_AUTO:
+        backend = get_backend(next(candidate for candidate in _AUTO_ORDER if is_available(candidate)))
+    elif name in _BACKEND_CLASSES:
+        # Raises ImportError if the library is not installed
+        backend = _BACKEND_CLASSES[name]()
+    else:
+        raise ValueError(utils_messages.INVALID_JSON_BACKEND.format(name=name, backends=", ".join(BACKENDS)))
+
+    _backends[name] = backend
+    return backend
+
+
+def is_available(name: str) -> bool:
+    """
+        Checks whether the library of the backend is installed.
+
+        :param name: "json", "rapidjson" or "orjson"
+        :type name: str
+
+        :return: True if the backend can be used
+        :rtype: bool
+    """
+    if name == BACKEND_JSON:
+        return True
+    try:
+        importlib.import_module(name)
+        return True
+    except ImportError:
+        return False
+
+
+def loads(data: typing.Union[str, bytes]) -> typing.Any:
+    """
+        Parses a JSON document with the configured backend.
+
+        :param data: The JSON document
+        :type data: Union[str, bytes]
+
+        :return: The parsed document
+        :rtype: Any
+    """
+    return get_backend().loads(data)
+
+
+def load_file(path: str) -> typing.Any:
+    """
+        Parses a JSON file with the configured backend, without decoding it to text first.
+
+        :param path: Path to the JSON file
+        :type path: str
+
+        :return: The parsed file
+        :rtype: Any
+    """
+    return get_backend().load_file(path)
+
+
+def dumps(value: typing.Any, indent: typing.Optional[int] = None, sort_keys: bool = False) -> str:
+    """
+        Serializes a value to JSON with the configured backend.
+
+        :param value: The value to serialize
+        :type value: Any
+
+        :param indent: Number of spaces to indent the JSON with, compact JSON if None
+        :type indent: Optional[int]
+
+        :param sort_keys: Sort the keys of the dictionaries
+        :type sort_keys: bool
+
+        :return: The JSON
+        :rtype: str
+    """
+    return get_backend().dumps(value, indent=indent, sort_keys=sort_keys)
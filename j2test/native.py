@@ -0,0 +1,237 @@
+import functools
+import re
+import typing
+import jinja2
+import jinja2.compiler
+import jinja2.nodes
+import jinja2.runtime
+from jinja2.nativetypes import NativeCodeGenerator
+from j2test.filters.from_json import from_json_filter
+from j2test.filters.simple_to_json import simple_to_json_filter
+
+
+class NativeJson:
+    """
+        Value passed through the tojson filter in native rendering mode. The value is only serialized
+        when the template uses it as a string, a macro that outputs nothing but this value returns it as is.
+
+        It behaves like the JSON string in expressions: comparisons, len, "+", "in", indexing and the string
+        methods all serialize the value first, so templates work the same as in the default mode.
+    """
+
+    __slots__ = ("value", "indent", "sort_keys", "_json")
+
+    def __init__(self, value: typing.Any, indent: typing.Optional[int] = None, sort_keys: bool = True) -> None:
+        self.value = value
+        self.indent = indent
+        self.sort_keys = sort_keys
+        self._json = None
+
+    def __str__(self) -> str:
+        if self._json is None:
+            self._json = simple_to_json_filter(self.value, self.indent, self.sort_keys)
+        return self._json
+
+    def __repr__(self) -> str:
+        return "NativeJson({!r})".format(self.value)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # Only called for the attributes NativeJson does not have, e.g. startswith or split
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(str(self), name)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        return str(self) == other
+
+    def __ne__(self, other: typing.Any) -> bool:
+        return str(self) != other
+
+    def __lt__(self, other: typing.Any) -> bool:
+        return str(self) < other
+
+    def __le__(self, other: typing.Any) -> bool:
+        return str(self) <= other
+
+    def __gt__(self, other: typing.Any) -> bool:
+        return str(self) > other
+
+    def __ge__(self, other: typing.Any) -> bool:
+        return str(self) >= other
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __len__(self) -> int:
+        return len(str(self))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(str(self))
+
+    def __contains__(self, item: typing.Any) -> bool:
+        return item in str(self)
+
+    def __getitem__(self, key: typing.Any) -> str:
+        return str(self)[key]
+
+    def __add__(self, other: typing.Any) -> str:
+        return str(self) + other
+
+    def __radd__(self, other: typing.Any) -> str:
+        return other + str(self)
+
+    def __mul__(self, other: typing.Any) -> str:
+        return str(self) * other
+
+    __rmul__ = __mul__
+
+    def __mod__(self, other: typing.Any) -> str:
+        return str(self) % other
+
+
+def native_to_json_filter(value: typing.Any, indent: typing.Optional[int] = None,
+                          sort_keys: bool = True) -> NativeJson:
+    """
+        tojson filter of the native rendering mode, defers the serialization of the value.
+
+        :param value: The value to serialize to JSON
+        :type value: Any
+
+        :param indent: Indentation of the JSON if it is serialized
+        :type indent: Optional[int]
+
+        :param sort_keys: Sort the keys of the JSON if it is serialized
+        :type sort_keys: bool
+
+        :return: The deferred JSON value
+        :rtype: NativeJson
+    """
+    return NativeJson(value, indent, sort_keys)
+
+
+def native_from_json_filter(data: typing.Any) -> typing.Any:
+    """
+        fromjson filter of the native rendering mode, a deferred JSON value is returned without parsing it.
+
+        :param data: The string representation of the JSON object or a deferred JSON value
+        :type data: Any
+
+        :return: The corresponding JSON object
+        :rtype: Any
+    """
+    if isinstance(data, NativeJson):
+        return data.value
+    return from_json_filter(str(data))
+
+
+def native_concat(values: typing.Iterable[typing.Any]) -> typing.Any:
+    """
+        Joins the output of a macro. If the only output besides whitespace is a deferred JSON value,
+        the value is returned as is, otherwise the output is joined to a string like in the default mode.
+
+        :param values: Output of the macro
+        :type values: Iterable[Any]
+
+        :return: The deferred JSON value or the joined string
+        :rtype: Any
+    """
+    values = list(values)
+    native = None
+    for value in values:
+        if isinstance(value, str):
+            if not value or value.isspace():
+                continue
+            return "".join([str(value) for value in values])
+        if native is not None or not isinstance(value, NativeJson):
+            return "".join([str(value) for value in values])
+        native = value
+    if native is None:
+        return "".join(values)
+    return native
+
+
+def str_arguments(function: typing.Callable) -> typing.Callable:
+    """
+        Wraps a filter, test or global so the deferred JSON values it is called with are passed as JSON strings,
+        like in the default mode, e.g. for filters that call re or other C string functions on their argument.
+        The tojson and fromjson filters of the native mode get the deferred values as is.
+
+        :param function: The filter, test or global
+        :type function: Callable
+
+        :return: The wrapped function
+        :rtype: Callable
+    """
+    if function is native_to_json_filter or function is native_from_json_filter:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        return function(*_str_values(args), **dict(zip(kwargs, _str_values(kwargs.values()))))
+
+    return wrapper
+
+
+def _str_values(values: typing.Iterable[typing.Any]) -> typing.List[typing.Any]:
+    return [str(value) if isinstance(value, NativeJson) else value for value in values]
+
+
+class NativeJsonContext(jinja2.runtime.Context):
+    """
+        Context of the native rendering mode, globals are called with the deferred JSON values serialized.
+        Macros still get them as is, so a macro that outputs nothing but its argument returns the value.
+    """
+
+    def call(__self, __obj: typing.Callable, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        if not isinstance(__obj, jinja2.runtime.Macro):
+            __obj = str_arguments(__obj)
+        return super().call(__obj, *args, **kwargs)
+
+
+class NativeJsonCodeGenerator(NativeCodeGenerator):
+    """
+        Code generator of the native rendering mode. Output nodes are not converted to strings,
+        so macros can return the deferred JSON values of the tojson filter through native_concat.
+    """
+
+    # Lookup of a filter or test at the start of the generated code, e.g. "t_1 = environment.filters['upper']"
+    _DEPENDENCY = re.compile(r"(\w+) = (environment\.(?:filters|tests)\[.+\])")
+
+    def writeline(self, x: str, node: typing.Optional[jinja2.nodes.Node] = None, extra: int = 0) -> None:
+        if x.startswith("from jinja2.runtime import "):
+            # Set and filter blocks still build strings, the outputs they join are no longer strings.
+            # Kept on the import line so the line numbers of the generated code do not change.
+            x += "; concat = str_join"
+        else:
+            x = self._DEPENDENCY.sub(r"\1 = environment.str_arguments(\2)", x)
+        super().writeline(x, node, extra)
+
+    def return_buffer_contents(self, frame: jinja2.compiler.Frame, force_unescaped: bool = False) -> None:
+        self.writeline("return environment.concat({})".format(frame.buffer))
+
+
+class NativeJsonEnvironment(jinja2.Environment):
+    """
+        Environment of the native rendering mode, macros that only output a tojson value return the value
+        itself instead of the JSON string, which saves serializing and parsing the JSON again.
+    """
+
+    code_generator_class = NativeJsonCodeGenerator
+    context_class = NativeJsonContext
+    concat = staticmethod(native_concat)
+    str_arguments = staticmethod(str_arguments)
+
+
+def unwrap(output: typing.Any) -> typing.Any:
+    """
+        Gets the value of a deferred JSON value returned by a macro.
+
+        :param output: Output of a macro
+        :type output: Any
+
+        :return: The value of the deferred JSON value, the output itself otherwise
+        :rtype: Any
+    """
+    if isinstance(output, NativeJson):
+        return output.value
+    return output
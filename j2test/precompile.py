@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import typing
+import zipfile
+import jinja2
+from jinja2.loaders import split_template_path
+
+# Name of the file inside the archive that records the templates it contains
+MANIFEST_NAME = "j2test_manifest.json"
+
+
+def compile_templates(root: str, target: str, use_zip: bool = True, extension: str = ".j2",
+                      log_function: typing.Callable[[str], None] = None) -> int:
+    """
+        Precompiles every template under the root into a python module archive, like
+        jinja2.Environment.compile_templates, and records a manifest with the checksum of every
+        template source so outdated templates in the archive are never used.
+
+        :param root: The jinja import base directory of the templates
+        :type root: str
+
+        :param target: Path of the zip archive, or of the folder if use_zip is False
+        :type target: str
+
+        :param use_zip: Write a zip archive instead of a folder
+        :type use_zip: bool
+
+        :param extension: Only files with this extension are compiled
+        :type extension: str
+
+        :param log_function: Called with a message for every compiled or skipped template
+        :type log_function: Callable[[str], None]
+
+        :return: Number of templates compiled
+        :rtype: int
+    """
+    # Imported here to avoid the circular import, utils loads templates through this module
+    import j2test.utils as utils
+
+    if log_function is None:
+        def log_function(message: str) -> None:
+            pass
+
+    root = os.path.abspath(root)
+    target = os.path.abspath(target)
+    env = utils._get_env(root)
+    templates = {}
+
+    if use_zip:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        archive = zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED)
+
+        def write_file(filename: str, data: str) -> None:
+            archive.writestr(filename, data)
+    else:
+        archive = None
+        os.makedirs(target, exist_ok=True)
+
+        def write_file(filename: str, data: str) -> None:
+            with open(os.path.join(target, filename), "w", encoding="utf-8") as f:
+                f.write(data)
+
+    try:
+        for name in env.list_templates(filter_func=lambda template_name: template_name.endswith(extension)):
+            source, filename, _ = env.loader.get_source(env, name)
+            try:
+                code = env.compile(source, name, filename, raw=True, defer_init=True)
+            except jinja2.exceptions.TemplateSyntaxError as e:
+                log_function("Could not compile \"{}\": {}".format(name, e))
+                continue
+
+            write_file(jinja2.ModuleLoader.get_module_filename(name), code)
+            templates[name] = _checksum(source)
+            log_function("Compiled \"{}\"".format(name))
+
+        manifest = {
+            # Relative to the archive so the archive can be shipped as a build artifact to another checkout
+            "root": os.path.relpath(root, os.path.dirname(target)),
+            "jinja2": jinja2.__version__,
+            "templates": templates,
+        }
+        write_file(MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    return len(templates)
+
+
+class PrecompiledLoader(jinja2.FileSystemLoader):
+    """
+        FileSystemLoader that loads templates from a precompiled module archive and skips parsing
+        and compiling them entirely. Templates that are missing from the archive, or whose source changed
+        since the archive was built, are loaded from the file system as usual.
+    """
+
+    def __init__(self, searchpath: str, archive_path: str) -> None:
+        super().__init__(searchpath)
+        self.archive_path = os.path.abspath(archive_path)
+        self._module_loader = None
+        self._prefix = ""
+        self._templates = {}
+
+        manifest = _read_manifest(self.archive_path)
+        if manifest is None or manifest.get("jinja2") != jinja2.__version__:
+            return
+
+        archive_root = os.path.normpath(os.path.join(os.path.dirname(self.archive_path), manifest["root"]))
+        prefix = os.path.relpath(os.path.abspath(searchpath), archive_root)
+        if prefix == os.pardir or prefix.startswith(os.pardir + os.sep):
+            # The templates of this loader are not part of the archive
+            return
+
+        self._prefix = "" if prefix == os.curdir else prefix.replace(os.sep, "/") + "/"
+        self._templates = manifest["templates"]
+        self._module_loader = jinja2.ModuleLoader(self.archive_path)
+
+    def load(self, environment: jinja2.Environment, name: str,
+             globals: typing.Optional[typing.MutableMapping[str, typing.Any]] = None) -> jinja2.Template:
+        """
+            Loads the template from the archive when the archived template is up to date,
+            from the file system otherwise.
+
+            :param environment: The environment the template is loaded in
+            :type environment: jinja2.Environment
+
+            :param name: The name of the template relative to the search path
+            :type name: str
+
+            :param globals: Globals of the template
+            :type globals: MutableMapping[str, Any]
+
+            :return: The template
+            :rtype: jinja2.Template
+        """
+        if self._module_loader is not None:
+            archive_name = self._prefix + "/".join(split_template_path(name))
+            checksum = self._templates.get(archive_name)
+            if checksum is not None:
+                filename = os.path.join(self.searchpath[0], *split_template_path(name))
+                try:
+                    with open(filename, encoding=self.encoding) as f:
+                        source = f.read()
+                    mtime = os.path.getmtime(filename)
+                except OSError:
+                    source = None
+
+                if source is not None and _checksum(source) == checksum:
+                    template = self._module_loader.load(environment, archive_name, globals)
+
+                    def uptodate() -> bool:
+                        try:
+                            return os.path.getmtime(filename) == mtime
+                        except OSError:
+                            return False
+
+                    # Module templates never expire by themselves, reload them like file system templates
+                    template._uptodate = uptodate
+                    return template
+
+        return super().load(environment, name, globals)
+
+
+def _read_manifest(archive_path: str) -> typing.Optional[typing.Dict]:
+    """
+        Reads the manifest of a precompiled archive, zip archive or folder.
+    """
+    try:
+        if os.path.isdir(archive_path):
+            with open(os.path.join(archive_path, MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        with zipfile.ZipFile(archive_path) as archive:
+            return json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _checksum(source: str) -> str:
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
@@ -0,0 +1,165 @@
+import collections
+import hashlib
+import pickle
+import typing
+from j2test.fixture_cache import copy_json
+from j2test.native import NativeJson
+
+# Default number of macro outputs kept by a render cache
+DEFAULT_CACHE_SIZE = 128
+
+# Calls of the globals and filters that read or write files, see SideEffect
+_side_effects = 0
+
+
+class SideEffect:
+    """
+        Proxy for a global or filter that reads or writes files, such as readfromfile and writetofile.
+        Its calls are counted, so the render cache does not keep the outputs of macros that called it.
+    """
+
+    def __init__(self, function: typing.Callable) -> None:
+        self.function = function
+        # Keeps jinja2.pass_context and the like, jinja reads it from the function it is given
+        if hasattr(function, "jinja_pass_arg"):
+            self.jinja_pass_arg = function.jinja_pass_arg
+
+    def __call__(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        global _side_effects
+        _side_effects += 1
+        return self.function(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return repr(self.function)
+
+
+class RenderCache:
+    """
+        Outputs of the macros of a template by macro name and arguments, so a test that calls the same macro with
+        the same arguments several times only renders it once.
+
+        The cache only holds the outputs of one template and is emptied when another template object is used,
+        e.g. after the template was reloaded. It is bounded by the number of outputs and evicts the least recently
+        used ones first. Calls with arguments that can not be pickled are not cached, and neither are macros that
+        read or wrote a file while they rendered.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._template = None
+        self._bypassed = set()
+
+    def wrap(self, template: typing.Any, macro_name: str, macro: typing.Callable) -> typing.Callable:
+        """
+            :param template: The template the macro is from
+            :type template: jinja2.Template
+
+            :param macro_name: The name of the macro
+            :type macro_name: str
+
+            :param macro: The macro
+            :type macro: callable (jinja2.runtime.Macro)
+
+            :return: A callable rendering the macro through the cache
+            :rtype: Callable
+        """
+        if template is not self._template:
+            self.clear()
+            self._template = template
+        return _CachedMacro(self, macro_name, macro)
+
+    def render(self, macro_name: str, macro: typing.Callable, args: typing.Sequence) -> typing.Any:
+        """
+            Gets the output of the macro from the cache, rendering it if needed. Errors of the macro are raised
+            to the caller and not cached.
+
+            :param macro_name: The name of the macro
+            :type macro_name: str
+
+            :param macro: The macro
+            :type macro: callable (jinja2.runtime.Macro)
+
+            :param args: Arguments of the macro
+            :type args: Sequence
+
+            :return: The output of the macro, each caller gets its own copy of native rendering values
+            :rtype: Any
+        """
+        key = None if macro_name in self._bypassed else args_key(macro_name, args)
+        if key is None:
+            return macro(*args)
+
+        output = self._entries.get(key)
+        if output is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(output)
+
+        self.misses += 1
+        side_effects = _side_effects
+        output = macro(*args)
+        if _side_effects != side_effects:
+            # The output may depend on files or the test may expect the files to be written again
+            self._bypassed.add(macro_name)
+            return output
+        if isinstance(output, (str, NativeJson)) and self.max_entries > 0:
+            self._entries[key] = output
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return _copy(output)
+
+    def clear(self) -> None:
+        """
+            Drops all the cached outputs.
+        """
+        self._entries.clear()
+        self._bypassed.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _CachedMacro:
+    # Called like the macro by the rendering helpers of utils
+
+    def __init__(self, cache: RenderCache, macro_name: str, macro: typing.Callable) -> None:
+        self._cache = cache
+        self._macro_name = macro_name
+        self._macro = macro
+
+    def __call__(self, *args: typing.Any) -> typing.Any:
+        return self._cache.render(self._macro_name, self._macro, args)
+
+    def __repr__(self) -> str:
+        return repr(self._macro)
+
+
+def args_key(macro_name: str, args: typing.Sequence) -> typing.Optional[bytes]:
+    """
+        Hashes the macro name and arguments. The arguments are pickled, which keeps the types of values, e.g. 1,
+        1.0, True and "1", the order of dictionaries, which macros iterate in, and the state of other objects,
+        so arguments that may render differently never share a key.
+
+        :param macro_name: The name of the macro
+        :type macro_name: str
+
+        :param args: Arguments of the macro
+        :type args: Sequence
+
+        :return: The key, None if the arguments can not be pickled
+        :rtype: Optional[bytes]
+    """
+    try:
+        data = pickle.dumps((macro_name, tuple(args)), protocol=4)
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+        return None
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _copy(output: typing.Any) -> typing.Any:
+    if isinstance(output, NativeJson):
+        return NativeJson(copy_json(output.value), output.indent, output.sort_keys)
+    return output
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import typing
+import jinja2
+from j2test import deps, discovery
+from j2test._version import __version__
+
+# Default directory of the cache, relative to the directory j2test is run from
+DEFAULT_CACHE_DIR = os.path.join(".j2test_cache", "results")
+# Settings passed to the test files through the environment that can not change whether a test passes
+_IGNORED_ENV_VARS = frozenset(["J2TEST_AUTO_RELOAD", "J2TEST_BYTECODE_CACHE", "J2TEST_PRECOMPILED"])
+
+
+class ResultCache:
+    """
+        Persistent cache of the test files that passed, keyed by the content of everything they depend on.
+
+        The key of a test file is a hash of the test file, its template and the templates it imports, includes
+        or extends, recursively, the fixtures it names, every other file under the directories of the test file
+        and of its templates that test discovery does not ignore (virtualenvs, build output, .gitignore
+        patterns...), such as helper modules and files read with readfromfile, the J2TEST_* settings of the run,
+        and the Python, Jinja2 and j2test versions. A test file whose key was recorded by an earlier passing run
+        can be skipped, any change to one of these files runs it again. Files outside of these directories,
+        other environment variables, the clock or the network are not part of the key.
+        Entries are written to a temporary file first and then atomically moved in place, so the directory can
+        be shared between parallel CI jobs.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR,
+                 graph: typing.Optional[deps.DependencyGraph] = None, ignore: typing.Iterable[str] = ()) -> None:
+        self.directory = os.path.abspath(directory)
+        self.graph = graph if graph is not None else deps.DependencyGraph()
+        # Ignore patterns applied to the files under the directory of a test file, like test discovery
+        self.ignore = list(ignore)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # Keys are computed before the test files run, so files edited during the run are never recorded
+        self._keys = {}
+        self._digests = {}
+        self._local_files = {}
+
+    def key(self, path: str) -> str:
+        """
+            Computes the cache key of a test file.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+
+            :return: Hex digest of the test file and everything it depends on
+            :rtype: str
+        """
+        path = os.path.abspath(path)
+        if path not in self.graph:
+            self.graph.add_test(path)
+
+        files = self.graph.dependencies(path)
+        # Files loaded without being named, e.g. helper modules, computed fixture paths and readfromfile data
+        for directory in {os.path.dirname(file) for file in files if file.endswith(deps.TEMPLATE_EXTENSION)} | \
+                {os.path.dirname(path)}:
+            files = files | self._files_under(directory)
+        settings = sorted((name, value) for name, value in os.environ.items()
+                          if name.startswith("J2TEST_") and name not in _IGNORED_ENV_VARS)
+
+        digest = hashlib.sha256()
+        for part in (__version__, jinja2.__version__, "{}.{}".format(*sys.version_info[:2]), json.dumps(settings)):
+            digest.update(part.encode("utf-8") + b"\0")
+        for file in sorted(files):
+            digest.update(file.encode("utf-8", "surrogateescape") + b"\0")
+            digest.update(self._digest(file) + b"\0")
+        return digest.hexdigest()
+
+    def is_cached(self, path: str) -> bool:
+        """
+            Checks whether an earlier run recorded the test file as passing with the same key,
+            and counts the lookup as a hit or a miss.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+
+            :return: True if the test file does not need to be run
+            :rtype: bool
+        """
+        key = self.key(path)
+        self._keys[os.path.abspath(path)] = key
+        if os.path.exists(self._entry_path(key)):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, path: str) -> None:
+        """
+            Records a passing test file under the key computed by is_cached before it was run.
+            Nothing is recorded when the cache directory can not be written.
+
+            :param path: Path of the jinja unit test file
+            :type path: str
+        """
+        key = self._keys.get(os.path.abspath(path))
+        if key is None:
+            return
+
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), prefix=".tmp_")
+        except OSError:
+            # The cache is only an optimization, e.g. on a read-only checkout
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"path": os.path.abspath(path), "time": time.time()}, f)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.writes += 1
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _digest(self, path: str) -> bytes:
+        # Shared templates are hashed once per run
+        digest = self._digests.get(path)
+        if digest is None:
+            try:
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).digest()
+            except OSError:
+                digest = b"missing"
+            self._digests[path] = digest
+        return digest
+
+    def _files_under(self, directory: str) -> typing.Set[str]:
+        files = self._local_files.get(directory)
+        if files is None:
+            # Other test files are never loaded by a test file
+            files = {os.path.abspath(path) for path in discovery.iter_files(directory, self.ignore)
+                     if not deps.is_test_file(os.path.basename(path))}
+            self._local_files[directory] = files
+        return files
+
@@ -0,0 +1,382 @@
+import contextlib
+import hashlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+import traceback
+import typing
+import j2test.commons.cli_messages as cli_messages
+import j2test.bytecode_cache as bytecode_cache
+import j2test.snapshot as snapshot
+import j2test.j2test as j2test_module
+from j2test.j2test import TestTemplate
+
+
+class FileResult:
+    """
+        Structured result of running a single jinja unit test file.
+
+        Unlike the subprocess runner, which only sees an exit code, the in-process runners
+        collect the counters of every TestTemplate class found in the file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.num_classes = 0
+        self.num_tests = 0
+        self.num_passed = 0
+        self.num_failed = 0
+        self.failed_tests = []
+        self.duration = 0.0
+        self.output = ""
+        self.error = None
+        self.exit_code = 0
+        self.bytecode_cache = {}
+
+    @property
+    def failed(self) -> bool:
+        """
+            :return: True if the test file did not pass, the same as a non zero exit code of the file
+            :rtype: bool
+        """
+        return self.exit_code != 0
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+            :return: The result as a JSON serializable dictionary
+            :rtype: Dict[str, Any]
+        """
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "FileResult":
+        """
+            Creates a result from a dictionary created by to_dict.
+
+            :param data: The dictionary
+            :type data: Dict[str, Any]
+
+            :return: The result
+            :rtype: FileResult
+        """
+        result = cls(data["path"])
+        for name, value in data.items():
+            if hasattr(result, name):
+                setattr(result, name, value)
+        return result
+
+    def __repr__(self) -> str:
+        return "FileResult(path={!r}, num_tests={}, num_failed={}, exit_code={})".format(
+            self.path, self.num_tests, self.num_failed, self.exit_code)
+
+
+def run_file(path: str, capture: bool = False) -> FileResult:
+    """
+        Imports a jinja unit test file and runs every TestTemplate child class defined in it
+        within the current interpreter.
+
+        The test module is imported under a private module name so the usual
+        `if __name__ == '__main__'` block is not executed, the test classes are run instead.
+
+        :param path: The path to the unit test file
+        :type path: str
+
+        :param capture: Buffer the stdout and stderr of the test file into the result instead of printing it
+        :type capture: bool
+
+        :return: The structured result for the test file
+        :rtype: FileResult
+    """
+    result = FileResult(path)
+    buffer = io.StringIO() if capture else None
+    start = time.time()
+    cache_stats = bytecode_cache.get_stats()
+
+    with _redirect_output(buffer):
+        if not os.path.isfile(path):
+            print(cli_messages.NO_TEST_FILE_FOUND.format(path=path))
+            result.exit_code = 1
+        else:
+            try:
+                _run_module(path, result)
+            except SystemExit as e:
+                # Test files that run their classes outside of the __main__ guard exit on import
+                if _is_failure_code(e.code):
+                    result.exit_code = 1
+            except Exception as e:
+                traceback.print_exc()
+                print(cli_messages.RUN_FAILED.format(path=path, e=e))
+                result.error = "{}: {}".format(type(e).__name__, e)
+                result.exit_code = 1
+        sys.stdout.flush()
+
+    result.duration = round(time.time() - start, 3)
+    result.bytecode_cache = {name: count - cache_stats[name] for name, count in bytecode_cache.get_stats().items()}
+    if buffer is not None:
+        result.output = buffer.getvalue()
+    return result
+
+
+def run_file_forked(path: str, capture: bool = False) -> FileResult:
+    """
+        Runs a jinja unit test file in a forked child of the current interpreter.
+
+        The child inherits every module already imported by the parent, so it does not pay the
+        interpreter start up cost, but any global state mutated by the test file is thrown away
+        with the child. The result is sent back to the parent through a pipe.
+
+        :param path: The path to the unit test file
+        :type path: str
+
+        :param capture: Buffer the stdout and stderr of the test file into the result instead of printing it
+        :type capture: bool
+
+        :return: The structured result for the test file
+        :rtype: FileResult
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        # Child process, must never return into the caller's code
+        os.close(read_fd)
+        code = 0
+        try:
+            child_result = run_file(path, capture)
+            with os.fdopen(write_fd, "wb") as f:
+                pickle.dump(child_result, f)
+        except BaseException:
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+
+    if data:
+        return pickle.loads(data)
+
+    result = FileResult(path)
+    result.exit_code = 1
+    result.error = cli_messages.FORKED_RUN_FAILED.format(path=path, status=status)
+    print(result.error)
+    return result
+
+
+def run_files(paths: typing.List[str], isolate: bool = False) -> typing.List[FileResult]:
+    """
+        Runs the jinja unit test files one after another within the current interpreter.
+
+        :param paths: Paths to the unit test files
+        :type paths: List[str]
+
+        :param isolate: Run each test file in a forked child process
+        :type isolate: bool
+
+        :return: The results in the same order as the paths
+        :rtype: List[FileResult]
+    """
+    run = run_file_forked if isolate else run_file
+    return [run(path) for path in paths]
+
+
+def run_files_parallel(paths: typing.List[str], num_workers: int, isolate: bool = False,
+                       on_result: typing.Optional[typing.Callable[[FileResult], None]] = None) -> typing.List[FileResult]:
+    """
+        Spreads the jinja unit test files across a pool of worker processes.
+
+        Every worker is a long lived interpreter that runs many test files, so the imports and
+        compiled templates are warmed once per worker instead of once per file. The output of each
+        file is buffered in the worker so the output of different files never interleaves.
+
+        :param paths: Paths to the unit test files
+        :type paths: List[str]
+
+        :param num_workers: Number of worker processes
+        :type num_workers: int
+
+        :param isolate: Run each test file in a forked child of the worker
+        :type isolate: bool
+
+        :param on_result: Called with each result in the parent process as soon as the file finishes
+        :type on_result: Callable[[FileResult], None]
+
+        :return: The results in the same order as the paths
+        :rtype: List[FileResult]
+    """
+    if not paths:
+        return []
+
+    num_workers = max(1, min(num_workers, len(paths)))
+    worker = _run_indexed_forked if isolate else _run_indexed
+    results = [None] * len(paths)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with multiprocessing.Pool(processes=num_workers) as pool:
+        # chunksize of 1 so a few slow files do not hold back a whole chunk of other files
+        for index, result in pool.imap_unordered(worker, enumerate(paths), chunksize=1):
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+    return results
+
+
+def resolve_num_workers(value: str) -> int:
+    """
+        Converts the value of the -n CLI option to a number of worker processes.
+
+        :param value: "auto" for one worker per CPU or a positive number
+        :type value: str
+
+        :return: Number of worker processes
+        :rtype: int
+    """
+    if value == "auto":
+        return os.cpu_count() or 1
+    num_workers = int(value)
+    if num_workers < 1:
+        raise ValueError(value)
+    return num_workers
+
+
+def _run_indexed(item: typing.Tuple[int, str]) -> typing.Tuple[int, FileResult]:
+    index, path = item
+    return index, run_file(path, capture=True)
+
+
+def _run_indexed_forked(item: typing.Tuple[int, str]) -> typing.Tuple[int, FileResult]:
+    index, path = item
+    return index, run_file_forked(path, capture=True)
+
+
+def _run_module(path: str, result: FileResult) -> None:
+    """
+        Imports the test module and runs all the TestTemplate classes in it, updating the result.
+
+        :param path: The path to the unit test file
+        :type path: str
+
+        :param result: The result to update
+        :type result: FileResult
+    """
+    abs_path = os.path.abspath(path)
+    test_dir = os.path.dirname(abs_path)
+    module_name = _module_name(abs_path)
+
+    # Mimic "python3 <path>" which puts the directory of the script first on the path
+    saved_path = list(sys.path)
+    saved_modules = set(sys.modules)
+    sys.path.insert(0, test_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, abs_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        # Test files that call run() outside of a __main__ guard run their classes while they are imported
+        import_runs = []
+        j2test_module._import_runs = import_runs
+        try:
+            # A failing class exits like "python3 <path>" would, the classes after it do not run
+            spec.loader.exec_module(module)
+        finally:
+            j2test_module._import_runs = None
+            for instance in import_runs:
+                _add_instance(result, instance)
+
+        ran_on_import = {type(instance) for instance in import_runs}
+        for test_class in _find_test_classes(module):
+            if test_class in ran_on_import:
+                continue
+            instance = test_class()
+            try:
+                instance.run()
+            except SystemExit as e:
+                if _is_failure_code(e.code):
+                    result.exit_code = 1
+            _add_instance(result, instance)
+        # The snapshot file is shared by all the classes of the test file
+        snapshot.finish_file()
+    finally:
+        snapshot.finish_file(prune=False)
+        sys.modules.pop(module_name, None)
+        # Helper modules imported from the test directory, e.g. helpers.py, would otherwise be reused by
+        # the test files of other directories that import a module of the same name
+        for name in set(sys.modules) - saved_modules:
+            module_file = getattr(sys.modules[name], "__file__", None)
+            if module_file and os.path.abspath(module_file).startswith(test_dir + os.sep):
+                del sys.modules[name]
+        sys.path[:] = saved_path
+
+
+def _add_instance(result: FileResult, instance: TestTemplate) -> None:
+    """
+        Adds the counters of a test class that ran to the result.
+
+        :param result: The result to update
+        :type result: FileResult
+
+        :param instance: The test class instance whose run() returned or exited
+        :type instance: TestTemplate
+    """
+    result.num_classes += 1
+    result.num_tests += instance._num_tests
+    result.num_passed += instance._num_passed
+    result.num_failed += instance._num_failed
+    result.failed_tests.extend(
+        "{}.{}".format(type(instance).__name__, name) for name in instance._failed_tests)
+
+
+def _find_test_classes(module: typing.Any) -> typing.List[type]:
+    """
+        Finds the TestTemplate child classes defined in the module, in definition order. Base classes that other
+        classes of the module extend and classes without any test method are left out, they are not meant to
+        run on their own.
+
+        :param module: The imported test module
+        :type module: module
+
+        :return: TestTemplate child classes
+        :rtype: List[type]
+    """
+    classes = [obj for obj in list(vars(module).values())
+               if isinstance(obj, type)
+               and issubclass(obj, TestTemplate)
+               and obj is not TestTemplate
+               and obj.__module__ == module.__name__]
+    bases = {base for test_class in classes for base in test_class.__mro__[1:]}
+    return [test_class for test_class in classes
+            if test_class not in bases
+            and any(name.startswith("test") and callable(getattr(test_class, name)) for name in dir(test_class))]
+
+
+def _module_name(abs_path: str) -> str:
+    """
+        Unique module name for a test file so files with the same name in different folders do not clash.
+    """
+    digest = hashlib.sha1(abs_path.encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(abs_path))[0]
+    return "_j2test_{}_{}".format(name, digest)
+
+
+def _is_failure_code(code: typing.Any) -> bool:
+    return code is not None and code != 0
+
+
+@contextlib.contextmanager
+def _redirect_output(buffer: typing.Optional[io.StringIO]):
+    if buffer is None:
+        yield
+        return
+    with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+        yield
@@ -0,0 +1,156 @@
+import heapq
+import json
+import os
+import tempfile
+import typing
+
+# Default path of the recorded test file durations, relative to the directory j2test is run from
+DEFAULT_DURATIONS_PATH = os.path.join(".j2test_cache", "durations.json")
+
+
+def parse_shard(value: str) -> typing.Tuple[int, int]:
+    """
+        Parses a shard given as "i/N", where shards are numbered from 1 to N.
+
+        :param value: The shard, e.g. "2/4"
+        :type value: str
+
+        :return: The shard number and the number of shards
+        :rtype: Tuple[int, int]
+    """
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(value)
+    return index, count
+
+
+def assign(test_files: typing.List[str], count: int,
+           durations: typing.Optional[typing.Dict[str, float]] = None) -> typing.List[typing.List[str]]:
+    """
+        Splits the test files into shards that take about the same time to run. The longest test files are
+        assigned first, each to the shard with the least time so far. Test files without a recorded duration
+        count as the average recorded duration, or all test files count the same without any history.
+
+        The assignment only depends on the test files and the durations, so every CI node computes the same one.
+
+        :param test_files: Paths to the unit test files
+        :type test_files: List[str]
+
+        :param count: Number of shards
+        :type count: int
+
+        :param durations: Recorded duration in seconds per test file, see load_durations
+        :type durations: Dict[str, float]
+
+        :return: The test files of every shard, in the order they were given
+        :rtype: List[List[str]]
+    """
+    durations = durations or {}
+    keys = {path: duration_key(path) for path in test_files}
+    known = [durations[key] for key in keys.values() if key in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weights = {path: durations.get(key, default) for path, key in keys.items()}
+
+    shards = [[] for _ in range(count)]
+    # (time so far, shard number) so ties go to the lowest shard number
+    loads = [(0.0, number) for number in range(count)]
+    for path in sorted(test_files, key=lambda path: (-weights[path], keys[path])):
+        load, number = heapq.heappop(loads)
+        shards[number].append(path)
+        heapq.heappush(loads, (load + weights[path], number))
+
+    order = {path: position for position, path in enumerate(test_files)}
+    return [sorted(shard, key=order.get) for shard in shards]
+
+
+def select(test_files: typing.List[str], index: int, count: int,
+           durations: typing.Optional[typing.Dict[str, float]] = None) -> typing.List[str]:
+    """
+        Gets the test files of one shard, see assign.
+
+        :param test_files: Paths to the unit test files
+        :type test_files: List[str]
+
+        :param index: The shard number, from 1 to count
+        :type index: int
+
+        :param count: Number of shards
+        :type count: int
+
+        :param durations: Recorded duration in seconds per test file
+        :type durations: Dict[str, float]
+
+        :return: The test files of the shard
+        :rtype: List[str]
+    """
+    return assign(test_files, count, durations)[index - 1]
+
+
+def load_durations(path: str = DEFAULT_DURATIONS_PATH) -> typing.Dict[str, float]:
+    """
+        Loads the test file durations recorded by earlier runs.
+
+        :param path: Path of the JSON file, mapping test file paths relative to the working directory to seconds
+        :type path: str
+
+        :return: The durations, empty if there is no history
+        :rtype: Dict[str, float]
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {name: float(value) for name, value in data.items() if isinstance(value, (int, float))}
+
+
+def save_durations(durations: typing.Dict[str, float], path: str = DEFAULT_DURATIONS_PATH) -> None:
+    """
+        Records the durations of the test files that ran, keeping the recorded durations of the other files,
+        so shards that each run part of the suite can update the same file. Nothing is recorded when the file
+        can not be written.
+
+        :param durations: Duration in seconds per test file path
+        :type durations: Dict[str, float]
+
+        :param path: Path of the JSON file
+        :type path: str
+    """
+    if not durations:
+        return
+    recorded = load_durations(path)
+    recorded.update((duration_key(name), round(duration, 4)) for name, duration in durations.items())
+
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    except OSError:
+        # The durations only balance later shards, e.g. on a read-only checkout
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def duration_key(path: str) -> str:
+    """
+        :param path: Path to a unit test file
+        :type path: str
+
+        :return: The key of the test file in the durations, its path relative to the working directory so
+                 CI nodes with checkouts in different places share the durations
+        :rtype: str
+    """
+    return os.path.relpath(os.path.abspath(path)).replace(os.sep, "/")
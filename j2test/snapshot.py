@@ -0,0 +1,371 @@
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import typing
+import zlib
+import j2test.json_backend as json_backend
+import j2test.commons.utils_messages as utils_messages
+
+# Snapshots of a test file are stored in <test dir>/__snapshots__/<test file name>.snap
+SNAPSHOT_DIR = "__snapshots__"
+SNAPSHOT_EXTENSION = ".snap"
+MAGIC = b"J2SNAP\x00\x01"
+# Entries smaller than this are never compressed, zlib does not pay off for them
+COMPRESS_MIN_SIZE = 256
+# Entry flags
+FLAG_JSON = 1
+FLAG_ZLIB = 2
+FLAG_DIGEST = 4
+
+# Snapshot files updated while the current test file runs, by path: the keys recorded by its test classes, or
+# None once a class skipped or failed tests, see track and finish_file
+_tracked = {}
+
+# Magic, offset of the index, number of entries
+_HEADER = struct.Struct("<8sQQ")
+# Hash of the key, offset of the record, length of the payload, flags
+_INDEX_ENTRY = struct.Struct("<16sQII")
+# Length of the key, followed by the key and the payload
+_RECORD_HEADER = struct.Struct("<I")
+
+
+class Snapshot(typing.NamedTuple):
+    """
+        A recorded macro output: a parsed JSON value, or a string for macros that do not output JSON.
+        Digests recorded by assertOutputDigest are JSON values with is_digest set.
+    """
+
+    value: typing.Any
+    is_json: bool
+    is_digest: bool = False
+
+
+class SnapshotStore:
+    """
+        Read-only view of a packed snapshot file, one file holding all the snapshots of a test file.
+
+        The file starts with a header, followed by the records and an index sorted by a hash of the keys.
+        The file is memory-mapped and a lookup binary searches the index, so only the requested entry is read,
+        decompressed and parsed, however many entries the file holds.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mmap = None
+        self._index_offset = 0
+        self._count = 0
+
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise ValueError(utils_messages.INVALID_SNAPSHOT_FILE.format(path=path))
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            # No snapshots recorded yet
+            return
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(utils_messages.INVALID_SNAPSHOT_FILE.format(path=path))
+        magic, self._index_offset, self._count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or self._index_offset + self._count * _INDEX_ENTRY.size != len(self._mmap):
+            self.close()
+            raise ValueError(utils_messages.INVALID_SNAPSHOT_FILE.format(path=path))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def get(self, key: str) -> typing.Optional[Snapshot]:
+        """
+            :param key: Key of the snapshot
+            :type key: str
+
+            :return: The snapshot, None if there is no snapshot with this key
+            :rtype: Optional[Snapshot]
+        """
+        entry = self._find(key)
+        if entry is None:
+            return None
+        flags, payload = entry
+        return decode(flags, payload)
+
+    def entries(self) -> typing.Iterator[typing.Tuple[str, int, bytes]]:
+        """
+            Reads the entries without decompressing or parsing them, so they can be written to a new store as is.
+
+            :return: The key, flags and payload of every entry
+            :rtype: Iterator[Tuple[str, int, bytes]]
+        """
+        for position in range(self._count):
+            _, offset, length, flags = _INDEX_ENTRY.unpack_from(
+                self._mmap, self._index_offset + position * _INDEX_ENTRY.size)
+            key, payload = self._read_record(offset, length)
+            yield key, flags, payload
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._count = 0
+
+    def _find(self, key: str) -> typing.Optional[typing.Tuple[int, bytes]]:
+        key_hash = _hash(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = self._index_offset + middle * _INDEX_ENTRY.size
+            if self._mmap[start:start + 16] < key_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        # Several keys may share a hash prefix, the key is stored in the record to tell them apart
+        while low < self._count:
+            entry_hash, offset, length, flags = _INDEX_ENTRY.unpack_from(
+                self._mmap, self._index_offset + low * _INDEX_ENTRY.size)
+            if entry_hash != key_hash:
+                break
+            entry_key, payload = self._read_record(offset, length)
+            if entry_key == key:
+                return flags, payload
+            low += 1
+        return None
+
+    def _read_record(self, offset: int, length: int) -> typing.Tuple[str, bytes]:
+        key_length, = _RECORD_HEADER.unpack_from(self._mmap, offset)
+        start = offset + _RECORD_HEADER.size
+        key = self._mmap[start:start + key_length].decode("utf-8")
+        start += key_length
+        return key, self._mmap[start:start + length]
+
+
+def snapshot_path(test_path: str) -> str:
+    """
+        :param test_path: Path of a jinja unit test file
+        :type test_path: str
+
+        :return: Path of the snapshot file of the test file
+        :rtype: str
+    """
+    directory, name = os.path.split(test_path)
+    return os.path.join(directory, SNAPSHOT_DIR, os.path.splitext(name)[0] + SNAPSHOT_EXTENSION)
+
+
+def encode(value: typing.Any, is_json: bool, compress: bool = True,
+           is_digest: bool = False) -> typing.Tuple[int, bytes]:
+    """
+        Serializes a snapshot value, JSON values with sorted keys so equal values are stored the same.
+
+        :param value: The macro output
+        :type value: Any
+
+        :param is_json: The value is a parsed JSON value rather than a string
+        :type is_json: bool
+
+        :param compress: Compress the entry with zlib if it is large enough and gets smaller
+        :type compress: bool
+
+        :param is_digest: The value is a digest record of assertOutputDigest
+        :type is_digest: bool
+
+        :return: The flags and payload of the entry
+        :rtype: Tuple[int, bytes]
+    """
+    flags = (FLAG_JSON if is_json else 0) | (FLAG_DIGEST if is_digest else 0)
+    payload = (json_backend.dumps(value, sort_keys=True) if is_json else value).encode("utf-8")
+    if compress and len(payload) >= COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(payload)
+        if len(compressed) < len(payload):
+            return flags | FLAG_ZLIB, compressed
+    return flags, payload
+
+
+def decode(flags: int, payload: bytes) -> Snapshot:
+    """
+        :param flags: Flags of the entry
+        :type flags: int
+
+        :param payload: Payload of the entry, see encode
+        :type payload: bytes
+
+        :return: The snapshot
+        :rtype: Snapshot
+    """
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    if flags & FLAG_JSON:
+        return Snapshot(json_backend.loads(payload), True, bool(flags & FLAG_DIGEST))
+    return Snapshot(bytes(payload).decode("utf-8"), False)
+
+
+def write_store(path: str, entries: typing.Iterable[typing.Tuple[str, int, bytes]]) -> int:
+    """
+        Writes a snapshot file in one pass, to a temporary file that is then atomically moved in place.
+
+        :param path: Path of the snapshot file
+        :type path: str
+
+        :param entries: The key, flags and payload of every entry
+        :type entries: Iterable[Tuple[str, int, bytes]]
+
+        :return: Number of entries written
+        :rtype: int
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        index = []
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, 0, 0))
+            offset = _HEADER.size
+            for key, flags, payload in entries:
+                encoded_key = key.encode("utf-8")
+                index.append((_hash(key), offset, len(payload), flags))
+                f.write(_RECORD_HEADER.pack(len(encoded_key)))
+                f.write(encoded_key)
+                f.write(payload)
+                offset += _RECORD_HEADER.size + len(encoded_key) + len(payload)
+
+            index.sort()
+            f.write(b"".join(_INDEX_ENTRY.pack(*entry) for entry in index))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, offset, len(index)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(index)
+
+
+def update_store(path: str, snapshots: typing.Dict[str, Snapshot], prune: bool = False,
+                 compress: bool = True) -> bool:
+    """
+        Records new snapshots, rewriting the snapshot file once with the entries of the current file.
+        The file is left untouched when no snapshot changed.
+
+        :param path: Path of the snapshot file
+        :type path: str
+
+        :param snapshots: The snapshots to record by key
+        :type snapshots: Dict[str, Snapshot]
+
+        :param prune: Drop the entries that are not in snapshots, e.g. snapshots of removed tests
+        :type prune: bool
+
+        :param compress: Compress large entries, see encode
+        :type compress: bool
+
+        :return: True if the snapshot file was written
+        :rtype: bool
+    """
+    new_entries = {key: encode(snapshot.value, snapshot.is_json, compress, snapshot.is_digest)
+                   for key, snapshot in snapshots.items()}
+
+    try:
+        store = SnapshotStore(path)
+    except ValueError:
+        # Unreadable files are replaced
+        store = None
+    try:
+        old_entries = {key: (flags, bytes(payload)) for key, flags, payload in store.entries()} if store else {}
+    finally:
+        if store is not None:
+            store.close()
+
+    entries = dict(new_entries) if prune else {**old_entries, **new_entries}
+    if store is not None and os.path.exists(path) and entries.keys() == old_entries.keys() and \
+            all(_same_entry(entries[key], old_entries[key]) for key in entries):
+        return False
+
+    write_store(path, ((key, flags, payload) for key, (flags, payload) in sorted(entries.items())))
+    return True
+
+
+def prune_store(path: str, keys: typing.Collection[str]) -> int:
+    """
+        Drops the entries that are not in keys, e.g. snapshots of removed tests.
+
+        :param path: Path of the snapshot file
+        :type path: str
+
+        :param keys: Keys of the entries to keep
+        :type keys: Collection[str]
+
+        :return: Number of entries dropped
+        :rtype: int
+    """
+    try:
+        store = SnapshotStore(path)
+    except ValueError:
+        return 0
+    try:
+        entries = [(key, flags, bytes(payload)) for key, flags, payload in store.entries()]
+    finally:
+        store.close()
+
+    kept = [entry for entry in entries if entry[0] in keys]
+    if len(kept) == len(entries):
+        return 0
+    write_store(path, sorted(kept))
+    return len(entries) - len(kept)
+
+
+def track(path: str, keys: typing.Iterable[str], complete: bool) -> None:
+    """
+        Remembers the snapshots recorded by a test class, so the snapshot file, which is shared by all the classes
+        of the test file, is pruned once after the whole test file ran, see finish_file.
+
+        :param path: Path of the snapshot file
+        :type path: str
+
+        :param keys: Keys of the snapshots recorded by the class
+        :type keys: Iterable[str]
+
+        :param complete: Every test of the class ran and passed
+        :type complete: bool
+    """
+    if not _tracked:
+        # Test files run as scripts have no runner to call finish_file, registering twice is harmless
+        atexit.unregister(finish_file)
+        atexit.register(finish_file)
+    recorded = _tracked.setdefault(path, set())
+    if recorded is None or not complete:
+        _tracked[path] = None
+    else:
+        recorded.update(keys)
+
+
+def finish_file(prune: bool = True) -> None:
+    """
+        Drops the snapshots that no test class of the test file recorded, only when every test of the file ran
+        and passed, and forgets the tracked snapshot files.
+
+        :param prune: Prune the snapshot files, False when the test file did not run to the end
+        :type prune: bool
+    """
+    tracked = dict(_tracked)
+    _tracked.clear()
+    if not prune:
+        return
+    for path, keys in tracked.items():
+        if keys is not None:
+            num_pruned = prune_store(path, keys)
+            if num_pruned:
+                print(utils_messages.SNAPSHOTS_PRUNED.format(num_snapshots=num_pruned, path=os.path.relpath(path)))
+
+
+def _same_entry(entry: typing.Tuple[int, bytes], other: typing.Tuple[int, bytes]) -> bool:
+    # Compares the decoded payloads, compression settings may differ between runs
+    return entry == other or decode(*entry) == decode(*other)
+
+
+def _hash(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
@@ -0,0 +1,332 @@
+import contextlib
+import json
+import mmap
+import re
+import typing
+import j2test.diff as diff
+
+# Number of characters of the output encoded and compared at a time
+CHUNK_SIZE = 1 << 20
+# Number of tokens compared at once before looking for the differing token
+_WINDOW = 1024
+
+# A JSON token and the whitespace before it: string, punctuation, number, literal, or a run of other characters
+_JSON_TOKEN = re.compile(rb'\s*("[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]:,]|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?'
+                         rb'(?:[eE][+-]?[0-9]+)?|true|false|null|[^\s{}\[\]:,"]+|\S)', re.DOTALL)
+_NUMBER = re.compile(rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+# Characters a number, literal or other run of characters can not continue over
+_BOUNDARIES = frozenset(b' \t\r\n{}[]:,"')
+# Longest run of characters looked at when a chunk ends in a number or literal
+_MAX_TAIL = 256
+_NON_WHITESPACE = re.compile(rb"\S")
+
+
+class Divergence(typing.NamedTuple):
+    """
+        The first place the output and the expected file differ.
+    """
+
+    offset: int  # Byte offset in the expected file
+    line: int
+    column: int
+    expected: str  # Preview of the expected file from the offset
+    output: str  # Preview of the output from the same place
+    pointer: typing.Optional[str] = None  # JSON pointer of the differing value, for JSON comparisons
+
+
+@contextlib.contextmanager
+def open_expected(path: str) -> typing.Iterator[typing.Union[mmap.mmap, bytes]]:
+    """
+        Memory-maps an expected file, so it is paged in by the OS as it is compared instead of read into memory.
+
+        :param path: Path of the expected file
+        :type path: str
+
+        :return: The content of the file
+        :rtype: Iterator[Union[mmap, bytes]]
+    """
+    with open(path, "rb") as f:
+        try:
+            expected = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can not be memory-mapped
+            yield b""
+            return
+        try:
+            yield expected
+        finally:
+            expected.close()
+
+
+def iter_chunks(output: str, chunk_size: int = CHUNK_SIZE) -> typing.Iterator[str]:
+    """
+        :param output: Rendered output
+        :type output: str
+
+        :param chunk_size: Maximum number of characters per chunk
+        :type chunk_size: int
+
+        :return: Consecutive slices of the output
+        :rtype: Iterator[str]
+    """
+    for start in range(0, len(output), chunk_size):
+        yield output[start:start + chunk_size]
+
+
+def compare_text(chunks: typing.Iterable[str], expected: typing.Union[mmap.mmap, bytes],
+                 preview_length: int = 120) -> typing.Optional[Divergence]:
+    """
+        Compares output text with the content of an expected file, ignoring leading and trailing whitespace like
+        assertEqualString. The output is encoded and compared one chunk at a time and the comparison stops at
+        the first difference.
+
+        :param chunks: The output, in consecutive pieces
+        :type chunks: Iterable[str]
+
+        :param expected: Content of the expected file, UTF-8 encoded
+        :type expected: Union[mmap, bytes]
+
+        :param preview_length: Maximum number of characters of the previews of both sides
+        :type preview_length: int
+
+        :return: The first difference, None if they are the same
+        :rtype: Optional[Divergence]
+    """
+    first = _NON_WHITESPACE.search(expected)
+    position = first.start() if first else len(expected)
+    end = len(expected)
+    while end > position and expected[end - 1:end].isspace():
+        end -= 1
+
+    encoded_chunks = (chunk.encode("utf-8") for chunk in chunks)
+    started = False
+    # Trailing whitespace of the output so far, only compared once more output follows it
+    pending = b""
+    for encoded in encoded_chunks:
+        if not started:
+            encoded = encoded.lstrip()
+            if not encoded:
+                continue
+            started = True
+        body = encoded.rstrip()
+        if not body:
+            pending += encoded
+            continue
+        data = pending + body
+        pending = encoded[len(body):]
+
+        compared = expected[position:min(position + len(data), end)]
+        if compared != data:
+            offset = position + diff.first_divergence(compared, data)
+            output = _with_following(data[offset - position:] + pending, encoded_chunks, preview_length)
+            return _divergence(expected, offset, output, preview_length)
+        position += len(data)
+
+    if position < end:
+        return _divergence(expected, position, b"", preview_length)
+    return None
+
+
+def compare_json(chunks: typing.Iterable[str], expected: typing.Union[mmap.mmap, bytes],
+                 preview_length: int = 120) -> typing.Optional[Divergence]:
+    """
+        Compares output JSON with the content of an expected JSON file token by token, without parsing either
+        side into Python values. Whitespace and the spelling of strings and numbers do not matter, but objects
+        are compared key by key and lists element by element in document order. Both sides are tokenized one
+        chunk at a time and the comparison stops at the first difference.
+
+        :param chunks: The output, in consecutive pieces
+        :type chunks: Iterable[str]
+
+        :param expected: Content of the expected JSON file, UTF-8 encoded
+        :type expected: Union[mmap, bytes]
+
+        :param preview_length: Maximum number of characters of the previews of both sides
+        :type preview_length: int
+
+        :return: The first difference, None if they are the same
+        :rtype: Optional[Divergence]
+    """
+    expected_blocks = token_blocks(expected[start:start + CHUNK_SIZE] for start in range(0, len(expected), CHUNK_SIZE))
+    encoded_chunks = (chunk.encode("utf-8") for chunk in chunks)
+    output_blocks = token_blocks(encoded_chunks)
+    # Tokens of the current block of each side, the buffer they are in, where the block ends in the buffer and
+    # the position in the tokens
+    expected_tokens, expected_buffer, expected_cut, i = [], b"", 0, 0
+    output_tokens, output_buffer, _, j = [], b"", 0, 0
+    expected_base = 0
+
+    while True:
+        if i == len(expected_tokens):
+            expected_base += expected_cut
+            expected_tokens, expected_buffer, expected_cut = next(expected_blocks, ([], b"", 0))
+            i = 0
+        if j == len(output_tokens):
+            output_tokens, output_buffer, _ = next(output_blocks, ([], b"", 0))
+            j = 0
+        if not expected_tokens or not output_tokens:
+            break
+
+        size = min(len(expected_tokens) - i, len(output_tokens) - j, _WINDOW)
+        if expected_tokens[i:i + size] == output_tokens[j:j + size]:
+            i += size
+            j += size
+            continue
+        for _ in range(size):
+            if expected_tokens[i] != output_tokens[j] and not _same_value(output_tokens[j], expected_tokens[i]):
+                offset = expected_base + _token_offset(expected_buffer, i)
+                output = _with_following(output_buffer[_token_offset(output_buffer, j):], encoded_chunks,
+                                         preview_length)
+                return _json_divergence(expected, offset, output, preview_length)
+            i += 1
+            j += 1
+
+    if expected_tokens:
+        offset = expected_base + _token_offset(expected_buffer, i)
+        return _json_divergence(expected, offset, b"", preview_length)
+    if output_tokens:
+        output = _with_following(output_buffer[_token_offset(output_buffer, j):], encoded_chunks, preview_length)
+        return _json_divergence(expected, len(expected), output, preview_length)
+    return None
+
+
+def token_blocks(chunks: typing.Iterable[bytes]) -> typing.Iterator[typing.Tuple[typing.List[bytes], bytes, int]]:
+    """
+        Tokenizes JSON given in chunks. The tokens of a chunk are found by the regular expression engine at once,
+        tokens that may continue in the next chunk are held back until it arrives.
+
+        :return: The tokens of every block of complete tokens, the buffer the block starts, and the length
+                 of the block, the rest of the buffer is part of the next block
+        :rtype: Iterator[Tuple[List[bytes], bytes, int]]
+    """
+    carry = b""
+    for chunk in chunks:
+        buffer = carry + chunk
+        tokens = _JSON_TOKEN.findall(buffer)
+        cut = len(buffer)
+        if b'"' in tokens:
+            # A string without its closing quote, it is the last string of the buffer
+            cut = _unterminated_string(buffer)
+            tokens = tokens[:tokens.index(b'"')]
+        elif tokens and buffer[-1] not in _BOUNDARIES and tokens[-1][:1] != b'"':
+            # Ends in a number, a literal or other characters that may continue in the next chunk
+            cut = len(buffer) - 1
+            while cut > max(0, len(buffer) - _MAX_TAIL) and buffer[cut - 1] not in _BOUNDARIES:
+                cut -= 1
+            tokens = tokens[:len(tokens) - len(_JSON_TOKEN.findall(buffer, cut))]
+        if tokens:
+            yield tokens, buffer, cut
+            carry = buffer[cut:]
+        else:
+            carry = buffer
+
+    if carry:
+        yield _JSON_TOKEN.findall(carry), carry, len(carry)
+
+
+def _unterminated_string(buffer: bytes) -> int:
+    # Offset of the opening quote of a string that is not closed in the buffer: the last quote not escaped
+    position = len(buffer)
+    while True:
+        position = buffer.rfind(b'"', 0, position)
+        backslashes = 0
+        while position - backslashes > 0 and buffer[position - backslashes - 1] == ord("\\"):
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return position
+
+
+def _token_offset(block: bytes, index: int) -> int:
+    # Offset of a token of a block, found again once a difference was found
+    if index == 0:
+        match = _JSON_TOKEN.match(block)
+        return match.start(1) if match else len(block)
+    for position, match in enumerate(_JSON_TOKEN.finditer(block)):
+        if position == index:
+            return match.start(1)
+    return len(block)
+
+
+def _with_following(output: bytes, chunks: typing.Iterator[bytes], preview_length: int) -> bytes:
+    # Extends the output from a difference with the next chunks, enough for its preview
+    parts = [output]
+    size = len(output)
+    while size < preview_length * 4:
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        parts.append(chunk)
+        size += len(chunk)
+    return b"".join(parts)
+
+
+def _same_value(token: bytes, expected_token: bytes) -> bool:
+    # Strings with other escapes, e.g. "\u00e9" and "é", and numbers written differently, e.g. 1.0 and 1
+    if token[:1] == b'"' == expected_token[:1] and len(token) > 1 and len(expected_token) > 1 or \
+            _NUMBER.fullmatch(token) and _NUMBER.fullmatch(expected_token):
+        return json.loads(token) == json.loads(expected_token)
+    return False
+
+
+def _divergence(expected: typing.Union[mmap.mmap, bytes], offset: int, output: bytes,
+                preview_length: int, pointer: typing.Optional[str] = None) -> Divergence:
+    line = 1
+    for start in range(0, offset, CHUNK_SIZE):
+        line += expected[start:min(start + CHUNK_SIZE, offset)].count(b"\n")
+    column = offset - (expected.rfind(b"\n", 0, offset) + 1) + 1
+    return Divergence(offset, line, column,
+                      _preview(expected[offset:offset + preview_length * 4], preview_length, "<end of file>"),
+                      _preview(output[:preview_length * 4], preview_length, "<end of output>"), pointer)
+
+
+def _json_divergence(expected: typing.Union[mmap.mmap, bytes], offset: int, output: bytes,
+                     preview_length: int) -> Divergence:
+    return _divergence(expected, offset, output, preview_length, _pointer(expected, offset))
+
+
+def _pointer(expected: typing.Union[mmap.mmap, bytes], offset: int) -> str:
+    """
+        Finds the JSON pointer of the value at an offset of the expected file, by tokenizing the file up to it.
+        Only runs once a difference was found.
+    """
+    # [is object, key or index, expects a key]
+    stack = []
+    for match in _JSON_TOKEN.finditer(expected):
+        token = match.group(1)
+        top = stack[-1] if stack else None
+        at_offset = match.start(1) >= offset
+
+        if top is not None and top[0] and top[2] and token[:1] == b'"':
+            # When the key itself differs, the pointer is the one of the object
+            top[1], top[2] = (None, True) if at_offset else (json.loads(token), False)
+        elif token in (b",", b"}", b"]"):
+            if at_offset and top is not None:
+                # An element or member too many or too few, points at the next element or at the object
+                if top[0]:
+                    top[1] = None
+                else:
+                    top[1] += 1
+            elif token == b",":
+                if top is not None and top[0]:
+                    top[2] = True
+            elif stack:
+                stack.pop()
+        elif token != b":":
+            if top is not None and not top[0]:
+                top[1] += 1
+            if not at_offset:
+                if token == b"{":
+                    stack.append([True, None, True])
+                elif token == b"[":
+                    stack.append([False, -1, False])
+        if at_offset:
+            break
+    # Containers without a key or element yet are pointed at as a whole
+    return "".join("/" + diff.escape_pointer(key) for _, key, _ in stack if key is not None and key != -1)
+
+
+def _preview(data: bytes, preview_length: int, end: str) -> str:
+    if not data:
+        return end
+    text = bytes(data).decode("utf-8", errors="replace")
+    return text[:preview_length] + ("..." if len(text) > preview_length else "")
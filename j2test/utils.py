@@ -1,26 +1,63 @@
+import collections
+import hashlib
 import json
-import yaml
+import os
 import jinja2
 import j2test.commons.utils_messages as utils_messages
-from deepdiff import DeepDiff
-from typing import Dict
+import j2test.bytecode_cache as bytecode_cache
+import j2test.compare as compare
+import j2test.diff as diff_utils
+import j2test.native as native
+import j2test.json_backend as json_backend
+from j2test.fixture_cache import fixture_cache
+from typing import Any, Dict
 
 from j2test.filters.assert_global import assert_func
 from j2test.filters.base64_filter import base64_encode, base64_decode
-from j2test.filters.file_filter import read_from_file, write_to_file_filter
 from j2test.filters.from_json import from_json_filter
-from j2test.filters.jsonmerge import jsonmerge_filter
-from j2test.filters.jsonpath import jsonpath_filter
+from j2test.filters.lazy import lazy_filter
+from j2test.render_cache import SideEffect
 from j2test.filters.simple_to_json import simple_to_json_filter
 from j2test.filters.very_strict_undefined import VeryStrictUndefined
-from j2test.filters.yaml_filter import from_yaml_filter, to_yaml_filter
 from j2test.filters.regex_replace import regex_replace
 import j2test.filters.hcl as hcl
 
-
-def get_template(template_path: str, env_path: str) -> jinja2.Template:
+# Filters with heavy dependencies (jsonmerge, jsonpath, ruamel.yaml) are only imported when a template calls them
+# Reading and writing files are side effects, the render cache does not keep the outputs of macros that do it
+read_from_file = SideEffect(lazy_filter("j2test.filters.file_filter", "read_from_file", with_context=True))
+write_to_file_filter = SideEffect(lazy_filter("j2test.filters.file_filter", "write_to_file_filter"))
+jsonmerge_filter = lazy_filter("j2test.filters.jsonmerge", "jsonmerge_filter")
+jsonpath_filter = lazy_filter("j2test.filters.jsonpath", "jsonpath_filter")
+from_yaml_filter = lazy_filter("j2test.filters.yaml_filter", "from_yaml_filter")
+to_yaml_filter = lazy_filter("j2test.filters.yaml_filter", "to_yaml_filter")
+
+# Environment variable used to pass the auto reload option from the CLI to the test files
+AUTO_RELOAD_ENV_VAR = "J2TEST_AUTO_RELOAD"
+# Environment variable used to pass the bytecode cache directory from the CLI to the test files
+BYTECODE_CACHE_ENV_VAR = "J2TEST_BYTECODE_CACHE"
+# Environment variable used to pass the precompiled template archive from the CLI to the test files
+PRECOMPILED_ENV_VAR = "J2TEST_PRECOMPILED"
+# Environment variable used to pass the YAML loading mode from the CLI to the test files
+YAML_MODE_ENV_VAR = "J2TEST_YAML_MODE"
+# Environment variable used to pass the names of the tests to run from the CLI to the test files
+SELECT_ENV_VAR = "J2TEST_SELECT"
+# Environment variable used to pass the snapshot update mode from the CLI to the test files
+UPDATE_SNAPSHOTS_ENV_VAR = "J2TEST_UPDATE_SNAPSHOTS"
+YAML_MODE_FULL = "full"
+YAML_MODE_SAFE = "safe"
+# Maximum number of jinja environments kept alive in the environment registry
+ENV_CACHE_SIZE = 32
+
+_env_cache = collections.OrderedDict()
+
+
+def get_template(template_path: str, env_path: str, auto_reload: bool = None,
+                 bytecode_cache_dir: str = None, precompiled_path: str = None,
+                 native_rendering: bool = False) -> jinja2.Template:
     """
         Gets the Jinja2 template in Python using the Jinja2 API.
+        The template is loaded through the shared environment of env_path, so templates that were already
+        compiled in this process, including the ones they import, are reused.
 
         :param template_path: Path to template file relative to env_path
         :type args: str
@@ -28,10 +65,26 @@ def get_template(template_path: str, env_path: str) -> jinja2.Template:
         :param env_path: Base directory in which all jinja files are located within
         :type env_path: str
 
+        :param auto_reload: Check whether the template files changed on disk every time a template is
+                            loaded. Defaults to the J2TEST_AUTO_RELOAD environment variable or True.
+        :type auto_reload: bool
+
+        :param bytecode_cache_dir: Directory of the persistent compiled template cache.
+                                   Defaults to the J2TEST_BYTECODE_CACHE environment variable, if set.
+        :type bytecode_cache_dir: str
+
+        :param precompiled_path: Archive created by "j2test compile" to load the templates from.
+                                 Defaults to the J2TEST_PRECOMPILED environment variable, if set.
+        :type precompiled_path: str
+
+        :param native_rendering: Load the template in the native rendering mode, where macros that only
+                                 output a tojson value return the value itself
+        :type native_rendering: bool
+
         :return: Jinja2 template if found
         :rtype: jinja2.Template
     """
-    env = _get_env(env_path)
+    env = get_env(env_path, auto_reload, bytecode_cache_dir, precompiled_path, native_rendering)
 
     try:
         template = env.get_template(template_path)
@@ -78,9 +131,12 @@ def render_macro_json(macro, args: any) -> Dict:
         :return: Python dictionary
         :rtype: dict[str, any]
     """
-    rendered_macro = render_macro_str(macro, args)
+    rendered_macro = _render_macro(macro, args)
+    if isinstance(rendered_macro, native.NativeJson):
+        # Native rendering mode, the macro returned the value it passed to tojson
+        return rendered_macro.value
     try:
-        output = json.loads(rendered_macro)
+        output = json_backend.loads(rendered_macro)
         return output
     except:
         print(utils_messages.INVALID_JSON_ERR.format(macro=macro))
@@ -100,6 +156,14 @@ def render_macro_str(macro, args: any) -> str:
         :return: Macro string return value
         :rtype: str
     """
+    rendered_macro = _render_macro(macro, args)
+    if rendered_macro is not None and not isinstance(rendered_macro, str):
+        # Deferred JSON value of the native rendering mode
+        rendered_macro = str(rendered_macro)
+    return rendered_macro
+
+
+def _render_macro(macro, args: any) -> Any:
     try:
         rendered_macro = macro(*args)
         return rendered_macro
@@ -109,10 +173,10 @@ def render_macro_str(macro, args: any) -> str:
         print(utils_messages.MACRO_RENDER_ERR.format(macro=macro, e=e))
 
 
-def assert_json(output: Dict, expected: Dict) -> bool:
+def assert_json(output: Dict, expected: Dict, ignore_order: bool = True) -> bool:
     """
-        Asserts that the two python dictionaries are the same no matter the order.
-        Sorts both dictionaries before checking.
+        Asserts that the two python dictionaries are the same no matter the order of the keys.
+        Lists are compared regardless of the order of their elements unless ignore_order is False.
 
         :param output: Output generated by jinja macro.
         :type output: dict[str, any]
@@ -120,18 +184,21 @@ def assert_json(output: Dict, expected: Dict) -> bool:
         :param expected: Expected JSON for the jinja macro.
         :type expected: dict[str, any]
 
+        :param ignore_order: Compare lists regardless of the order of their elements
+        :type ignore_order: bool
+
         :return: True if same and False otherwise
         :rtype: bool
     """
     if isinstance(output, dict) and isinstance(expected, dict):
-        return ordered(output) == ordered(expected)
+        return compare.json_equal(output, expected, ignore_order)
     else:
         print(utils_messages.INVALID_JSON_TYPE.format(
             expected_type=type(expected), output_type=type(output)))
         return False
 
 
-def get_json_file(path: str, curr_method: str) -> Dict:
+def get_json_file(path: str, curr_method: str, use_cache: bool = False) -> Dict:
     """
         Reads in a JSON file and converts it to a Python dictionary.
 
@@ -141,21 +208,27 @@ def get_json_file(path: str, curr_method: str) -> Dict:
         :param curr_method: The current unit test function name for error msgs
         :type curr_method: str
 
+        :param use_cache: Reuse the file parsed earlier in this process if it did not change,
+                          a copy of the cached data is returned
+        :type use_cache: bool
+
         :return: Python dictionary loaded from json file
         :rtype: dic
     """
     try:
-        with open(path) as f:
-            return json.load(f)
+        if use_cache:
+            return fixture_cache.load(path, _read_json_file)
+        return _read_json_file(path)
     except json.decoder.JSONDecodeError as e:
         print(utils_messages.JSON_DECODER_ERR.format(path=path, method=curr_method, e=e))
     except Exception as e:
         print(utils_messages.JSON_LOAD_ERR.format(path=path, method=curr_method, e=e))
 
 
-def get_yaml_file(path: str, curr_method: str) -> Dict:
+def get_yaml_file(path: str, curr_method: str, use_cache: bool = False, mode: str = None) -> Dict:
     """
         Reads in a YAML file and converts it to a Python dictionary.
+        The file is parsed with libyaml when PyYAML was built with it, and with the pure Python loader otherwise.
 
         :param path: Absolute path to YAML file.
         :type path: str
@@ -163,21 +236,83 @@ def get_yaml_file(path: str, curr_method: str) -> Dict:
         :param curr_method: The current unit test function name for error msgs
         :type curr_method: str
 
+        :param use_cache: Reuse the file parsed earlier in this process if it did not change,
+                          a copy of the cached data is returned
+        :type use_cache: bool
+
+        :param mode: "full" to load like yaml.FullLoader or "safe" to load like yaml.SafeLoader.
+                     Defaults to the J2TEST_YAML_MODE environment variable or "full".
+        :type mode: str
+
         :return: Python dictionary loaded from yaml file
         :rtype: dict
     """
+    # PyYAML is only imported once a YAML file is loaded
+    import yaml
+
     try:
-        with open(path) as f:
-            return yaml.load(f, Loader=yaml.FullLoader)
+        mode = mode or os.environ.get(YAML_MODE_ENV_VAR) or YAML_MODE_FULL
+        if mode not in _yaml_readers:
+            raise ValueError(utils_messages.INVALID_YAML_MODE.format(mode=mode))
+        reader = _yaml_readers[mode]
+        if use_cache:
+            return fixture_cache.load(path, reader)
+        return reader(path)
     except yaml.YAMLError as e:
         print(utils_messages.INVALID_YAML_ERR.format(path=path, method=curr_method, e=e))
     except Exception as e:
         print(utils_messages.YAML_LOAD_ERR.format(path=path, method=curr_method, e=e))
 
 
+def get_yaml_loader(mode: str = YAML_MODE_FULL) -> type:
+    """
+        Gets the fastest available PyYAML loader for the mode: the libyaml based CFullLoader or CSafeLoader
+        when PyYAML was built with libyaml, the pure Python FullLoader or SafeLoader otherwise.
+
+        :param mode: "full" or "safe"
+        :type mode: str
+
+        :return: The PyYAML loader class
+        :rtype: type
+    """
+    import yaml
+
+    if mode == YAML_MODE_SAFE:
+        return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    if mode == YAML_MODE_FULL:
+        return getattr(yaml, "CFullLoader", yaml.FullLoader)
+    raise ValueError(utils_messages.INVALID_YAML_MODE.format(mode=mode))
+
+
+def _read_json_file(path: str) -> Dict:
+    return json_backend.load_file(path)
+
+
+def _read_yaml_file_full(path: str) -> Dict:
+    # Binary so libyaml decodes the file itself instead of going through a Python text stream
+    import yaml
+
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=get_yaml_loader(YAML_MODE_FULL))
+
+
+def _read_yaml_file_safe(path: str) -> Dict:
+    import yaml
+
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=get_yaml_loader(YAML_MODE_SAFE))
+
+
+_yaml_readers = {
+    YAML_MODE_FULL: _read_yaml_file_full,
+    YAML_MODE_SAFE: _read_yaml_file_safe,
+}
+
+
 def ordered(obj: any) -> any:
     """
-        Orders the python dictionary (also it's nested dictionaries) by it's keys or an array
+        Orders the python dictionary (also it's nested dictionaries) by it's keys or an array.
+        Kept for backwards compatibility, assert_json uses compare.json_equal which does not need sorting.
 
         :param obj: Python dictionary or list
         :type obj: dic / list
@@ -204,7 +339,8 @@ def assert_string(output: str, expected: str) -> bool:
 
 def json_diff(output: Dict, expected: Dict, print_all: bool=True) -> Dict:
     """
-        Does a deep diff between the output and expected JSON and returns the differences if any
+        Does a deep diff between the output and expected JSON and returns the differences if any.
+        The assertions use print_json_diff instead, which stays fast and bounded on large documents.
 
         :param output: Output JSON
         :type output: dict[str, any]
@@ -221,6 +357,9 @@ def json_diff(output: Dict, expected: Dict, print_all: bool=True) -> Dict:
     if print_all:
         print(utils_messages.COMPARE_JSON_MSG.format(expected=expected, output=output))
 
+    # deepdiff is slow to import and only needed when a diff is printed
+    from deepdiff import DeepDiff
+
     diff = DeepDiff(expected, output, report_repetition=True,
                     ignore_order=True)
     if diff != {}:
@@ -228,20 +367,229 @@ def json_diff(output: Dict, expected: Dict, print_all: bool=True) -> Dict:
             diff, indent=4, default=str)))
     return diff
 
-def _get_env(repository_root: str) -> jinja2.Environment:
+def print_json_diff(output: Dict, expected: Dict, print_all: bool = True, ignore_order: bool = True,
+                    max_diffs: int = 50, preview_length: int = 120, document_preview_length: int = 2000) -> list:
+    """
+        Prints a bounded structural diff between the output and expected JSON with the JSON pointer of every
+        added, removed and changed value. Unlike json_diff, the diff stops once max_diffs differences were found
+        and all printed values are truncated previews, so huge documents do not flood the logs.
+
+        :param output: Output JSON
+        :type output: dict[str, any]
+
+        :param expected: Expected JSON
+        :type expected: dict[str, any]
+
+        :param print_all: Option to print a preview of the output and expected along with the difference
+        :type print_all: bool
+
+        :param ignore_order: Compare lists regardless of the order of their elements
+        :type ignore_order: bool
+
+        :param max_diffs: Maximum number of differences to report
+        :type max_diffs: int
+
+        :param preview_length: Maximum number of characters printed per differing value
+        :type preview_length: int
+
+        :param document_preview_length: Maximum number of characters printed for the output and expected with print_all
+        :type document_preview_length: int
+
+        :return: The reported differences
+        :rtype: List[j2test.diff.Difference]
+    """
+    if print_all:
+        print(utils_messages.COMPARE_JSON_MSG.format(
+            expected=diff_utils.preview(expected, document_preview_length),
+            output=diff_utils.preview(output, document_preview_length)))
+
+    diffs, truncated = diff_utils.json_diff(output, expected, ignore_order, max_diffs)
+    if diffs:
+        lines = []
+        for diff in diffs:
+            if diff.kind == diff_utils.ADDED:
+                lines.append(utils_messages.DIFF_ADDED.format(
+                    path=diff.path or "/", output=diff_utils.preview(diff.output, preview_length)))
+            elif diff.kind == diff_utils.REMOVED:
+                lines.append(utils_messages.DIFF_REMOVED.format(
+                    path=diff.path or "/", expected=diff_utils.preview(diff.expected, preview_length)))
+            else:
+                lines.append(utils_messages.DIFF_CHANGED.format(
+                    path=diff.path or "/", expected=diff_utils.preview(diff.expected, preview_length),
+                    output=diff_utils.preview(diff.output, preview_length)))
+        message = utils_messages.STRUCTURAL_DIFF_TRUNCATED_MSG if truncated else utils_messages.STRUCTURAL_DIFF_MSG
+        print(message.format(num_diffs=len(diffs), diffs="\n".join(lines)))
+    return diffs
+
+
+def print_string_diff(output: str, expected: str, context: int = 3, max_diff_lines: int = 200,
+                      line_length: int = 120, max_size: int = 10000000, max_edits: int = 1000) -> None:
+    """
+        Prints where the output and expected strings first differ and a unified line diff with bounded context.
+        Like assert_string, leading and trailing whitespace is ignored. When the strings are larger than max_size
+        or more than max_edits lines differ, only the first difference and a size and hash summary are printed.
+
+        :param output: Output string
+        :type output: str
+
+        :param expected: Expected string
+        :type expected: str
+
+        :param context: Number of unchanged lines shown around every change
+        :type context: int
+
+        :param max_diff_lines: Maximum number of diff lines printed
+        :type max_diff_lines: int
+
+        :param line_length: Maximum number of characters printed per line
+        :type line_length: int
+
+        :param max_size: Maximum combined size of the strings in characters to compute the line diff for
+        :type max_size: int
+
+        :param max_edits: Maximum number of added and removed lines to compute the line diff for
+        :type max_edits: int
+    """
+    expected = expected.strip()
+    output = output.strip()
+    offset = diff_utils.first_divergence(expected, output)
+    if offset < 0:
+        return
+
+    half = max(line_length // 2, 1)
+    print(utils_messages.FIRST_DIVERGENCE_MSG.format(
+        line=expected.count("\n", 0, offset) + 1,
+        column=offset - expected.rfind("\n", 0, offset),
+        offset=offset,
+        expected=repr(expected[max(0, offset - half):offset + half]),
+        output=repr(output[max(0, offset - half):offset + half])))
+
+    lines = None
+    if len(expected) + len(output) > max_size:
+        reason = utils_messages.TEXT_DIFF_TOO_LARGE.format(max_size=max_size)
+    else:
+        lines = diff_utils.line_diff(expected.split("\n"), output.split("\n"), context, max_edits)
+        reason = utils_messages.TEXT_DIFF_TOO_MANY_EDITS.format(max_edits=max_edits)
+
+    if lines is None:
+        print(utils_messages.TEXT_DIFF_SKIPPED_MSG.format(
+            reason=reason,
+            expected_size=len(expected),
+            expected_hash=hashlib.sha256(expected.encode("utf-8")).hexdigest(),
+            output_size=len(output),
+            output_hash=hashlib.sha256(output.encode("utf-8")).hexdigest()))
+        return
+
+    shown = [line if len(line) <= line_length else line[:line_length] + "..." for line in lines[:max_diff_lines]]
+    if len(lines) > max_diff_lines:
+        shown.append(utils_messages.TEXT_DIFF_TRUNCATED_MSG.format(num_lines=len(lines) - max_diff_lines))
+    print(utils_messages.TEXT_DIFF_MSG.format(diff="\n".join(shown)))
+
+
+def get_env(repository_root: str, auto_reload: bool = None, bytecode_cache_dir: str = None,
+            precompiled_path: str = None, native_rendering: bool = False) -> jinja2.Environment:
+    """
+        Gets the shared jinja environment for the repository root from the environment registry,
+        creating it if needed. Environments are kept in a bounded LRU keyed by the root and the
+        environment configuration so compiled templates are reused across test classes and files.
+
+        :param repository_root: File path in which all needed template files are in
+        :type repository_root: str
+
+        :param auto_reload: Check whether the template files changed on disk every time a template is
+                            loaded. Defaults to the J2TEST_AUTO_RELOAD environment variable or True.
+        :type auto_reload: bool
+
+        :param bytecode_cache_dir: Directory of the persistent compiled template cache.
+                                   Defaults to the J2TEST_BYTECODE_CACHE environment variable, if set.
+        :type bytecode_cache_dir: str
+
+        :param precompiled_path: Archive created by "j2test compile" to load the templates from.
+                                 Defaults to the J2TEST_PRECOMPILED environment variable, if set.
+        :type precompiled_path: str
+
+        :param native_rendering: Create the environment of the native rendering mode, where macros that only
+                                 output a tojson value return the value itself
+        :type native_rendering: bool
+
+        :return: Jinja2 Environment
+        :rtype: jinja2.Environment
+    """
+    if auto_reload is None:
+        auto_reload = os.environ.get(AUTO_RELOAD_ENV_VAR, "1") != "0"
+    if bytecode_cache_dir is None:
+        bytecode_cache_dir = os.environ.get(BYTECODE_CACHE_ENV_VAR) or None
+    if bytecode_cache_dir is not None:
+        bytecode_cache_dir = os.path.abspath(bytecode_cache_dir)
+    if precompiled_path is None:
+        precompiled_path = os.environ.get(PRECOMPILED_ENV_VAR) or None
+    if precompiled_path is not None and not native_rendering:
+        precompiled_path = os.path.abspath(precompiled_path)
+    else:
+        # Precompiled archives contain the code of the default rendering mode
+        precompiled_path = None
+
+    key = (os.path.abspath(repository_root), auto_reload, bytecode_cache_dir, precompiled_path, native_rendering)
+    env = _env_cache.get(key)
+    if env is not None:
+        _env_cache.move_to_end(key)
+        return env
+
+    env = _get_env(key[0], auto_reload, bytecode_cache_dir, precompiled_path, native_rendering)
+    _env_cache[key] = env
+    while len(_env_cache) > ENV_CACHE_SIZE:
+        _env_cache.popitem(last=False)
+    return env
+
+
+def clear_env_cache() -> None:
+    """
+        Drops all the shared jinja environments and with them all the compiled templates.
+    """
+    _env_cache.clear()
+
+
+def _get_env(repository_root: str, auto_reload: bool = True, bytecode_cache_dir: str = None,
+             precompiled_path: str = None, native_rendering: bool = False) -> jinja2.Environment:
     """
         Create a jinja environment. Only jinja template files within the environment may be accessed and used.
 
         :param repository_root: Absolute file path in which all needed template files are in
         :type repository_root: str
 
+        :param auto_reload: Check whether the template files changed on disk every time a template is loaded
+        :type auto_reload: bool
+
+        :param bytecode_cache_dir: Directory of the persistent compiled template cache, if any
+        :type bytecode_cache_dir: str
+
+        :param precompiled_path: Archive created by "j2test compile" to load the templates from, if any
+        :type precompiled_path: str
+
+        :param native_rendering: Create the environment of the native rendering mode
+        :type native_rendering: bool
+
         :return: Jinja2 Environment
         :rtype: jinja2.Environment
     """
+    bcc = None
+    if bytecode_cache_dir is not None:
+        bcc = bytecode_cache.get_bytecode_cache(bytecode_cache_dir)
 
-    env = jinja2.Environment(
+    if precompiled_path is not None:
+        import j2test.precompile as precompile
+        loader = precompile.PrecompiledLoader(repository_root, precompiled_path)
+    else:
+        loader = jinja2.FileSystemLoader(repository_root)
+
+    env_class = native.NativeJsonEnvironment if native_rendering else jinja2.Environment
+    env = env_class(
         # All import/include paths are relative to the repository root
-        loader=jinja2.FileSystemLoader(repository_root),
+        loader=loader,
+        # Skips the stat of every template file on each load when the templates do not change during a run
+        auto_reload=auto_reload,
+        # Reuses the bytecode of templates compiled by previous runs
+        bytecode_cache=bcc,
         # This forces errors for undefined variables and keys
         undefined=VeryStrictUndefined,
         extensions=[
@@ -266,4 +614,8 @@ def _get_env(repository_root: str) -> jinja2.Environment:
     env.filters["toyaml"] = to_yaml_filter
     env.filters["writetofile"] = write_to_file_filter
 
+    if native_rendering:
+        env.filters["fromjson"] = native.native_from_json_filter
+        env.filters["tojson"] = native.native_to_json_filter
+
     return env
\ No newline at end of file
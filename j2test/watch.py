@@ -0,0 +1,112 @@
+import os
+import time
+import typing
+import j2test.commons.cli_messages as cli_messages
+from j2test import deps
+
+# Seconds between two scans of the watched directories
+POLL_INTERVAL = 0.5
+
+
+def snapshot(roots: typing.Iterable[str]) -> typing.Dict[str, int]:
+    """
+        Records the modification time of every watched file under the directories.
+
+        :param roots: The directories to scan
+        :type roots: Iterable[str]
+
+        :return: Absolute path -> modification time in nanoseconds
+        :rtype: Dict[str, int]
+    """
+    mtimes = {}
+    for root in _outermost(roots):
+        for dir_path, dir_names, files in os.walk(root):
+            # Hidden directories such as .git and .j2test_cache never hold tests or templates
+            dir_names[:] = [name for name in dir_names if not name.startswith(".") and name not in deps.SKIPPED_DIRS]
+            for file in files:
+                if deps.is_watched_file(file):
+                    path = os.path.join(dir_path, file)
+                    try:
+                        mtimes[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        continue
+    return mtimes
+
+
+def changed_files(before: typing.Dict[str, int], after: typing.Dict[str, int]) -> typing.Set[str]:
+    """
+        :param before: Earlier snapshot
+        :type before: Dict[str, int]
+
+        :param after: Later snapshot
+        :type after: Dict[str, int]
+
+        :return: Files that were changed, added or removed between the snapshots
+        :rtype: Set[str]
+    """
+    changed = {path for path, mtime in after.items() if before.get(path) != mtime}
+    changed.update(path for path in before if path not in after)
+    return changed
+
+
+def watch(graph: deps.DependencyGraph, roots: typing.Iterable[str],
+          run_function: typing.Callable[[typing.List[str]], typing.Any],
+          discover: bool = True, interval: float = POLL_INTERVAL,
+          max_iterations: typing.Optional[int] = None) -> None:
+    """
+        Polls the directories and runs the test files affected by every change, until interrupted.
+
+        :param graph: Dependency graph of the test files to run
+        :type graph: j2test.deps.DependencyGraph
+
+        :param roots: The directories of the test files, templates and fixtures
+        :type roots: Iterable[str]
+
+        :param run_function: Called with the paths of the affected test files
+        :type run_function: Callable[[List[str]], Any]
+
+        :param discover: Add test files created under the directories to the graph
+        :type discover: bool
+
+        :param interval: Seconds between two scans
+        :type interval: float
+
+        :param max_iterations: Stop after this many scans, watches forever if None
+        :type max_iterations: int
+    """
+    roots = [os.path.abspath(root) for root in roots]
+    before = snapshot(roots)
+    iteration = 0
+    print(cli_messages.WATCH_MSG.format(num_files=len(before)))
+    while max_iterations is None or iteration < max_iterations:
+        iteration += 1
+        time.sleep(interval)
+        after = snapshot(roots)
+        changed = changed_files(before, after)
+        if not changed:
+            continue
+        # Editors often write a file in several steps, wait for the next scan to see the same files
+        time.sleep(interval / 5)
+        after = snapshot(roots)
+        changed.update(changed_files(before, after))
+        before = after
+
+        if not discover:
+            changed_tests = {path for path in changed if deps.is_test_file(path)}
+            changed -= changed_tests - set(graph.test_files)
+        affected = graph.affected(changed)
+        if not affected:
+            print(cli_messages.WATCH_NOTHING_AFFECTED_MSG.format(num_changed=len(changed)))
+            continue
+        print(cli_messages.WATCH_RERUN_MSG.format(num_changed=len(changed), num_files=len(affected)))
+        run_function(affected)
+        print(cli_messages.WATCH_MSG.format(num_files=len(after)))
+
+
+def _outermost(roots: typing.Iterable[str]) -> typing.List[str]:
+    # Directories inside another directory of the list are already scanned with it
+    result = []
+    for root in sorted(set(os.path.abspath(root) for root in roots)):
+        if not any(root == outer or root.startswith(outer + os.sep) for outer in result):
+            result.append(root)
+    return result
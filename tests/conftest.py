@@ -0,0 +1,32 @@
+import os
+import shutil
+import pytest
+
+CURR_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# A jinja unit test file with a failing test. It is written out for the tests that need one, a failing test file
+# in the repository would make "j2test" fail when run from its root.
+FAILING_TEST_FILE = """import j2test
+
+
+class ContextTest(j2test.TestTemplate):
+    vars = {"std": {"env": {"instance": "NONE", "server": "server123", "datacenter": {"region": "region1", "type": "some_type"}}}}
+
+    def test_request_level(self):
+        self.assertEqualString("get_request_level", [self.vars], "SERVER")
+
+    def test_request_level_wrong(self):
+        self.assertEqualString("get_request_level", [self.vars], "DATACENTER")
+
+
+if __name__ == '__main__':
+    ContextTest().run()
+"""
+
+
+@pytest.fixture
+def failing_file(tmp_path):
+    shutil.copy(os.path.join(CURR_PATH, "templates", "context.j2"), str(tmp_path / "context.j2"))
+    path = tmp_path / "jtest_context.py"
+    path.write_text(FAILING_TEST_FILE)
+    return str(path)
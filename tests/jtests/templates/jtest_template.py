@@ -0,0 +1,16 @@
+import j2test
+
+
+class TemplateTest(j2test.TestTemplate):
+    macro = "template_macro"
+
+    def test_equal_json(self):
+        expected = {"key1": "value1", "key2": "value2"}
+        self.assertEqualJson(self.macro, ["value1", "value2"], expected)
+
+    def test_equal_str(self):
+        self.assertEqualString("macro_str", ["TEST"], "TEST")
+
+
+if __name__ == '__main__':
+    TemplateTest().run()
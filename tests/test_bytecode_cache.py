@@ -0,0 +1,56 @@
+import pytest
+import os
+import jinja2
+from j2test import bytecode_cache, utils
+
+CURR_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(cache_dir: str) -> jinja2.Template:
+    # A fresh environment each time so the template is not served from the in-memory cache
+    env = utils._get_env(CURR_PATH, bytecode_cache_dir=cache_dir)
+    return env.get_template("templates/context.j2")
+
+def test_bytecode_cache_hit(tmp_path):
+    cache_dir = str(tmp_path / "bcc")
+    before = bytecode_cache.get_stats()
+    _load(cache_dir)
+    after_first = bytecode_cache.get_stats()
+    template = _load(cache_dir)
+    after_second = bytecode_cache.get_stats()
+
+    assert(after_first["misses"] - before["misses"] == 1)
+    assert(after_first["writes"] - before["writes"] == 1)
+    assert(after_second["hits"] - after_first["hits"] == 1)
+    assert(len(os.listdir(cache_dir)) == 1)
+    assert(utils.get_macro(template, "get_request_level") != None)
+
+def test_bytecode_cache_corrupted_entry(tmp_path):
+    cache_dir = str(tmp_path / "bcc")
+    _load(cache_dir)
+    for name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, name), "wb") as f:
+            f.write(b"garbage")
+
+    before = bytecode_cache.get_stats()
+    template = _load(cache_dir)
+    assert(bytecode_cache.get_stats()["misses"] - before["misses"] == 1)
+    assert(utils.get_macro(template, "get_request_level") != None)
+
+def test_bytecode_cache_unwritable(tmp_path):
+    (tmp_path / "file").write_text("")
+    # The cache directory would be created under a file
+    cache_dir = str(tmp_path / "file" / "bcc")
+    before = bytecode_cache.get_stats()
+    template = _load(cache_dir)
+    assert(bytecode_cache.get_stats()["writes"] == before["writes"])
+    assert(utils.get_macro(template, "get_request_level") != None)
+
+def test_get_bytecode_cache_shared(tmp_path):
+    cache = bytecode_cache.get_bytecode_cache(str(tmp_path))
+    assert(bytecode_cache.get_bytecode_cache(str(tmp_path) + "/") is cache)
+
+def test_get_env_bytecode_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(utils.BYTECODE_CACHE_ENV_VAR, str(tmp_path))
+    env = utils.get_env(CURR_PATH)
+    assert(isinstance(env.bytecode_cache, bytecode_cache.PersistentBytecodeCache))
@@ -0,0 +1,51 @@
+import pytest
+from j2test import cases
+
+
+def test_iter_cases_jsonl(tmp_path):
+    path = tmp_path / "cases.jsonl"
+    path.write_text('{"args": [1, "a"], "expected": {"key": 1}}\n\n'
+                    '{"expected": "text"}\n'
+                    '{"args": [1\n'
+                    '{"args": 1, "expected": "text"}\n')
+    result = list(cases.iter_cases(str(path)))
+    assert(result[0] == cases.Case(1, [1, "a"], {"key": 1}))
+    assert(result[1] == cases.Case(3, [], "text"))
+    assert(result[2].line_number == 4 and result[2].error is not None)
+    assert(result[3].line_number == 5 and result[3].error is not None)
+
+def test_iter_cases_csv_columns(tmp_path):
+    path = tmp_path / "cases.csv"
+    path.write_text('name,count,expected\n'
+                    'value,3,value-3\n'
+                    '"multi\nline","[1, 2]","{""key"": 1}"\n'
+                    'missing,column\n')
+    result = list(cases.iter_cases(str(path)))
+    assert(result[0] == cases.Case(2, ["value", 3], "value-3"))
+    assert(result[1] == cases.Case(4, ["multi\nline", [1, 2]], {"key": 1}))
+    assert(result[2].line_number == 5 and result[2].error is not None)
+
+def test_iter_cases_csv_args(tmp_path):
+    path = tmp_path / "cases.csv"
+    path.write_text('args,expected\n'
+                    '"[""a"", 2]",123\n'
+                    'a,b\n')
+    result = list(cases.iter_cases(str(path)))
+    # Expected values other than JSON objects are compared as strings
+    assert(result[0] == cases.Case(2, ["a", 2], "123"))
+    assert(result[1].error is not None)
+
+def test_iter_cases_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        list(cases.iter_cases(str(tmp_path / "cases.txt")))
+    path = tmp_path / "cases.csv"
+    path.write_text("a,b\n1,2\n")
+    with pytest.raises(ValueError):
+        list(cases.iter_cases(str(path)))
+
+def test_iter_batches(tmp_path):
+    path = tmp_path / "cases.jsonl"
+    path.write_text('{"args": [], "expected": "x"}\n' * 25)
+    batches = list(cases.iter_batches(str(path), 10))
+    assert([len(batch) for batch in batches] == [10, 10, 5])
+    assert(batches[2][-1].line_number == 25)
@@ -1,3 +1,4 @@
+import argparse
 import pytest
 from j2test import cli
 import os
@@ -18,4 +19,75 @@ def test_run_invalid():
     num_failed = 0
     num_files, num_failed = cli._run(path, num_files, num_failed)
     assert(num_files == 0)
-    assert(num_failed == 1)
\ No newline at end of file
+    assert(num_failed == 1)
+
+def test_discover():
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    test_files = cli._discover(curr_path)
+    names = sorted(os.path.basename(path) for path in test_files)
+    assert(names == ["jtest_template.py"])
+
+def test_run_in_process(failing_file):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(curr_path, "jtests", "templates", "jtest_template.py"), failing_file]
+    num_files, num_failed = cli._run_in_process(paths)
+    assert(num_files == 2)
+    assert(num_failed == 1)
+
+def test_compile(tmp_path):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    target = str(tmp_path / "templates.zip")
+    cli._compile([curr_path, "-o", target])
+    assert(os.path.isfile(target))
+
+def test_run_in_process_on_result(failing_file):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(curr_path, "jtests", "templates", "jtest_template.py"), failing_file]
+    outcomes = {}
+    cli._run_in_process(paths, on_result=lambda path, failed, duration: outcomes.update({os.path.basename(path): failed}))
+    assert(outcomes == {"jtest_template.py": False, "jtest_context.py": True})
+
+def test_affected(tmp_path, monkeypatch, failing_file):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.chdir(tmp_path)
+    paths = [os.path.join(curr_path, "jtests", "templates", "jtest_template.py"), failing_file]
+    changed = [os.path.join(os.path.dirname(failing_file), "context.j2"), "README.md"]
+    affected, graph = cli._affected(paths, changed)
+    assert(affected == [paths[1]])
+    assert(os.path.isfile(os.path.join(".j2test_cache", "deps.json")))
+
+def test_run_files_named_file_not_cached(tmp_path, monkeypatch):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.chdir(tmp_path)
+    path = os.path.join(curr_path, "jtests", "templates", "jtest_template.py")
+    args = argparse.Namespace(file=path, cache=True, ignore=None, daemon=False, runner=cli.RUNNER_IN_PROCESS,
+                              shard=None, durations=None)
+    for _ in range(2):
+        assert(cli._run_files([path], args, None) == (1, 0))
+    assert(not os.path.exists(os.path.join(".j2test_cache", "results")))
+
+def test_run_files_durations(tmp_path, monkeypatch):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.chdir(tmp_path)
+    path = os.path.join(curr_path, "jtests", "templates", "jtest_template.py")
+    args = argparse.Namespace(file=path, cache=False, ignore=None, daemon=False, runner=cli.RUNNER_IN_PROCESS,
+                              shard=None, durations=None)
+    cli._run_files([path], args, None)
+    assert(not os.path.exists(os.path.join(".j2test_cache", "durations.json")))
+
+    args.durations = "durations.json"
+    cli._run_files([path], args, None)
+    assert(os.path.isfile("durations.json"))
+
+def test_run_files_cached_not_counted(tmp_path, monkeypatch, capsys):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.chdir(tmp_path)
+    path = os.path.join(curr_path, "jtests", "templates", "jtest_template.py")
+    args = argparse.Namespace(file="all", cache=True, ignore=None, daemon=False, runner=cli.RUNNER_IN_PROCESS,
+                              shard=None, durations=None)
+    assert(cli._run_files([path], args, None) == (1, 0))
+    assert(cli._run_files([path], args, None) == (0, 0))
+    assert("1 cached test file(s) skipped" in capsys.readouterr().out)
+
+    args.cache = False
+    assert(cli._run_files([path], args, None) == (1, 0))
@@ -0,0 +1,43 @@
+import pytest
+from j2test import compare
+
+
+def test_json_equal_dict():
+    assert(compare.json_equal({"a": 1, "b": {"c": [1, 2]}}, {"b": {"c": [1, 2]}, "a": 1}) == True)
+    assert(compare.json_equal({"a": 1}, {"a": 1, "b": 2}) == False)
+    assert(compare.json_equal({"a": 1}, {"b": 1}) == False)
+
+def test_json_equal_unordered_list():
+    output = [{"name": "b"}, 1, "x", None, {"name": "a"}]
+    expected = [None, {"name": "a"}, "x", {"name": "b"}, 1]
+    # Mixed types can not be sorted, the canonical multiset comparison does not need to
+    assert(compare.json_equal(output, expected) == True)
+    assert(compare.json_equal(output, expected, ignore_order=False) == False)
+    assert(compare.json_equal(output, output, ignore_order=False) == True)
+
+def test_json_equal_repetitions():
+    assert(compare.json_equal([1, 1, 2], [1, 2, 2]) == False)
+    assert(compare.json_equal([1, 2, 1], [1, 1, 2]) == True)
+
+def test_json_equal_nested_unordered():
+    assert(compare.json_equal({"a": [[1, 2], [3]]}, {"a": [[3], [2, 1]]}) == True)
+    assert(compare.json_equal({"a": [[1, 2], [3]]}, {"a": [[3], [2, 1]]}, ignore_order=False) == False)
+
+def test_json_equal_types():
+    assert(compare.json_equal([True], [1]) == False)
+    assert(compare.json_equal({"a": 1}, {"a": 1.0}) == True)
+    assert(compare.json_equal({"a": "1"}, {"a": 1}) == False)
+    assert(compare.json_equal({"a": None}, {"a": False}) == False)
+    assert(compare.json_equal([{"a": True}], [{"a": 1}]) == False)
+
+def test_canonical():
+    assert(compare.canonical({"a": [1, {"b": 2}]}) == compare.canonical({"a": [{"b": 2}, 1]}))
+    assert(compare.canonical([1, 2], ignore_order=False) != compare.canonical([2, 1], ignore_order=False))
+    assert(compare.canonical(True) != compare.canonical(1))
+
+def test_json_equal_large_list():
+    output = [{"id": i, "tags": [str(i), i]} for i in range(10000)]
+    expected = list(reversed(output))
+    assert(compare.json_equal(output, expected) == True)
+    expected[0] = {"id": -1, "tags": []}
+    assert(compare.json_equal(output, expected) == False)
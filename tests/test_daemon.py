@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import threading
+import pytest
+from j2test import cli
+from j2test import daemon
+from j2test import runner
+
+CURR_PATH = os.path.dirname(os.path.abspath(__file__))
+PASSING_FILE = os.path.join(CURR_PATH, "jtests", "templates", "jtest_template.py")
+
+pytestmark = pytest.mark.skipif(not hasattr(daemon.socket, "AF_UNIX"), reason="requires Unix domain sockets")
+
+
+@pytest.fixture
+def socket_path():
+    # Unix domain socket paths are limited to about 100 characters, so not under the pytest tmp_path
+    directory = tempfile.mkdtemp(prefix="j2t")
+    path = os.path.join(directory, "d.sock")
+    server = daemon.Daemon(path, log_function=lambda message: None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if daemon.is_running(path):
+            break
+        thread.join(0.01)
+    yield path
+    daemon.stop(path)
+    thread.join(5)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_run_remote(socket_path, failing_file):
+    streamed = []
+    results = daemon.run_remote([PASSING_FILE, failing_file], socket_path, env={}, on_result=streamed.append)
+    assert(results == streamed)
+    passing, failing = [runner.FileResult.from_dict(result) for result in results]
+    assert(passing.failed == False)
+    assert(passing.num_passed == 2)
+    assert(failing.failed == True)
+    assert(failing.failed_tests == ["ContextTest.test_request_level_wrong"])
+    assert("test_request_level_wrong" in failing.output)
+
+    # The second run is served by the same warm process
+    results = daemon.run_remote([failing_file], socket_path, env={})
+    assert(results[0]["failed_tests"] == ["ContextTest.test_request_level_wrong"])
+
+def test_run_remote_env(socket_path, failing_file):
+    results = daemon.run_remote([failing_file], socket_path, env={"J2TEST_SELECT": "test_request_level"})
+    assert(results[0]["exit_code"] == 0)
+    assert(results[0]["num_tests"] == 1)
+    assert("J2TEST_SELECT" not in os.environ)
+
+def test_reload_changed_module(socket_path, tmp_path):
+    helper = tmp_path / "j2test_daemon_helper.py"
+    test_file = tmp_path / "jtest_helper.py"
+    helper.write_text("VALUE = 1\n")
+    test_file.write_text(
+        "import sys\n"
+        "sys.path.insert(0, {!r})\n"
+        "import j2test_daemon_helper\n"
+        "sys.exit(0 if j2test_daemon_helper.VALUE == 2 else 1)\n".format(str(tmp_path)))
+
+    assert(daemon.run_remote([str(test_file)], socket_path, env={})[0]["exit_code"] == 1)
+    helper.write_text("VALUE = 2\n")
+    os.utime(str(helper), ns=(0, 10 ** 9))
+    assert(daemon.run_remote([str(test_file)], socket_path, env={})[0]["exit_code"] == 0)
+
+def test_stop(socket_path):
+    assert(daemon.is_running(socket_path) == True)
+    assert(daemon.stop(socket_path) == True)
+    assert(daemon.is_running(socket_path) == False)
+    assert(daemon.stop(socket_path) == False)
+
+def test_no_daemon():
+    with pytest.raises(OSError):
+        daemon.run_remote([PASSING_FILE], os.path.join(tempfile.gettempdir(), "j2t-missing.sock"))
+
+def test_cli_run_daemon(socket_path, capsys, failing_file):
+    num_files, num_failed = cli._run_daemon([PASSING_FILE, failing_file], socket_path)
+    assert(num_files == 2)
+    assert(num_failed == 1)
+    assert("test_request_level_wrong" in capsys.readouterr().out)
@@ -0,0 +1,126 @@
+import os
+import pytest
+from j2test import deps
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = {
+        "lib/common.j2": "{% macro shared() %}shared{% endmacro %}",
+        "lib/unused.j2": "{% macro unused() %}unused{% endmacro %}",
+        "lib/base.j2": "{% import 'lib/common.j2' as common %}{% block body %}{% endblock %}",
+        "app/first.j2": "{% extends 'lib/base.j2' %}{% macro first() %}{% do [].append(1) %}{% endmacro %}",
+        "app/second.j2": "{% include 'lib/unused.j2' %}{% macro second() %}second{% endmacro %}",
+        "app/dynamic.j2": "{% include name %}",
+        "jtests/app/jtest_first.py": "class FirstTest:\n    def test(self):\n        self.loadJsonFile('expected/first.json')\n",
+        "jtests/app/jtest_second.py": "class SecondTest:\n    pass\n",
+        "jtests/app/jtest_dynamic.py": "class DynamicTest:\n    pass\n",
+        "jtests/app/expected/first.json": "{}",
+        "jtests/app/expected/other.json": "{}",
+        "local/jtest_local.py": "class LocalTest:\n    TEMPLATE_PATH = 'templates/local.j2'\n",
+        "local/templates/local.j2": "{% from 'templates/common.j2' import shared %}",
+        "local/templates/common.j2": "",
+    }
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path
+
+
+def _names(root, paths):
+    return sorted(os.path.relpath(path, str(root)) for path in paths)
+
+
+def test_dependencies(tree):
+    graph = deps.DependencyGraph([str(tree / "jtests/app/jtest_first.py"), str(tree / "local/jtest_local.py")])
+    assert(_names(tree, graph.dependencies(str(tree / "jtests/app/jtest_first.py"))) == [
+        "app/first.j2", "jtests/app/expected/first.json", "jtests/app/jtest_first.py", "lib/base.j2", "lib/common.j2"])
+    assert(_names(tree, graph.dependencies(str(tree / "local/jtest_local.py"))) == [
+        "local/jtest_local.py", "local/templates/common.j2", "local/templates/local.j2"])
+    assert(graph.roots == {str(tree), str(tree / "local")})
+
+def test_affected(tree):
+    tests = [str(path) for path in sorted(tree.rglob("jtest_*.py"))]
+    graph = deps.DependencyGraph(tests)
+    assert(_names(tree, graph.affected([str(tree / "lib/common.j2")])) == [
+        "jtests/app/jtest_dynamic.py", "jtests/app/jtest_first.py"])
+    assert(_names(tree, graph.affected([str(tree / "lib/unused.j2")])) == [
+        "jtests/app/jtest_dynamic.py", "jtests/app/jtest_second.py"])
+    assert(_names(tree, graph.affected([str(tree / "local/templates/common.j2")])) == ["local/jtest_local.py"])
+    assert(_names(tree, graph.affected([str(tree / "jtests/app/expected/first.json")])) == ["jtests/app/jtest_first.py"])
+    assert(_names(tree, graph.affected([str(tree / "jtests/app/expected/other.json")])) == [
+        "jtests/app/jtest_dynamic.py", "jtests/app/jtest_first.py", "jtests/app/jtest_second.py"])
+    assert(graph.affected([str(tree / "README.md")]) == [])
+
+def test_affected_updates_references(tree):
+    graph = deps.DependencyGraph([str(tree / "jtests/app/jtest_second.py")])
+    assert(graph.affected([str(tree / "lib/common.j2")]) == [])
+
+    (tree / "app/second.j2").write_text("{% import 'lib/common.j2' as common %}")
+    assert(_names(tree, graph.affected([str(tree / "app/second.j2")])) == ["jtests/app/jtest_second.py"])
+    assert(_names(tree, graph.affected([str(tree / "lib/common.j2")])) == ["jtests/app/jtest_second.py"])
+    assert(graph.affected([str(tree / "lib/unused.j2")]) == [])
+
+def test_affected_new_and_removed_tests(tree):
+    graph = deps.DependencyGraph([])
+    new_test = tree / "jtests/app/jtest_first.py"
+    assert(_names(tree, graph.affected([str(new_test)])) == ["jtests/app/jtest_first.py"])
+    assert(_names(tree, graph.affected([str(tree / "lib/common.j2")])) == ["jtests/app/jtest_first.py"])
+
+    new_test.unlink()
+    assert(graph.affected([str(new_test)]) == [])
+    assert(graph.test_files == [])
+
+def test_save_and_load(tree):
+    tests = [str(path) for path in sorted(tree.rglob("jtest_*.py"))]
+    index = str(tree / ".j2test_cache" / "deps.json")
+    graph = deps.DependencyGraph(tests)
+    deps.save_graph(graph, index)
+    assert(graph.modified == False)
+
+    loaded = deps.load_graph(tests, index)
+    assert(loaded.modified == False)
+    assert(loaded.test_files == graph.test_files)
+    for test in tests:
+        assert(loaded.dependencies(test) == graph.dependencies(test))
+
+def test_save_unwritable(tree):
+    tests = [str(path) for path in sorted(tree.rglob("jtest_*.py"))]
+    graph = deps.DependencyGraph(tests)
+    # The index directory would be created under a file
+    deps.save_graph(graph, os.path.join(tests[0], "deps.json"))
+    assert(graph.modified == True)
+
+def test_load_refreshes_changed_files(tree):
+    first = str(tree / "jtests/app/jtest_first.py")
+    second = str(tree / "jtests/app/jtest_second.py")
+    index = str(tree / "deps.json")
+    deps.save_graph(deps.DependencyGraph([first, second]), index)
+
+    (tree / "app/second.j2").write_text("{% import 'lib/common.j2' as common %}")
+    os.remove(first)
+    graph = deps.load_graph([second], index)
+    assert(graph.modified == True)
+    assert(graph.test_files == [second])
+    assert(_names(tree, graph.affected([str(tree / "lib/common.j2")])) == ["jtests/app/jtest_second.py"])
+
+def test_load_invalid_index(tree):
+    index = tree / "deps.json"
+    index.write_text("{invalid")
+    graph = deps.load_graph([str(tree / "jtests/app/jtest_second.py")], str(index))
+    assert(_names(tree, graph.test_files) == ["jtests/app/jtest_second.py"])
+
+def test_snapshot_dependency(tree):
+    path = tree / "jtests/app/jtest_snapshot.py"
+    path.write_text("class SnapshotTest:\n    def test(self):\n        self.assertMatchesSnapshot('second', [], 'key')\n")
+    graph = deps.DependencyGraph([str(path), str(tree / "jtests/app/jtest_second.py")])
+    assert("jtests/app/__snapshots__/jtest_snapshot.snap" in _names(tree, graph.dependencies(str(path))))
+    snapshot_file = tree / "jtests/app/__snapshots__/jtest_snapshot.snap"
+    assert(graph.affected([str(snapshot_file)]) == [str(path)])
+
+def test_digest_dependency(tree):
+    path = tree / "jtests/app/jtest_digest.py"
+    path.write_text("class DigestTest:\n    def test(self):\n        self.assertOutputDigest('second', [], 'key')\n")
+    graph = deps.DependencyGraph([str(path)])
+    assert("jtests/app/__snapshots__/jtest_digest.snap" in _names(tree, graph.dependencies(str(path))))
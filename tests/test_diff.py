@@ -0,0 +1,88 @@
+import pytest
+from j2test import diff
+
+
+def test_json_diff_equal():
+    assert(diff.json_diff({"a": [1, {"b": 2}]}, {"a": [{"b": 2}, 1]}) == ([], False))
+
+def test_json_diff_dict():
+    diffs, truncated = diff.json_diff({"key1": "value1", "new": 1}, {"key1": "different", "gone": 2})
+    assert(truncated == False)
+    assert(diffs == [
+        diff.Difference(diff.CHANGED, "/key1", expected="different", output="value1"),
+        diff.Difference(diff.REMOVED, "/gone", expected=2),
+        diff.Difference(diff.ADDED, "/new", output=1),
+    ])
+
+def test_json_diff_pointer_escaping():
+    diffs, _ = diff.json_diff({"a/b": {"c~d": 1}}, {"a/b": {"c~d": 2}})
+    assert([d.path for d in diffs] == ["/a~1b/c~0d"])
+
+def test_json_diff_unordered_list():
+    output = {"items": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, 3]}
+    expected = {"items": [3, {"id": 2, "name": "x"}, {"id": 1, "name": "a"}]}
+    diffs, _ = diff.json_diff(output, expected)
+    assert(diffs == [diff.Difference(diff.CHANGED, "/items/1/name", expected="x", output="b")])
+
+def test_json_diff_unordered_list_lengths():
+    diffs, _ = diff.json_diff([1, 2, 3, 3], [3, 1, 4])
+    assert(diffs == [
+        diff.Difference(diff.REMOVED, "/2", expected=4),
+        diff.Difference(diff.ADDED, "/1", output=2),
+        diff.Difference(diff.ADDED, "/3", output=3),
+    ])
+
+def test_json_diff_ordered_list():
+    diffs, _ = diff.json_diff([1, 2, 3], [2, 1], ignore_order=False)
+    assert([(d.kind, d.path) for d in diffs] == [(diff.CHANGED, "/0"), (diff.CHANGED, "/1"), (diff.ADDED, "/2")])
+
+def test_json_diff_type_change():
+    diffs, _ = diff.json_diff({"a": True}, {"a": 1})
+    assert(diffs == [diff.Difference(diff.CHANGED, "/a", expected=1, output=True)])
+
+def test_json_diff_max_diffs():
+    output = {"key{}".format(i): i for i in range(1000)}
+    expected = {"key{}".format(i): -i - 1 for i in range(1000)}
+    diffs, truncated = diff.json_diff(output, expected, max_diffs=10)
+    assert(len(diffs) == 10)
+    assert(truncated == True)
+
+@pytest.mark.parametrize("ignore_order", [True, False])
+def test_json_diff_exactly_max_diffs(ignore_order):
+    output = {"a": [{"x": 1}, {"x": 2}], "b": {"c": 1, "d": [1, 2]}, "e": 1, "f": "same"}
+    expected = {"a": [{"x": 1}, {"x": 3}], "b": {"c": 2, "d": [1, 2]}, "e": 2, "f": "same"}
+    diffs, truncated = diff.json_diff(output, expected, ignore_order, max_diffs=3)
+    assert(len(diffs) == 3)
+    assert(truncated == False)
+
+    expected["b"]["d"] = [1, 3]
+    diffs, truncated = diff.json_diff(output, expected, ignore_order, max_diffs=3)
+    assert(len(diffs) == 3)
+    assert(truncated == True)
+
+def test_preview():
+    assert(diff.preview({"b": 1, "a": [1, 2]}) == '{"a": [1, 2], "b": 1}')
+    preview = diff.preview(list(range(1000000)), 20)
+    assert(preview == "[0, 1, 2, 3, 4, 5, 6...")
+
+def test_first_divergence():
+    assert(diff.first_divergence("abc", "abc") == -1)
+    assert(diff.first_divergence("abc", "abd") == 2)
+    assert(diff.first_divergence("ab", "abc") == 2)
+    long = "x" * 200000
+    assert(diff.first_divergence(long + "a", long + "b", chunk_size=1000) == 200000)
+
+def test_line_diff():
+    expected = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"]
+    output = ["a", "B", "c", "d", "e", "f", "g", "h", "i", "j", "k"]
+    assert(diff.line_diff(expected, output, context=1) == [
+        "@@ -1,3 +1,3 @@", " a", "-b", "+B", " c",
+        "@@ -10,1 +10,2 @@", " j", "+k",
+    ])
+    assert(diff.line_diff(expected, expected) == [])
+
+def test_line_diff_max_edits():
+    expected = [str(i) for i in range(100)]
+    output = [str(i) for i in range(100, 200)]
+    assert(diff.line_diff(expected, output, max_edits=50) == None)
+    assert(diff.line_diff(expected, output, max_edits=200) != None)
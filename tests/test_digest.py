@@ -0,0 +1,146 @@
+import os
+import random
+import json
+import pytest
+from j2test import cli, compare, digest, snapshot, stream_compare
+
+TEST_FILE = """import j2test
+
+class DigestTest(j2test.TestTemplate):
+    DIGEST_SAMPLES = 3
+    DIGEST_SAMPLE_LENGTH = 10
+
+    def test_digest(self):
+        self.assertOutputDigest("record", ["value1", "value2"], "record")
+        self.assertOutputDigest("greet", ["name"], "greet")
+
+if __name__ == '__main__':
+    DigestTest().run()
+"""
+TEMPLATE = """{% macro record(v1, v2) %}{"key1": "{{ v1 }}", "key2": [1, 2, "{{ v2 }}"]}{% endmacro %}
+{% macro greet(name) %}  {{ greeting }} {{ name }}{% endmacro %}"""
+
+
+def _json_digest(output, ignore_order=True, chunk_size=3):
+    return digest.json_digest(stream_compare.iter_chunks(output, chunk_size), ignore_order)
+
+
+@pytest.mark.parametrize("output,other", [
+    ('{"a": [1, 2, {"b": "x"}], "c": null}', '{\n  "c": null, "a": [{"b": "\\u0078"}, 2.0, 1]\n}'),
+    ('{"n": 1000, "f": 0.5}', '{"f": 5e-1, "n": 1e3}'),
+    ('[[1, 2], [3]]', '[[3], [2, 1]]'),
+    ('  []  ', '[]'),
+])
+def test_json_digest_same(output, other):
+    for chunk_size in (1, 2, 7, 100):
+        assert(_json_digest(output, chunk_size=chunk_size) == _json_digest(other))
+
+@pytest.mark.parametrize("output,other", [
+    ('{"a": 1}', '{"a": true}'),
+    ('{"a": null}', '{"a": 0}'),
+    ('{"a": "1"}', '{"a": 1}'),
+    ('[1, 1, 2]', '[1, 2, 2]'),
+    ('{"a": 1, "b": 2}', '{"a": 2, "b": 1}'),
+    ('{"a": {}}', '{"a": []}'),
+    ('[[1], [2]]', '[[1, 2]]'),
+])
+def test_json_digest_different(output, other):
+    assert(_json_digest(output) != _json_digest(other))
+
+def test_json_digest_order():
+    assert(_json_digest('[1, 2]', ignore_order=False) != _json_digest('[2, 1]', ignore_order=False))
+    assert(_json_digest('{"a": [1, 2]}', ignore_order=False) == _json_digest('{"a": [1.0, 2]}', ignore_order=False))
+
+def test_json_digest_matches_json_equal():
+    rng = random.Random(7)
+    scalars = [True, False, None, 0, 1, 1.0, 2.5, "a", "é", "1", 10 ** 20, 1e20]
+
+    def generate(depth=0):
+        choice = rng.random()
+        if depth > 3 or choice < 0.4:
+            return rng.choice(scalars)
+        if choice < 0.7:
+            return [generate(depth + 1) for _ in range(rng.randint(0, 4))]
+        return {rng.choice("abcd"): generate(depth + 1) for _ in range(rng.randint(0, 4))}
+
+    values = [generate() for _ in range(500)]
+    for ignore_order in (True, False):
+        for value in values:
+            other = rng.choice(values)
+            if rng.random() < 0.3:
+                other = json.loads(json.dumps(value))
+                if isinstance(other, list):
+                    rng.shuffle(other)
+            same = _json_digest(json.dumps(value), ignore_order) == \
+                _json_digest(json.dumps(other, ensure_ascii=False, indent=1), ignore_order)
+            assert(same == compare.json_equal(value, other, ignore_order))
+
+@pytest.mark.parametrize("output", ['', '{', '[1, 2', '1 2', '{1: 2}', '[1]]', '{"a": nope}'])
+def test_json_digest_invalid(output):
+    with pytest.raises(ValueError):
+        _json_digest(output)
+
+def test_text_digest():
+    assert(digest.text_digest("  Hello\n name \n") == digest.text_digest("Hello\n name", chunk_size=2))
+    assert(digest.text_digest("Hello name") != digest.text_digest("Hello  name"))
+    assert(digest.text_digest(" \n") == digest.text_digest(""))
+
+def test_samples():
+    assert(digest.samples("abcdefghij", 3, 4) == [[0, "abcd"], [3, "defg"], [6, "ghij"]])
+    assert(digest.samples("abc", 3, 4) == [[0, "abc"]])
+    assert(digest.samples("abc", 0, 4) == [])
+
+def test_starts_json():
+    assert(digest.starts_json(' \n{"a": 1}'))
+    assert(digest.starts_json('[1]'))
+    assert(not digest.starts_json('Hello'))
+    assert(not digest.starts_json(''))
+
+def test_update_and_check_digests(tmp_path, monkeypatch, capsys):
+    test_dir = tmp_path / "digest_tests"
+    test_dir.mkdir()
+    (test_dir / "jtest_digests.py").write_text(TEST_FILE)
+    template = test_dir / "digests.j2"
+    template.write_text("{% set greeting = 'Hello' %}" + TEMPLATE)
+    paths = [str(test_dir / "jtest_digests.py")]
+
+    # Not recorded yet
+    assert(cli._run_in_process(paths) == (1, 1))
+
+    monkeypatch.setenv("J2TEST_UPDATE_SNAPSHOTS", "1")
+    assert(cli._run_in_process(paths) == (1, 0))
+    store = snapshot.SnapshotStore(snapshot.snapshot_path(paths[0]))
+    record = store.get("record")
+    assert(record.is_digest and record.value["json"])
+    assert(record.value["sha256"] == _json_digest('{"key2": ["value2", 2, 1], "key1": "value1"}'))
+    greet = store.get("greet")
+    assert(not greet.value["json"] and greet.value["sha256"] == digest.text_digest("Hello name"))
+    assert(greet.value["samples"] == [[0, "  Hello na"], [1, " Hello nam"], [2, "Hello name"]])
+    store.close()
+
+    monkeypatch.delenv("J2TEST_UPDATE_SNAPSHOTS")
+    assert(cli._run_in_process(paths) == (1, 0))
+
+    capsys.readouterr()
+    template.write_text("{% set greeting = 'Bye' %}" + TEMPLATE)
+    os.utime(str(template), (0, 0))
+    assert(cli._run_in_process(paths) == (1, 1))
+    out = capsys.readouterr().out
+    assert("assertOutputDigest failed for digest \"greet\"" in out)
+    assert("The output has 10 characters, 12 were recorded." in out)
+    assert("Recorded: \"  Hello na\"" in out and "But got:  \"  Bye name\"" in out)
+
+def test_digest_not_read_as_snapshot(tmp_path, monkeypatch, capsys):
+    test_dir = tmp_path / "digest_tests"
+    test_dir.mkdir()
+    (test_dir / "jtest_digests.py").write_text(TEST_FILE)
+    (test_dir / "digests.j2").write_text("{% set greeting = 'Hello' %}" + TEMPLATE)
+    paths = [str(test_dir / "jtest_digests.py")]
+    monkeypatch.setenv("J2TEST_UPDATE_SNAPSHOTS", "1")
+    assert(cli._run_in_process(paths) == (1, 0))
+    monkeypatch.delenv("J2TEST_UPDATE_SNAPSHOTS")
+
+    (test_dir / "jtest_digests.py").write_text(TEST_FILE.replace("assertOutputDigest", "assertMatchesSnapshot"))
+    capsys.readouterr()
+    assert(cli._run_in_process(paths) == (1, 1))
+    assert("Snapshot \"record\" is not recorded" in capsys.readouterr().out)
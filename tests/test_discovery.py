@@ -0,0 +1,106 @@
+import os
+import pytest
+from j2test import discovery
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = [
+        "jtest_root.py",
+        "helper.py",
+        "app/jtest_app.py",
+        "app/deep/er/jtest_deep.py",
+        "app/generated/jtest_generated.py",
+        "app/generated/keep/jtest_keep.py",
+        ".git/jtest_git.py",
+        "node_modules/pkg/jtest_node.py",
+        "build/jtest_build.py",
+        "env/pyvenv.cfg",
+        "env/lib/jtest_venv.py",
+        "vendor/jtest_vendor.py",
+    ]
+    for name in files:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    (tmp_path / "app" / ".gitignore").write_text("# generated code\ngenerated/*\n!generated/keep/\n")
+    return tmp_path
+
+
+def _names(root, paths):
+    return sorted(os.path.relpath(path, str(root)) for path in paths)
+
+
+@pytest.mark.parametrize("pattern,path,is_dir,expected", [
+    ("build/", "build", True, True),
+    ("build/", "build", False, None),
+    ("*.egg-info/", "pkg.egg-info", True, True),
+    ("vendor", "src/vendor", True, True),
+    ("/vendor", "src/vendor", True, None),
+    ("src/vendor", "src/vendor", True, True),
+    ("docs/**/jtest_*.py", "docs/a/b/jtest_x.py", False, True),
+    ("docs/**/jtest_*.py", "docs/jtest_x.py", False, True),
+    ("jtest_[ab].py", "jtest_a.py", False, True),
+    ("jtest_[!ab].py", "jtest_a.py", False, None),
+    ("jtest_?.py", "sub/jtest_c.py", False, True),
+    ("\\#literal", "#literal", False, True),
+])
+def test_ignore_rules(pattern, path, is_dir, expected):
+    assert(discovery.IgnoreRules([pattern]).match(path, is_dir) == expected)
+
+def test_ignore_rules_negation():
+    rules = discovery.IgnoreRules(["jtest_*.py", "!jtest_keep.py", "", "# comment"])
+    assert(rules.match("jtest_other.py", False) == True)
+    assert(rules.match("jtest_keep.py", False) == False)
+    assert(rules.match("other.py", False) == None)
+
+def test_discover(tree):
+    assert(_names(tree, discovery.discover(str(tree))) == [
+        "app/deep/er/jtest_deep.py", "app/generated/keep/jtest_keep.py", "app/jtest_app.py", "jtest_root.py",
+        "vendor/jtest_vendor.py"])
+    assert("vendor/jtest_vendor.py" not in _names(tree, discovery.discover(str(tree), ["vendor/"])))
+
+def test_discover_relative_root(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    assert(sorted(discovery.discover("./"))[:2] == [os.path.join("app", "deep", "er", "jtest_deep.py"),
+                                                    os.path.join("app", "generated", "keep", "jtest_keep.py")])
+
+def test_index(tree, tmp_path_factory, monkeypatch):
+    # Outside of the tree, creating the index changes the modification time of the directory it is created in
+    index = str(tmp_path_factory.mktemp("index") / "discovery.json")
+    expected = _names(tree, discovery.discover(str(tree)))
+    assert(_names(tree, discovery.discover(str(tree), index_path=index)) == expected)
+    assert(os.path.isfile(index))
+
+    scanned = []
+    scan = discovery._scan
+    monkeypatch.setattr(discovery, "_scan", lambda abs_dir, *args: scanned.append(abs_dir) or scan(abs_dir, *args))
+    assert(_names(tree, discovery.discover(str(tree), index_path=index)) == expected)
+    assert(scanned == [])
+
+    # Only the directory that changed is listed again
+    (tree / "app" / "deep" / "jtest_new.py").write_text("")
+    assert(_names(tree, discovery.discover(str(tree), index_path=index)) == sorted(expected + ["app/deep/jtest_new.py"]))
+    assert(scanned == [str(tree / "app" / "deep")])
+
+def test_index_ignore_file_changed(tree, tmp_path_factory):
+    index = str(tmp_path_factory.mktemp("index") / "discovery.json")
+    discovery.discover(str(tree), index_path=index)
+
+    gitignore = tree / "app" / ".gitignore"
+    gitignore.write_text("deep/\n")
+    os.utime(str(gitignore), ns=(0, 10 ** 9))
+    assert(_names(tree, discovery.discover(str(tree), index_path=index)) == [
+        "app/generated/jtest_generated.py", "app/generated/keep/jtest_keep.py", "app/jtest_app.py",
+        "jtest_root.py", "vendor/jtest_vendor.py"])
+
+def test_index_other_ignore_patterns(tree, tmp_path_factory):
+    index = str(tmp_path_factory.mktemp("index") / "discovery.json")
+    discovery.discover(str(tree), index_path=index)
+    assert("vendor/jtest_vendor.py" not in _names(tree, discovery.discover(str(tree), ["vendor"], index)))
+
+def test_iter_files(tree):
+    assert(_names(tree, discovery.iter_files(str(tree))) == [
+        "app/.gitignore", "app/deep/er/jtest_deep.py", "app/generated/keep/jtest_keep.py", "app/jtest_app.py",
+        "helper.py", "jtest_root.py", "vendor/jtest_vendor.py"])
+    assert("vendor/jtest_vendor.py" not in _names(tree, discovery.iter_files(str(tree), ["vendor/"])))
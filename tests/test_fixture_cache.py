@@ -0,0 +1,72 @@
+import pytest
+import json
+import os
+from j2test.fixture_cache import FixtureCache, copy_json
+
+
+def _write(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+def test_load_cached(tmp_path):
+    path = str(tmp_path / "fixture.json")
+    _write(path, {"key": [1, 2]})
+    cache = FixtureCache(1024 * 1024)
+
+    assert(cache.load(path, _read) == {"key": [1, 2]})
+    assert(cache.load(os.path.join(str(tmp_path), ".", "fixture.json"), _read) == {"key": [1, 2]})
+    assert(cache.misses == 1)
+    assert(cache.hits == 1)
+
+def test_load_defensive_copy(tmp_path):
+    path = str(tmp_path / "fixture.json")
+    _write(path, {"key": [1, 2]})
+    cache = FixtureCache(1024 * 1024)
+
+    first = cache.load(path, _read)
+    first["key"].append(3)
+    assert(cache.load(path, _read) == {"key": [1, 2]})
+
+def test_load_invalidated(tmp_path):
+    path = str(tmp_path / "fixture.json")
+    _write(path, {"key": 1})
+    cache = FixtureCache(1024 * 1024)
+    cache.load(path, _read)
+
+    _write(path, {"key": 22})
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    assert(cache.load(path, _read) == {"key": 22})
+    assert(cache.misses == 2)
+
+def test_load_eviction(tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / "fixture{}.json".format(i))
+        _write(path, {"key": "x" * 100})
+        paths.append(path)
+    size = os.path.getsize(paths[0])
+    cache = FixtureCache(size * 2)
+
+    for path in paths:
+        cache.load(path, _read)
+    assert(len(cache) == 2)
+    assert(cache.size <= size * 2)
+    cache.load(paths[0], _read)
+    assert(cache.misses == 4)
+
+def test_load_error(tmp_path):
+    cache = FixtureCache(1024)
+    with pytest.raises(OSError):
+        cache.load(str(tmp_path / "missing.json"), _read)
+
+def test_copy_json():
+    value = {"a": [1, {"b": None}], "c": (1, 2)}
+    copied = copy_json(value)
+    assert(copied == value)
+    assert(copied["a"] is not value["a"])
+    assert(copied["a"][1] is not value["a"][1])
@@ -95,3 +95,94 @@ def test_load_yaml_invalid(sample_test_template: j2test.TestTemplate):
     loaded_yaml = sample_test_template.loadYamlFile("./variables/invalid.yaml")
     assert(loaded_yaml == None)
     assert(sample_test_template._curr_failed == True)
+
+def test_assert_equal_str_multiline_diff(sample_test_template: j2test.TestTemplate, capsys):
+    macro = "macro_str"
+    arr = ["line1\nline2\nline3"]
+
+    result = sample_test_template.assertEqualString(macro, arr, "line1\nLINE2\nline3")
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert("-LINE2\n+line2" in out)
+
+def test_assert_equal_str_not_str_expected(sample_test_template: j2test.TestTemplate, capsys):
+    result = sample_test_template.assertEqualString("macro_str", ["12"], 12)
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert("assertEqualString failed.\n\tExpected: 12\n\tBut got:  12" in out)
+
+def test_load_json_cached_copy(sample_test_template: j2test.TestTemplate):
+    loaded_json = sample_test_template.loadJsonFile("./expected/expected.json")
+    loaded_json["key1"] = "changed"
+    assert(sample_test_template.loadJsonFile("./expected/expected.json")["key1"] == "value1")
+
+def test_assert_cases_from_file(sample_test_template: j2test.TestTemplate, tmp_path, capsys):
+    passing = tmp_path / "cases.jsonl"
+    passing.write_text("".join('{{"args": ["v{0}", "w{0}"], "expected": {{"key1": "v{0}", "key2": "w{0}"}}}}\n'.format(i)
+                               for i in range(50)))
+    result = sample_test_template.assertCasesFromFile("template_macro", str(passing))
+    assert(result == True)
+
+    sample_test_template._curr_failed = False
+    result = sample_test_template.assertCasesFromFile("template_macro", "./cases/template_cases.jsonl")
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert("cases/template_cases.jsonl:4 failed" in out)
+    assert("cases/template_cases.jsonl:6 is invalid" in out)
+    assert("cases/template_cases.jsonl:7 is invalid" in out)
+    assert("cases/template_cases.jsonl:8 failed" in out)
+    assert("3 of 7 case(s) from ./cases/template_cases.jsonl passed, 4 failed" in out)
+    sample_test_template._curr_failed = False
+
+def test_assert_cases_from_csv(sample_test_template: j2test.TestTemplate, capsys):
+    result = sample_test_template.assertCasesFromFile("macro_str", "./cases/str_cases.csv")
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert("cases/str_cases.csv:5 failed with args ['other']" in out)
+    assert("3 of 4 case(s)" in out)
+    sample_test_template._curr_failed = False
+
+def test_assert_cases_reported_failures(sample_test_template: j2test.TestTemplate, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(sample_test_template, "MAX_REPORTED_CASES", 2)
+    failing = tmp_path / "cases.jsonl"
+    failing.write_text('{"args": ["TEST"], "expected": "OTHER"}\n' * 5)
+    result = sample_test_template.assertCasesFromFile("macro_str", str(failing))
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert(out.count("failed with args") == 2)
+    assert("3 more failed case(s) not shown" in out)
+    assert("0 of 5 case(s)" in out)
+    sample_test_template._curr_failed = False
+
+def test_assert_cases_missing_file(sample_test_template: j2test.TestTemplate, capsys):
+    assert(sample_test_template.assertCasesFromFile("macro_str", "./cases/missing.jsonl") == False)
+    assert("failed to read ./cases/missing.jsonl" in capsys.readouterr().out)
+    sample_test_template._curr_failed = False
+    assert(sample_test_template.assertCasesFromFile("macro_str", "./cases/cases.txt") == False)
+    sample_test_template._curr_failed = False
+
+def test_assert_equal_json_file_streamed(sample_test_template: j2test.TestTemplate, capsys):
+    result = sample_test_template.assertEqualJsonFileStreamed("template_macro", ["value1", "value2"],
+                                                              "./expected/expected.json")
+    assert(result == True)
+
+    result = sample_test_template.assertEqualJsonFileStreamed("template_macro", ["value1", "other"],
+                                                              "./expected/expected.json")
+    assert(result == False)
+    out = capsys.readouterr().out
+    assert("failed at JSON pointer \"/key2\", line 3 column 13" in out)
+    sample_test_template._curr_failed = False
+
+    result = sample_test_template.assertEqualJsonFileStreamed("template_macro", ["value1", "value2"],
+                                                              "./expected/missing.json")
+    assert(result == False)
+    sample_test_template._curr_failed = False
+
+def test_assert_equal_string_file_streamed(sample_test_template: j2test.TestTemplate, capsys):
+    result = sample_test_template.assertEqualStringFileStreamed("macro_str", ["TEST"], "./expected/expected.txt")
+    assert(result == True)
+
+    result = sample_test_template.assertEqualStringFileStreamed("macro_str", ["TEXT"], "./expected/expected.txt")
+    assert(result == False)
+    assert("failed at line 1 column 3" in capsys.readouterr().out)
+    sample_test_template._curr_failed = False
@@ -0,0 +1,57 @@
+import json
+import pytest
+from j2test import json_backend
+from j2test.filters.simple_to_json import simple_to_json_filter
+
+DOCUMENT = {"b": [1, 2.5, None, True, "text ü"], "a": {"nested": [{"x": -1}]}, "big": 10 ** 30}
+
+BACKENDS = [name for name in ["json", "rapidjson", "orjson"] if json_backend.is_available(name)]
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+def test_loads(name):
+    backend = json_backend.get_backend(name)
+    text = json.dumps(DOCUMENT)
+    assert(backend.loads(text) == DOCUMENT)
+    assert(backend.loads(text.encode("utf-8")) == DOCUMENT)
+    # Documents the faster libraries reject are parsed like the standard library does
+    assert(str(backend.loads("[NaN]")[0]) == "nan")
+    assert(backend.loads(json.dumps(DOCUMENT).encode("utf-16")) == DOCUMENT)
+    with pytest.raises(json.JSONDecodeError):
+        backend.loads("{invalid")
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+def test_load_file(name, tmpdir):
+    path = tmpdir.join("file.json")
+    path.write_binary(json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8"))
+    assert(json_backend.get_backend(name).load_file(str(path)) == DOCUMENT)
+
+
+@pytest.mark.parametrize("name", [name for name in BACKENDS if name != "json"])
+def test_dumps_matches_rapidjson(name):
+    rapidjson = pytest.importorskip("rapidjson")
+    backend = json_backend.get_backend(name)
+    for indent in (None, 2):
+        for sort_keys in (False, True):
+            assert(backend.dumps(DOCUMENT, indent, sort_keys) ==
+                   rapidjson.dumps(DOCUMENT, indent=indent, sort_keys=sort_keys))
+
+
+def test_get_backend(monkeypatch):
+    assert(json_backend.get_backend("auto") is json_backend.get_backend("auto"))
+    assert(json_backend.get_backend("auto").name == next(
+        name for name in ["orjson", "rapidjson", "json"] if json_backend.is_available(name)))
+    monkeypatch.setenv(json_backend.BACKEND_ENV_VAR, "json")
+    assert(json_backend.get_backend().name == "json")
+    assert(simple_to_json_filter({"b": 1, "a": [1, 2]}) == '{"a":[1,2],"b":1}')
+    with pytest.raises(ValueError):
+        json_backend.get_backend("invalid")
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+def test_loads_big_integers(name):
+    backend = json_backend.get_backend(name)
+    text = "[-9999999999999999999, 18446744073709551616, 1234567890123456789012345678901234567890]"
+    assert(backend.loads(text) == json.loads(text))
+    assert(all(type(value) is int for value in backend.loads(text.encode("utf-8"))))
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from j2test import utils
+from j2test.filters.lazy import lazy_filter
+
+# Modules that must not be imported by "import j2test"
+HEAVY_MODULES = ["deepdiff", "yaml", "ruamel", "jsonmerge", "jsonpath", "jsonschema", "rapidjson", "orjson"]
+# Import time of j2test on top of jinja2, in seconds
+IMPORT_TIME_BUDGET = 0.25
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from j2test import TestTemplate
+duration = time.perf_counter() - start
+print(json.dumps({"duration": duration, "modules": sorted(set(name.split(".")[0] for name in sys.modules))}))
+"""
+
+
+def test_import_is_lazy():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(3):
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], cwd=root)
+        results.append(json.loads(output))
+
+    for module in HEAVY_MODULES:
+        assert(module not in results[0]["modules"])
+    assert(min(result["duration"] for result in results) < IMPORT_TIME_BUDGET)
+
+
+def test_lazy_filter():
+    proxy = lazy_filter("j2test.filters.jsonmerge", "jsonmerge_filter")
+    assert(proxy({"a": 1, "b": {"c": 1}}, {"b": {"d": 2}}) == {"a": 1, "b": {"c": 1, "d": 2}})
+    from j2test.filters.jsonmerge import jsonmerge_filter
+    assert(proxy.resolve() is jsonmerge_filter)
+
+
+def test_lazy_filters_in_template(tmpdir):
+    tmpdir.join("data.txt").write("content")
+    env = utils._get_env(str(tmpdir))
+    template = env.from_string(
+        "{{ readfromfile('data.txt') }}|{{ {'a': [1]} | toyaml }}|{{ ('b: 2' | fromyaml).b }}|"
+        "{{ {'a': 1} | jsonmerge({'c': 3}) | tojson }}|{{ {'a': {'b': 5}} | jsonpath('$.a.b') }}")
+    assert(template.render() == 'content|a:\n- 1|2|{"a":1,"c":3}|[5]')
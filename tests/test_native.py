@@ -0,0 +1,108 @@
+import os
+import re
+import jinja2
+from j2test import native
+from j2test import utils
+
+
+def get_env():
+    env = native.NativeJsonEnvironment()
+    env.filters["tojson"] = native.native_to_json_filter
+    env.filters["fromjson"] = native.native_from_json_filter
+    return env
+
+
+MACROS = """
+{% macro value(x) %}
+    {{ x | tojson }}
+{% endmacro %}
+{% macro nested(x) %}{{ value(x) }}{% endmacro %}
+{% macro embedded(x) %}{"value": {{ value(x) }}, "count": {{ 2 }}}{% endmacro %}
+{% macro set_block(x) %}{% set text %}{{ 1 }}-{{ value(x) }}{% endset %}{{ text }}{% endmacro %}
+{% macro parsed(x) %}{{ value(x) | fromjson | tojson }}{% endmacro %}
+{% macro text() %} plain {% endmacro %}
+"""
+
+
+def test_macro_returns_value():
+    module = get_env().from_string(MACROS).module
+    data = {"b": [1, 2], "a": None}
+    output = module.value(data)
+    assert(isinstance(output, native.NativeJson))
+    assert(output.value is data)
+    assert(str(output) == '{"a":null,"b":[1,2]}')
+    assert(native.unwrap(module.nested(data)) is data)
+    assert(native.unwrap(module.parsed(data)) is data)
+
+
+def test_macro_returns_string():
+    module = get_env().from_string(MACROS).module
+    data = {"b": [1, 2]}
+    assert(module.embedded(data) == '{"value": {"b":[1,2]}, "count": 2}')
+    assert(module.set_block(data) == '1-{"b":[1,2]}')
+    assert(module.text() == " plain ")
+
+
+
+STRING_EXPRESSIONS = """
+{% macro equals(x) %}{{ x | tojson == '{"a":1}' }}{% endmacro %}
+{% macro length(x) %}{{ x | tojson | length }}{% endmacro %}
+{% macro tilde(x) %}{{ x | tojson ~ "!" }}{% endmacro %}
+{% macro plus(x) %}{{ (x | tojson) + "!" }}|{{ "!" + x | tojson }}{% endmacro %}
+{% macro methods(x) %}{{ "a" in x | tojson }} {{ (x | tojson)[0] }} {{ (x | tojson).startswith("{") }}{% endmacro %}
+"""
+
+
+def test_value_behaves_as_string():
+    module = get_env().from_string(STRING_EXPRESSIONS).module
+    data = {"a": 1}
+    assert(module.equals(data) == "True")
+    assert(module.length(data) == "7")
+    assert(module.tilde(data) == '{"a":1}!')
+    assert(module.plus(data) == '{"a":1}!|!{"a":1}')
+    assert(module.methods(data) == "True { True")
+
+    value = native.NativeJson([1])
+    assert(value == "[1]" and "[1]" == value and value != "[2]")
+    assert(hash(value) == hash("[1]"))
+    assert(value + native.NativeJson([2]) == "[1][2]")
+
+
+def test_filters_and_globals_get_strings(tmpdir):
+    env = get_env()
+    env.filters["keys_only"] = lambda text: re.sub(r":[^,}]*", "", text)
+    env.globals["count"] = lambda pattern, text: len(re.findall(pattern, text))
+    module = env.from_string(
+        "{% macro filtered(x) %}{{ x | tojson | keys_only }}{% endmacro %}"
+        "{% macro called(x) %}{{ count('a', text=x | tojson) }}{% endmacro %}"
+        "{% macro value(x) %}{{ x | tojson }}{% endmacro %}"
+        "{% macro parsed(x) %}{{ x | tojson | fromjson | tojson }}{% endmacro %}").module
+    data = {"a": 1, "b": "a"}
+    assert(module.filtered(data) == '{"a","b"}')
+    assert(module.called(data) == "2")
+    assert(native.unwrap(module.value(data)) is data)
+    assert(native.unwrap(module.parsed(data)) is data)
+
+    # Globals of j2test that call re on their argument
+    tmpdir.join("regex.j2").write("{% macro replaced(x) %}{{ regex_replace('a', 'b', x | tojson) }}{% endmacro %}")
+    template = utils.get_template("./regex.j2", str(tmpdir), native_rendering=True)
+    assert(utils.get_macro(template, "replaced")({"a": 1}) == '{"b":1}')
+
+def test_native_concat():
+    value = native.NativeJson([1])
+    assert(native.native_concat(["\n  ", value, "\n"]) is value)
+    assert(native.native_concat([value, value]) == "[1][1]")
+    assert(native.native_concat(["a", 1]) == "a1")
+    assert(native.native_concat([]) == "")
+
+
+def test_native_bytecode_is_cached_separately(tmpdir):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    cache_dir = str(tmpdir.join("cache"))
+    utils.get_template("./templates/context.j2", curr_path, bytecode_cache_dir=cache_dir)
+    template = utils.get_template("./templates/context.j2", curr_path, bytecode_cache_dir=cache_dir,
+                                  native_rendering=True)
+    assert(len(os.listdir(cache_dir)) == 2)
+    macro = utils.get_macro(template, "get_request_meta")
+    data = {"std": {"env": {"instance": "NONE", "server": "NONE", "datacenter": {"region": "r", "type": "t"}}}}
+    assert(isinstance(macro(data, "test"), native.NativeJson))
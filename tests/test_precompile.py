@@ -0,0 +1,46 @@
+import pytest
+import os
+import shutil
+from j2test import precompile, utils
+
+CURR_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(params=[True, False], ids=["zip", "folder"])
+def archive(request, tmp_path):
+    target = str(tmp_path / ("templates.zip" if request.param else "templates"))
+    num_templates = precompile.compile_templates(CURR_PATH, target, use_zip=request.param)
+    assert(num_templates == 2)
+    return target
+
+def test_load_precompiled(archive):
+    env = utils._get_env(CURR_PATH, precompiled_path=archive)
+    template = env.get_template("templates/context.j2")
+    # Loaded from the compiled python module instead of the template source
+    assert(template.filename.endswith(".py"))
+    assert(utils.get_macro(template, "get_request_level") != None)
+
+def test_load_precompiled_sub_root(archive):
+    env = utils._get_env(os.path.join(CURR_PATH, "templates"), precompiled_path=archive)
+    template = env.get_template("context.j2")
+    assert(template.filename.endswith(".py"))
+
+def test_load_precompiled_outdated(archive, tmp_path):
+    root = str(tmp_path / "root")
+    shutil.copytree(os.path.join(CURR_PATH, "templates"), os.path.join(root, "templates"))
+    target = str(tmp_path / "outdated.zip")
+    precompile.compile_templates(root, target)
+
+    with open(os.path.join(root, "templates", "template.j2"), "a") as f:
+        f.write("\n{% macro new_macro() %}NEW{% endmacro %}\n")
+
+    env = utils._get_env(root, precompiled_path=target)
+    changed = env.get_template("templates/template.j2")
+    assert(changed.filename.endswith(".j2"))
+    assert(utils.get_macro(changed, "new_macro") != None)
+    assert(env.get_template("templates/context.j2").filename.endswith(".py"))
+
+def test_load_precompiled_invalid_archive(tmp_path):
+    env = utils._get_env(CURR_PATH, precompiled_path=str(tmp_path / "missing.zip"))
+    template = env.get_template("templates/context.j2")
+    assert(template.filename.endswith(".j2"))
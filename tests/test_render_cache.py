@@ -0,0 +1,124 @@
+import pytest
+import j2test
+from j2test import render_cache, utils
+from j2test.native import NativeJson
+
+
+class CountingMacro:
+    def __init__(self, output=None):
+        self.calls = 0
+        self.output = output
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.output if self.output is not None else "rendered {}".format(args)
+
+
+@pytest.mark.parametrize("args,other", [
+    ([1], [1.0]),
+    ([1], [True]),
+    ([1], ["1"]),
+    ([[1, 2]], [(1, 2)]),
+    ([{"a": 1, "b": 2}], [{"b": 2, "a": 1}]),
+    (["a", "b"], ["a,b"]),
+])
+def test_args_key_different(args, other):
+    assert(render_cache.args_key("macro", args) != render_cache.args_key("macro", other))
+
+def test_args_key():
+    assert(render_cache.args_key("macro", ["a", {"b": [1, None]}]) ==
+           render_cache.args_key("macro", ("a", {"b": [1, None]})))
+    assert(render_cache.args_key("macro", [1]) != render_cache.args_key("other", [1]))
+    assert(render_cache.args_key("macro", [lambda: 1]) is None)
+    assert(render_cache.args_key("macro", [(value for value in [1])]) is None)
+
+def test_render_cache():
+    cache = render_cache.RenderCache(2)
+    macro = CountingMacro()
+    cached = cache.wrap("template", "macro", macro)
+    assert(cached("a") == cached("a") == "rendered ('a',)")
+    assert(macro.calls == 1 and cache.hits == 1 and cache.misses == 1)
+
+    cached("b")
+    cached("c")
+    assert(len(cache) == 2)
+    # "a" was evicted first
+    cached("a")
+    assert(macro.calls == 4)
+
+    # Arguments that can not be pickled are always rendered
+    cached(lambda: 1)
+    cached(lambda: 1)
+    assert(macro.calls == 6)
+
+def test_render_cache_template_reload():
+    cache = render_cache.RenderCache()
+    macro = CountingMacro()
+    cache.wrap("template", "macro", macro)("a")
+    cache.wrap("template", "macro", macro)("a")
+    assert(macro.calls == 1)
+    cache.wrap("reloaded template", "macro", macro)("a")
+    assert(macro.calls == 2)
+
+def test_render_cache_errors():
+    calls = []
+
+    def failing(*args):
+        calls.append(args)
+        raise ValueError("failed")
+
+    cached = render_cache.RenderCache().wrap("template", "failing", failing)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cached("a")
+    assert(len(calls) == 2)
+
+def test_render_cache_native_copies():
+    cached = render_cache.RenderCache().wrap("template", "macro", CountingMacro(NativeJson({"a": [1]})))
+    cached().value["a"].append(2)
+    assert(cached().value == {"a": [1]})
+
+def test_render_cache_side_effects(tmpdir):
+    tmpdir.join("data.txt").write("content")
+    env = utils._get_env(str(tmpdir))
+    template = env.from_string(
+        "{% macro read() %}{{ readfromfile('data.txt') }}{% endmacro %}"
+        "{% macro write(path) %}{{ 'x' | writetofile(path) }}{% endmacro %}"
+        "{% macro pure(value) %}{{ value }}{% endmacro %}")
+    cache = render_cache.RenderCache()
+
+    def render(name, *args):
+        return cache.wrap(template, name, getattr(template.module, name))(*args)
+
+    assert(render("read") == "content")
+    tmpdir.join("data.txt").write("changed")
+    assert(render("read") == "changed")
+
+    path = str(tmpdir.join("out.txt"))
+    render("write", path)
+    tmpdir.join("out.txt").remove()
+    render("write", path)
+    assert(tmpdir.join("out.txt").check())
+
+    render("pure", 1)
+    render("pure", 1)
+    assert(cache.hits == 1 and len(cache) == 1)
+
+def test_test_template_render_cache():
+    class CachedTest(j2test.TestTemplate):
+        TEMPLATE_PATH = "./templates/template.j2"
+        CACHE_RENDERS = True
+
+    template = CachedTest()
+    template.run()
+    assert(template.render_macro_json("template_macro", ["value1", "value2"]) ==
+           template.render_macro_json("template_macro", ["value1", "value2"]))
+    assert(template.assertEqualJson("template_macro", ["value1", "value2"],
+                                    template.loadJsonFile("./expected/expected.json")))
+    assert(template._render_cache.hits == 2 and template._render_cache.misses == 1)
+
+    uncached = CachedTest()
+    uncached.CACHE_RENDERS = False
+    uncached.run()
+    uncached.render_macro_str("template_macro", ["value1", "value2"])
+    assert(uncached._render_cache is None)
@@ -0,0 +1,108 @@
+import pytest
+from j2test import result_cache
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = {
+        "templates/lib.j2": "{% macro shared() %}shared{% endmacro %}",
+        "templates/app.j2": "{% import 'lib.j2' as lib %}",
+        "other/other.j2": "",
+        "templates/data/greeting.txt": "hello",
+        "tests/jtest_remote.py": "class RemoteTest:\n    TEMPLATE_PATH = '../templates/app.j2'\n",
+        "templates/jtest_app.py": "class AppTest:\n    def test(self):\n        self.loadJsonFile('expected/app.json')\n",
+        "templates/expected/app.json": "{}",
+    }
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path
+
+
+def _cache(tree):
+    return result_cache.ResultCache(str(tree / ".j2test_cache"))
+
+
+def test_record_and_hit(tree):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    assert(cache.is_cached(test_file) == False)
+    cache.record(test_file)
+    assert(cache.writes == 1)
+
+    cache = _cache(tree)
+    assert(cache.is_cached(test_file) == True)
+    assert((cache.hits, cache.misses) == (1, 0))
+
+def test_not_recorded_without_lookup(tree):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    cache.record(test_file)
+    assert(cache.writes == 0)
+    assert(_cache(tree).is_cached(test_file) == False)
+
+@pytest.mark.parametrize("changed", ["templates/lib.j2", "templates/app.j2", "templates/jtest_app.py",
+                                     "templates/expected/app.json", "templates/expected/new.yaml",
+                                     "templates/data/greeting.txt"])
+def test_invalidated_by_dependencies(tree, changed):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    cache.is_cached(test_file)
+    cache.record(test_file)
+
+    (tree / changed).write_text((tree / changed).read_text() + "\n" if (tree / changed).exists() else "{}")
+    assert(_cache(tree).is_cached(test_file) == False)
+
+def test_not_invalidated_by_unrelated_template(tree):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    cache.is_cached(test_file)
+    cache.record(test_file)
+
+    (tree / "other" / "other.j2").write_text("changed")
+    assert(_cache(tree).is_cached(test_file) == True)
+
+def test_invalidated_by_settings(tree, monkeypatch):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    cache.is_cached(test_file)
+    cache.record(test_file)
+
+    monkeypatch.setenv("J2TEST_SELECT", "test")
+    assert(_cache(tree).is_cached(test_file) == False)
+    monkeypatch.setenv("J2TEST_AUTO_RELOAD", "0")
+    monkeypatch.delenv("J2TEST_SELECT")
+    assert(_cache(tree).is_cached(test_file) == True)
+
+def test_ignored_files(tree):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    cache = _cache(tree)
+    cache.is_cached(test_file)
+    cache.record(test_file)
+
+    for name in ["templates/venv/lib/site.py", "templates/build/out.json", "templates/env/pyvenv.cfg",
+                 "templates/env/lib/site.py"]:
+        path = tree / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("{}")
+    assert(_cache(tree).is_cached(test_file) == True)
+
+def test_record_unwritable(tree):
+    test_file = str(tree / "templates" / "jtest_app.py")
+    # The cache directory would be created under a file
+    cache = result_cache.ResultCache(str(tree / "templates" / "app.j2" / "results"))
+    cache.is_cached(test_file)
+    cache.record(test_file)
+    assert(cache.writes == 0)
+
+def test_invalidated_by_template_directory(tree):
+    # The template reads files relative to its own directory, e.g. with readfromfile
+    test_file = str(tree / "tests" / "jtest_remote.py")
+    cache = _cache(tree)
+    cache.is_cached(test_file)
+    cache.record(test_file)
+    assert(_cache(tree).is_cached(test_file) == True)
+
+    (tree / "templates" / "data" / "greeting.txt").write_text("goodbye")
+    assert(_cache(tree).is_cached(test_file) == False)
@@ -0,0 +1,110 @@
+import pytest
+import os
+import sys
+from j2test import runner
+
+CURR_PATH = os.path.dirname(os.path.abspath(__file__))
+PASSING_FILE = os.path.join(CURR_PATH, "jtests", "templates", "jtest_template.py")
+
+
+def test_run_file_passing():
+    result = runner.run_file(PASSING_FILE)
+    assert(result.failed == False)
+    assert(result.num_classes == 1)
+    assert(result.num_tests == 2)
+    assert(result.num_passed == 2)
+    assert(result.failed_tests == [])
+
+def test_run_file_failing(failing_file):
+    result = runner.run_file(failing_file)
+    assert(result.failed == True)
+    assert(result.num_tests == 2)
+    assert(result.num_failed == 1)
+    assert(result.failed_tests == ["ContextTest.test_request_level_wrong"])
+
+def test_run_file_capture(failing_file):
+    result = runner.run_file(failing_file, capture=True)
+    assert("jtest_context.py" in result.output)
+    assert("test_request_level_wrong" in result.output)
+
+def test_run_file_missing():
+    result = runner.run_file("invalid.py", capture=True)
+    assert(result.failed == True)
+    assert(result.num_tests == 0)
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_run_file_forked(failing_file):
+    result = runner.run_file_forked(failing_file, capture=True)
+    assert(result.failed == True)
+    assert(result.failed_tests == ["ContextTest.test_request_level_wrong"])
+    assert("test_request_level_wrong" in result.output)
+
+def test_run_files(failing_file):
+    results = runner.run_files([PASSING_FILE, failing_file])
+    assert([result.failed for result in results] == [False, True])
+
+def test_run_files_parallel(failing_file):
+    seen = []
+    results = runner.run_files_parallel([PASSING_FILE, failing_file], 2, on_result=seen.append)
+    assert([result.path for result in results] == [PASSING_FILE, failing_file])
+    assert([result.failed for result in results] == [False, True])
+    assert(len(seen) == 2)
+    # Output is buffered per file in the workers
+    assert("jtest_template.py" in results[0].output)
+    assert("jtest_context.py" in results[1].output)
+
+def test_resolve_num_workers():
+    assert(runner.resolve_num_workers("3") == 3)
+    assert(runner.resolve_num_workers("auto") >= 1)
+    with pytest.raises(ValueError):
+        runner.resolve_num_workers("0")
+
+def test_run_file_selected(monkeypatch, failing_file):
+    monkeypatch.setenv("J2TEST_SELECT", "ContextTest.test_request_level")
+    result = runner.run_file(failing_file)
+    assert(result.failed == False)
+    assert(result.num_tests == 1)
+
+def test_run_file_helper_modules(tmp_path):
+    paths = []
+    for name in ("first", "second"):
+        directory = tmp_path / name
+        directory.mkdir()
+        (directory / "helpers.py").write_text("NAME = {!r}\n".format(name))
+        (directory / "jtest_helpers.py").write_text(
+            "import sys\nimport helpers\nsys.path.append('extra')\nassert helpers.NAME == {!r}\n".format(name))
+        paths.append(str(directory / "jtest_helpers.py"))
+    path = list(sys.path)
+    assert([result.failed for result in runner.run_files(paths)] == [False, False])
+    assert("helpers" not in sys.modules)
+    assert(sys.path == path)
+
+def test_run_file_unguarded_and_base_classes(tmp_path):
+    (tmp_path / "greet.j2").write_text("{% macro greet(name) %}Hello {{ name }}{% endmacro %}")
+    (tmp_path / "jtest_greet.py").write_text(
+        "import j2test\n\n"
+        "class Base(j2test.TestTemplate):\n"
+        "    def greet(self, name):\n"
+        "        return self.assertEqualString('greet', [name], 'Hello ' + name)\n\n"
+        "class GreetTest(Base):\n"
+        "    def test_greet(self):\n"
+        "        self.greet('name')\n\n"
+        "class NoTests(j2test.TestTemplate):\n"
+        "    pass\n\n"
+        "GreetTest().run()\n")
+    result = runner.run_file(str(tmp_path / "jtest_greet.py"), capture=True)
+    assert(result.failed == False)
+    assert((result.num_classes, result.num_tests, result.num_passed) == (1, 1, 1))
+    assert(result.output.count("jtest_greet.py") == 1)
+
+def test_run_file_unguarded_failure(tmp_path):
+    (tmp_path / "greet.j2").write_text("{% macro greet(name) %}Hello {{ name }}{% endmacro %}")
+    (tmp_path / "jtest_greet.py").write_text(
+        "import j2test\n\n"
+        "class GreetTest(j2test.TestTemplate):\n"
+        "    def test_greet(self):\n"
+        "        self.assertEqualString('greet', ['name'], 'Bye name')\n\n"
+        "GreetTest().run()\n")
+    result = runner.run_file(str(tmp_path / "jtest_greet.py"), capture=True)
+    assert(result.failed == True)
+    assert(result.failed_tests == ["GreetTest.test_greet"])
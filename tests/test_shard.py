@@ -0,0 +1,49 @@
+import os
+import pytest
+from j2test import shard
+
+
+@pytest.mark.parametrize("value,expected", [("1/1", (1, 1)), ("2/4", (2, 4)), ("4/4", (4, 4))])
+def test_parse_shard(value, expected):
+    assert(shard.parse_shard(value) == expected)
+
+@pytest.mark.parametrize("value", ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"])
+def test_parse_shard_invalid(value):
+    with pytest.raises(ValueError):
+        shard.parse_shard(value)
+
+def test_assign_by_count():
+    files = ["jtest_{}.py".format(i) for i in range(10)]
+    shards = shard.assign(files, 3)
+    assert(sorted(len(files) for files in shards) == [3, 3, 4])
+    assert(sorted(path for files in shards for path in files) == sorted(files))
+    # Every shard keeps the order of the test files
+    assert(all(files == sorted(files, key=lambda path: int(path[6:-3])) for files in shards))
+
+def test_assign_by_duration():
+    files = ["jtest_{}.py".format(i) for i in range(6)]
+    durations = {"jtest_0.py": 60.0, "jtest_1.py": 10.0, "jtest_2.py": 10.0, "jtest_3.py": 10.0,
+                 "jtest_4.py": 10.0, "jtest_5.py": 10.0}
+    shards = shard.assign(files, 2, durations)
+    assert(shards == [["jtest_0.py"], ["jtest_1.py", "jtest_2.py", "jtest_3.py", "jtest_4.py", "jtest_5.py"]])
+    assert(shard.select(files, 2, 2, durations) == shards[1])
+
+def test_assign_unknown_files_count_as_average():
+    files = ["jtest_a.py", "jtest_b.py", "jtest_new.py"]
+    shards = shard.assign(files, 2, {"jtest_a.py": 3.0, "jtest_b.py": 1.0})
+    assert(shards == [["jtest_a.py"], ["jtest_b.py", "jtest_new.py"]])
+
+def test_save_and_load_durations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "durations.json")
+    assert(shard.load_durations(path) == {})
+    shard.save_durations({"tests/jtest_a.py": 1.5, str(tmp_path / "tests" / "jtest_b.py"): 2.0}, path)
+    shard.save_durations({"./tests/jtest_b.py": 3.0}, path)
+    assert(shard.load_durations(path) == {"tests/jtest_a.py": 1.5, "tests/jtest_b.py": 3.0})
+
+def test_save_durations_unwritable(tmp_path):
+    (tmp_path / "file").write_text("")
+    # The directory of the durations would be created under a file
+    path = str(tmp_path / "file" / "durations.json")
+    shard.save_durations({"jtest_a.py": 1.0}, path)
+    assert(shard.load_durations(path) == {})
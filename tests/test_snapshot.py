@@ -0,0 +1,149 @@
+import os
+import pytest
+from j2test import cli, snapshot
+
+TEST_FILE = """import j2test
+
+class SnapshotTest(j2test.TestTemplate):
+    def test_snapshot(self):
+        self.assertMatchesSnapshot("record", ["value1", "value2"], "record")
+        self.assertMatchesSnapshot("greet", ["name"], "greet")
+
+if __name__ == '__main__':
+    SnapshotTest().run()
+"""
+TEMPLATE = """{% macro record(v1, v2) %}{"key1": "{{ v1 }}", "key2": "{{ v2 }}"}{% endmacro %}
+{% macro greet(name) %}{{ greeting }} {{ name }}{% endmacro %}"""
+
+
+def test_write_and_get(tmp_path):
+    path = str(tmp_path / "store.snap")
+    large = {"items": ["value"] * 500}
+    entries = {"json": snapshot.encode({"key": [1, 2]}, True), "text": snapshot.encode("some text", False),
+               "large": snapshot.encode(large, True)}
+    assert(entries["large"][0] & snapshot.FLAG_ZLIB)
+    assert(not entries["text"][0] & snapshot.FLAG_ZLIB)
+    assert(snapshot.write_store(path, ((key, flags, payload) for key, (flags, payload) in entries.items())) == 3)
+
+    store = snapshot.SnapshotStore(path)
+    assert(len(store) == 3)
+    assert(store.get("json") == snapshot.Snapshot({"key": [1, 2]}, True))
+    assert(store.get("text") == snapshot.Snapshot("some text", False))
+    assert(store.get("large").value == large)
+    assert(store.get("missing") is None and "missing" not in store)
+    assert(sorted(key for key, _, _ in store.entries()) == ["json", "large", "text"])
+    store.close()
+
+def test_hash_collisions(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "_hash", lambda key: b"\0" * 16)
+    path = str(tmp_path / "store.snap")
+    snapshot.write_store(path, [(key, *snapshot.encode(key.upper(), False)) for key in ("a", "b", "c")])
+    store = snapshot.SnapshotStore(path)
+    assert([store.get(key).value for key in ("a", "b", "c")] == ["A", "B", "C"])
+    assert(store.get("d") is None)
+    store.close()
+
+def test_missing_and_invalid_store(tmp_path):
+    store = snapshot.SnapshotStore(str(tmp_path / "missing.snap"))
+    assert(len(store) == 0 and store.get("key") is None)
+    path = tmp_path / "invalid.snap"
+    path.write_bytes(b"not a snapshot file")
+    with pytest.raises(ValueError):
+        snapshot.SnapshotStore(str(path))
+
+def test_update_store(tmp_path):
+    path = str(tmp_path / "__snapshots__" / "jtest_file.snap")
+    assert(snapshot.update_store(path, {"a": snapshot.Snapshot("A", False), "b": snapshot.Snapshot([1], True)}))
+    mtime = os.stat(path).st_mtime_ns
+    # Nothing changed, the file is not rewritten
+    assert(not snapshot.update_store(path, {"a": snapshot.Snapshot("A", False)}))
+    assert(os.stat(path).st_mtime_ns == mtime)
+
+    assert(snapshot.update_store(path, {"a": snapshot.Snapshot("changed", False)}))
+    store = snapshot.SnapshotStore(path)
+    assert(store.get("a").value == "changed" and store.get("b").value == [1])
+    store.close()
+
+    assert(snapshot.update_store(path, {"a": snapshot.Snapshot("changed", False)}, prune=True))
+    store = snapshot.SnapshotStore(path)
+    assert(len(store) == 1)
+    store.close()
+
+def test_snapshot_path():
+    assert(snapshot.snapshot_path(os.path.join("dir", "jtest_file.py")) ==
+           os.path.join("dir", "__snapshots__", "jtest_file.snap"))
+
+def test_update_and_check_snapshots(tmp_path, monkeypatch):
+    test_dir = tmp_path / "snapshot_tests"
+    test_dir.mkdir()
+    (test_dir / "jtest_snapshots.py").write_text(TEST_FILE)
+    template = test_dir / "snapshots.j2"
+    template.write_text("{% set greeting = 'Hello' %}" + TEMPLATE)
+    paths = [str(test_dir / "jtest_snapshots.py")]
+
+    # Not recorded yet
+    assert(cli._run_in_process(paths) == (1, 1))
+
+    monkeypatch.setenv("J2TEST_UPDATE_SNAPSHOTS", "1")
+    assert(cli._run_in_process(paths) == (1, 0))
+    store = snapshot.SnapshotStore(snapshot.snapshot_path(paths[0]))
+    assert(store.get("record") == snapshot.Snapshot({"key1": "value1", "key2": "value2"}, True))
+    assert(store.get("greet") == snapshot.Snapshot("Hello name", False))
+    store.close()
+
+    monkeypatch.delenv("J2TEST_UPDATE_SNAPSHOTS")
+    assert(cli._run_in_process(paths) == (1, 0))
+
+    template.write_text("{% set greeting = 'Bye' %}" + TEMPLATE)
+    os.utime(str(template), (0, 0))
+    assert(cli._run_in_process(paths) == (1, 1))
+
+TWO_CLASSES = """import j2test
+
+class FirstTest(j2test.TestTemplate):
+    def test_first(self):
+        self.assertMatchesSnapshot("greet", ["first"], "key_a")
+
+class SecondTest(j2test.TestTemplate):
+    def test_second(self):
+        self.assertMatchesSnapshot("greet", ["second"], "key_b")
+        {extra}
+
+if __name__ == '__main__':
+    FirstTest().run()
+    SecondTest().run()
+"""
+
+
+@pytest.mark.parametrize("in_process", [True, False])
+def test_update_snapshots_of_several_classes(tmp_path, monkeypatch, in_process):
+    test_dir = tmp_path / "snapshot_tests"
+    test_dir.mkdir()
+    test_file = test_dir / "jtest_snapshots.py"
+    (test_dir / "snapshots.j2").write_text("{% set greeting = 'Hello' %}" + TEMPLATE)
+    path = str(test_file)
+
+    def run():
+        if in_process:
+            return cli._run_in_process([path])
+        return cli._run(path, 0, 0)
+
+    def keys():
+        store = snapshot.SnapshotStore(snapshot.snapshot_path(path))
+        try:
+            return sorted(key for key, _, _ in store.entries())
+        finally:
+            store.close()
+
+    test_file.write_text(TWO_CLASSES.format(extra="self.assertMatchesSnapshot('greet', ['third'], 'key_c')"))
+    monkeypatch.setenv("J2TEST_UPDATE_SNAPSHOTS", "1")
+    assert(run() == (1, 0))
+    assert(keys() == ["key_a", "key_b", "key_c"])
+
+    # Snapshots of the other classes are kept, the ones no longer asserted are dropped
+    test_file.write_text(TWO_CLASSES.format(extra=""))
+    assert(run() == (1, 0))
+    assert(keys() == ["key_a", "key_b"])
+
+    monkeypatch.delenv("J2TEST_UPDATE_SNAPSHOTS")
+    assert(run() == (1, 0))
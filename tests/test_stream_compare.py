@@ -0,0 +1,71 @@
+import json
+import pytest
+from j2test import stream_compare
+
+
+def _compare_json(output, expected, chunk_size=3):
+    return stream_compare.compare_json(stream_compare.iter_chunks(output, chunk_size), expected.encode("utf-8"))
+
+def _compare_text(output, expected, chunk_size=3):
+    return stream_compare.compare_text(stream_compare.iter_chunks(output, chunk_size), expected.encode("utf-8"))
+
+
+@pytest.mark.parametrize("output,expected", [
+    ('{"a": [1, 2, {"b": "x"}]}', '{\n  "a": [1.0, 2, {"b": "\\u0078"}]\n}'),
+    ('{"long": "' + 'x\\"y' * 50 + '", "n": 12345678}', '{"long": "' + 'x\\"y' * 50 + '", "n": 12345678}'),
+    ('[true, false, null, 1e10]', '[true,false,null,1E10]'),
+    ('  []  ', '[]\n'),
+])
+def test_compare_json_same(output, expected):
+    for chunk_size in (1, 2, 3, 7, 100):
+        assert(_compare_json(output, expected, chunk_size) is None)
+
+@pytest.mark.parametrize("output,expected,pointer,line,column", [
+    ('{"a": [1, 2, {"b": "x"}]}', '{\n  "a": [1, 2, {"b": "y"}]\n}', "/a/2/b", 2, 21),
+    ('{"a": [1, 2]}', '{"a": [1, 2, 3]}', "/a/2", 1, 12),
+    ('{"a": [1, 2, 3]}', '{"a": [1, 2]}', "/a/2", 1, 12),
+    ('{"x": {"a": 1, "c": 2}}', '{"x": {"a": 1, "b": 2}}', "/x", 1, 16),
+    ('{"a": tru}', '{"a": true}', "/a", 1, 7),
+    ('[1]', '', "", 1, 1),
+])
+def test_compare_json_divergence(output, expected, pointer, line, column):
+    for chunk_size in (1, 3, 100):
+        divergence = _compare_json(output, expected, chunk_size)
+        assert((divergence.pointer, divergence.line, divergence.column) == (pointer, line, column))
+
+def test_compare_json_preview():
+    divergence = _compare_json('{"a": "x"}', '{"a": "y"}', 100)
+    assert(divergence.expected == '"y"}' and divergence.output == '"x"}')
+    assert(_compare_json('[1]', '[1, 2]').output == "]")
+    assert(_compare_json('[1, 2', '[1, 2]').output == "<end of output>")
+    assert(_compare_json('[1, 2]', '[1]').expected == "]")
+
+def test_compare_json_generated(monkeypatch):
+    document = {"items": [{"id": index, "name": "item \"{}\" é".format(index), "tags": ["a", "b"], "on": True}
+                          for index in range(500)]}
+    output = json.dumps(document)
+    expected = json.dumps(document, indent=2, ensure_ascii=False)
+    # Small chunks on both sides so tokens are cut by chunk boundaries everywhere
+    monkeypatch.setattr(stream_compare, "CHUNK_SIZE", 13)
+    assert(_compare_json(output, expected, 7) is None)
+    divergence = _compare_json(output.replace('"id": 321', '"id": 322'), expected, 7)
+    assert(divergence.pointer == "/items/321/id")
+
+def test_compare_text():
+    assert(_compare_text("  hello   world \n\n ", "hello   world") is None)
+    assert(_compare_text("hello", "\n hello\n") is None)
+    assert(_compare_text("", " \n") is None)
+    divergence = _compare_text("hello\nwerld", "hello\nworld")
+    assert((divergence.offset, divergence.line, divergence.column) == (7, 2, 2))
+    assert(divergence.expected == "orld" and divergence.output == "erld")
+    assert(_compare_text("hel", "hello").output == "<end of output>")
+    assert(_compare_text("hello!", "hello").expected == "<end of file>")
+
+def test_open_expected(tmp_path):
+    path = tmp_path / "expected.json"
+    path.write_bytes(b"")
+    with stream_compare.open_expected(str(path)) as expected:
+        assert(len(expected) == 0)
+    path.write_bytes(b'{"a": 1}')
+    with stream_compare.open_expected(str(path)) as expected:
+        assert(stream_compare.compare_json(['{"a":1}'], expected) is None)
@@ -78,3 +78,87 @@ def test_json_diff():
 
     assert(utils.json_diff(dic1, dic2) == {})
     assert(utils.json_diff(dic1, diff3) == expected_diff)
+
+def test_get_env_shared():
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    env = utils.get_env(curr_path)
+    assert(utils.get_env(curr_path + "/") is env)
+    assert(utils.get_env(curr_path, auto_reload=False) is not env)
+
+    template = utils.get_template("./templates/context.j2", curr_path)
+    assert(template.environment is env)
+    # The compiled template is reused instead of being compiled again
+    assert(utils.get_template("./templates/context.j2", curr_path) is template)
+
+def test_get_env_lru(monkeypatch):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setattr(utils, "ENV_CACHE_SIZE", 1)
+    utils.clear_env_cache()
+    env = utils.get_env(curr_path)
+    utils.get_env(os.path.join(curr_path, "templates"))
+    assert(utils.get_env(curr_path) is not env)
+
+def test_get_env_auto_reload(monkeypatch):
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setenv(utils.AUTO_RELOAD_ENV_VAR, "0")
+    assert(utils.get_env(curr_path).auto_reload == False)
+    monkeypatch.delenv(utils.AUTO_RELOAD_ENV_VAR)
+    assert(utils.get_env(curr_path).auto_reload == True)
+
+def test_assert_json_list_order():
+    dic1 = {"key1": [1, "value", None, {"a": 1}]}
+    dic2 = {"key1": [{"a": 1}, None, "value", 1]}
+    assert(utils.assert_json(dic1, dic2) == True)
+    assert(utils.assert_json(dic1, dic2, ignore_order=False) == False)
+
+def test_print_json_diff(capsys):
+    dic1 = {"key1": "value1", "key2": "value2"}
+    diff3 = {"key1": "different", "key2": "value2"}
+
+    assert(utils.print_json_diff(dic1, dic1) == [])
+    diffs = utils.print_json_diff(dic1, diff3, print_all=False)
+    assert([diff.path for diff in diffs] == ["/key1"])
+    assert('changed  /key1: expected "different" but got "value1"' in capsys.readouterr().out)
+
+def test_print_string_diff(capsys):
+    utils.print_string_diff("line1\nline2\nline3", "line1\nLINE2\nline3\n")
+    out = capsys.readouterr().out
+    assert("First difference at line 2, column 1" in out)
+    assert("-LINE2\n+line2" in out)
+
+def test_print_string_diff_too_large(capsys):
+    utils.print_string_diff("a" * 100 + "b", "a" * 100 + "c", max_size=50)
+    out = capsys.readouterr().out
+    assert("offset 100" in out)
+    assert("Line diff skipped" in out)
+
+def test_get_yaml_file_modes():
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(curr_path, "./variables/vars.yaml")
+    full = utils.get_yaml_file(path, "test_utils", mode=utils.YAML_MODE_FULL)
+    safe = utils.get_yaml_file(path, "test_utils", mode=utils.YAML_MODE_SAFE)
+    assert(full == safe)
+    assert(full["std"]["app"]["team"] == "teamname")
+    assert(utils.get_yaml_file(path, "test_utils", mode="invalid") == None)
+
+def test_get_yaml_loader():
+    import yaml
+    assert(issubclass(utils.get_yaml_loader(utils.YAML_MODE_SAFE), yaml.constructor.SafeConstructor))
+    assert(issubclass(utils.get_yaml_loader(utils.YAML_MODE_FULL), yaml.constructor.FullConstructor))
+    if yaml.__with_libyaml__:
+        assert(utils.get_yaml_loader(utils.YAML_MODE_SAFE) is yaml.CSafeLoader)
+    with pytest.raises(ValueError):
+        utils.get_yaml_loader("invalid")
+
+def test_macro_json_native_rendering():
+    curr_path = os.path.dirname(os.path.abspath(__file__))
+    template = utils.get_template("./templates/context.j2", curr_path, native_rendering=True)
+    assert(template.environment is not utils.get_env(curr_path))
+    data = {"std": {"env": {"instance": "NONE", "server": "NONE", "datacenter": {"region": "region1", "type": "some_type"}}}}
+    expected = {'case_types': 'test', 'datacenter_type': 'some_type', 'region_name': 'region1', 'level': 'DATACENTER'}
+
+    macro = utils.get_macro(template, "get_request_meta")
+    assert(utils.render_macro_json(macro, [data, "test"]) == expected)
+    assert(utils.json.loads(utils.render_macro_str(macro, [data, "test"])) == expected)
+    macro = utils.get_macro(template, "get_request_level")
+    assert(utils.render_macro_str(macro, [data]).strip() == "DATACENTER")
@@ -0,0 +1,19 @@
+import os
+from j2test import watch
+
+
+def test_snapshot(tmp_path):
+    (tmp_path / "jtest_file.py").write_text("")
+    (tmp_path / "file.j2").write_text("")
+    (tmp_path / "expected.json").write_text("{}")
+    (tmp_path / "helper.py").write_text("")
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "cached.json").write_text("{}")
+
+    mtimes = watch.snapshot([str(tmp_path), str(tmp_path / ".cache")])
+    assert(sorted(os.path.basename(path) for path in mtimes) == ["expected.json", "file.j2", "jtest_file.py"])
+
+def test_changed_files(tmp_path):
+    before = {"a.j2": 1, "b.j2": 1, "c.j2": 1}
+    after = {"a.j2": 1, "b.j2": 2, "d.j2": 1}
+    assert(watch.changed_files(before, after) == {"b.j2", "c.j2", "d.j2"})
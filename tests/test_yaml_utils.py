@@ -0,0 +1,107 @@
+import io
+import random
+import threading
+import ruamel.yaml
+import pytest
+import j2test.filters.yaml_utils as yaml_utils
+
+
+def legacy_dumps(data):
+    yaml = ruamel.yaml.YAML(typ="rt")
+    string_stream = io.StringIO()
+    yaml.dump(data, stream=string_stream)
+    return string_stream.getvalue()
+
+
+def legacy_dumps_inline(data, indent):
+    lines = legacy_dumps(data).split("\n")
+    new_lines = [lines[0]]
+    for line in lines[1:]:
+        if line == "...":
+            continue
+        new_lines.append("{}{}".format("".rjust(indent), line))
+    if new_lines[-1].strip() == "":
+        new_lines = new_lines[:-1]
+    return "\n".join(new_lines)
+
+
+SAMPLES = [
+    {"a": 1, "b": [1, 2, {"c": None, "d": []}], "e": {}},
+    {"app": {"name": "my-app", "team": "teamname", "replicas": 3, "enabled": True, "ports": [80, 443]}},
+    [[1, 2], [3, [4, {"x": "y"}]], {}],
+    {"a": None, "b": [None, 1], "c": [{"d": None}]},
+    {"quoted": "yes", "on": "off", "n": "123", "dot": ".5", "version": "1.2.3"},
+    {"text": "hello world " * 20, "multi": "line one\nline two\n", "colon": "key: value", "empty": ""},
+    {"unicode": "ünïcödé", "float": 1.5, "exp": 1e20, "neg": -0.0, "tuple": (1, 2)},
+    "plain",
+    "multi\nline",
+    "",
+    None,
+    42,
+    True,
+    [],
+    {},
+]
+
+
+@pytest.mark.parametrize("use_c_dumper", [False, True])
+def test_yaml_dumps_matches_round_trip_dumper(use_c_dumper, monkeypatch):
+    monkeypatch.setattr(yaml_utils, "use_c_dumper", use_c_dumper and yaml_utils.use_c_dumper)
+    for data in SAMPLES:
+        assert(yaml_utils.yaml_dumps(data) == legacy_dumps(data))
+        for indent in (0, 2, 5):
+            assert(yaml_utils.yaml_dumps_inline(data, indent) == legacy_dumps_inline(data, indent))
+
+
+def random_plain_data(rng, depth=0):
+    choice = rng.randrange(7 if depth < 4 else 4)
+    if choice == 0:
+        return rng.randrange(-10 ** 12, 10 ** 12)
+    if choice == 1:
+        return rng.choice([True, False])
+    if choice in (2, 3):
+        return rng.choice(["name", "my-app", "a.b/c", "Value_1", "x" * 60, "y" * 20, "Yes", "on", "1abc", "a b"])
+    if choice == 4:
+        return [random_plain_data(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {rng.choice(["key", "k-2", "n", "other.key", "x"]) + str(i):
+            None if rng.random() < 0.2 else random_plain_data(rng, depth + 1) for i in range(rng.randrange(4))}
+
+
+def test_c_dumper_is_byte_identical():
+    if not yaml_utils.use_c_dumper:
+        pytest.skip("PyYAML was built without libyaml")
+    rng = random.Random(7)
+    plain = 0
+    for _ in range(500):
+        data = {"root": random_plain_data(rng)}
+        plain += yaml_utils._is_plain(data)
+        assert(yaml_utils.yaml_dumps(data) == legacy_dumps(data))
+        assert(yaml_utils.yaml_dumps_inline(data, 4) == legacy_dumps_inline(data, 4))
+    assert(plain > 100)
+
+
+def test_is_plain():
+    assert(yaml_utils._is_plain({"a": [1, True, "name"], "b": None}))
+    assert(not yaml_utils._is_plain({"a": [None]}))
+    assert(not yaml_utils._is_plain({"a": "yes"}))
+    assert(not yaml_utils._is_plain({"a": "two words"}))
+    assert(not yaml_utils._is_plain({"a": 1.5}))
+    assert(not yaml_utils._is_plain({1: "a"}))
+    assert(not yaml_utils._is_plain("name"))
+
+
+def test_engines_are_reused_per_thread():
+    engine = yaml_utils._get_engine("safe")
+    assert(yaml_utils._get_engine("safe") is engine)
+    assert(yaml_utils._get_engine("rt") is not engine)
+
+    engines = []
+    thread = threading.Thread(target=lambda: engines.append(yaml_utils._get_engine("safe")))
+    thread.start()
+    thread.join()
+    assert(engines[0] is not engine)
+
+
+def test_yaml_loads():
+    assert(yaml_utils.yaml_loads("a: 1\nb: [x, y]\n") == {"a": 1, "b": ["x", "y"]})
+    assert(yaml_utils.yaml_loads("c: d") == {"c": "d"})